@@ -0,0 +1,286 @@
+# answer_cache.py
+"""
+Near-duplicate answer cache in front of generation.
+
+Answers are stored under a scope built from the routed intent: the tools
+and canonical cities of the plan ("weather:Paris", "attractions:Rome"), or
+"chat:<city>". Within a scope, questions match on the MinHash of their
+content words, so "best time to visit Rome?" and "When is the best time to
+visit Rome" share an answer. Banded LSH buckets make a lookup touch only
+likely matches; the signature estimate of Jaccard similarity decides.
+
+- Questions that name different entities never share a scope: query tools
+  add the router's query, and every scope carries the question's proper
+  nouns, so "vaccinations for Kenya" cannot answer "... for Ghana"
+- TTL per entry: the shortest TOOL_TTLS of the tools behind the answer, so
+  weather answers expire in minutes and attraction answers in days
+- max_entries bounds the cache (least recently used evicted first)
+- replay_stream() yields a cached answer in word chunks, like a live stream
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from kb_index import _feature_hash, tokenize
+from metrics import CACHE_LOOKUPS
+from router_cache import normalize_text
+from tool_executor import TOOL_RESULT_TTLS
+
+# Seconds an answer stays valid, by the tools its context came from
+TOOL_TTLS = dict(TOOL_RESULT_TTLS, chat=24 * 3600)
+DEFAULT_TTL = 3600
+
+_PRIME = (1 << 31) - 1
+
+# Capitalized words after the first one: names of countries, places, brands
+_PROPER_NOUN = re.compile(r"(?<=\s)[A-Z][\w'-]+")
+
+
+def cache_scope(intent: dict, plan: list, question: str, first_turn: bool, canonical=None):
+    """
+    Scope string for a routed turn, or None when the answer may depend on
+    earlier turns. A turn is self-contained when it names every city its
+    plan uses, or when it opens the conversation.
+    """
+    entities = {normalize_text(word) for word in _PROPER_NOUN.findall(question)}
+    canonical = canonical or (lambda city: city)
+    text = f" {normalize_text(question)} "
+    parts = []
+    named = True
+    for call in plan:
+        if call["tool"] in ("weather", "attractions", "nearby"):
+            # Already in the scope as a canonical city or anchor
+            entities -= set(normalize_text(call["arg"]).split())
+        if call["tool"] in ("weather", "attractions"):
+            named = named and f" {normalize_text(call['arg'])} " in text
+            parts.append(f"{call['tool']}:{canonical(call['arg']) or call['arg']}")
+        elif call["tool"] == "nearby":
+            named = named and f" {normalize_text(call['arg'])} " in text
+            parts.append(f"nearby:{normalize_text(call['arg'])}")
+        else:
+            # The query names the entity ("vaccinations Kenya"); rewordings of
+            # it only cost a miss, a shared scope would cost a wrong answer
+            named = False
+            parts.append(f"{call['tool']}:{normalize_text(call['arg'])}")
+    if not plan:
+        location = intent.get("location")
+        if not location:
+            if not first_turn:
+                return None
+            parts.append("chat")
+        else:
+            entities -= set(normalize_text(location).split())
+            named = f" {normalize_text(location)} " in text
+            parts.append(f"chat:{canonical(location) or location}")
+    if not (named or first_turn):
+        return None
+    scope = "|".join(sorted(set(parts)))
+    return f"{scope}|names:{','.join(sorted(entities))}" if entities else scope
+
+
+def replay_stream(text: str, tokens_per_second=None):
+    """A cached answer as word chunks; spacing is kept so the chunks join back to text."""
+    delay = 1.0 / tokens_per_second if tokens_per_second else 0.0
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        if delay and i:
+            time.sleep(delay)
+        yield word if i == len(words) - 1 else word + " "
+
+
+class MinHasher:
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, features):
+        if not features:
+            return None
+        hashes = np.fromiter((_feature_hash(f) % _PRIME for f in set(features)), dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+
+class AnswerCache:
+    """
+    Shared across sessions (see server.py); thread-safe.
+    similarity is the minimum estimated Jaccard similarity of the questions'
+    content words for a near-duplicate hit.
+    """
+
+    def __init__(self, max_entries=4096, similarity=0.7, num_perm=128, bands=32, ttls=None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ttls = dict(TOOL_TTLS, **(ttls or {}))
+        self.hasher = MinHasher(num_perm)
+        self._entries = OrderedDict()   # entry id -> entry dict
+        self._buckets = {}              # (scope, band, band bytes) -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _band_keys(self, scope, signature):
+        return [(scope, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def ttl_for(self, scope: str) -> float:
+        tools = {part.split(":", 1)[0] for part in scope.split("|") if not part.startswith("names:")}
+        return min(self.ttls.get(tool, DEFAULT_TTL) for tool in tools)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for key in entry["bands"]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _best_match(self, scope, signature, now):
+        """(entry id, similarity) of the closest live entry in scope; caller holds the lock."""
+        candidates = set()
+        for key in self._band_keys(scope, signature):
+            candidates |= self._buckets.get(key, set())
+        best, best_similarity = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if now - entry["stored_at"] > entry["ttl"]:
+                self._remove(entry_id)
+                self.expirations += 1
+                continue
+            similarity = float(np.mean(entry["signature"] == signature))
+            if similarity > best_similarity:
+                best, best_similarity = entry_id, similarity
+        return best, best_similarity
+
+    def get(self, scope: str, question: str):
+        """{"answer", "question", "similarity", "age_s"} for a cached near-duplicate, else None."""
+        signature = self.hasher.signature(tokenize(question))
+        if signature is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry_id, similarity = self._best_match(scope, signature, now)
+            if entry_id is None or similarity < self.similarity:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="answer", result="miss")
+                return None
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="hit")
+            if similarity < 1.0:
+                self.near_hits += 1
+            return {"answer": entry["answer"], "question": entry["question"],
+                    "similarity": round(similarity, 3), "age_s": round(now - entry["stored_at"], 1)}
+
+    def put(self, scope: str, question: str, answer: str, data_age_s=0.0):
+        """
+        data_age_s: age of the oldest tool result behind the answer (reused
+        from session memory or served stale); it is taken off the entry's
+        TTL, and an answer whose data is already past it is not stored.
+        """
+        signature = self.hasher.signature(tokenize(question))
+        ttl = self.ttl_for(scope) - data_age_s
+        if signature is None or not answer or ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            # A fresh answer replaces its near-duplicate instead of piling up beside it
+            entry_id, similarity = self._best_match(scope, signature, now)
+            if entry_id is not None and similarity >= self.similarity:
+                self._remove(entry_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            bands = self._band_keys(scope, signature)
+            self._entries[entry_id] = {"scope": scope, "question": question, "answer": answer,
+                                       "signature": signature, "bands": bands,
+                                       "stored_at": now, "ttl": ttl}
+            for key in bands:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    cache = AnswerCache(max_entries=3, ttls={"weather": 0.2})
+    rome = "chat:Rome"
+    cache.put(rome, "What is the best time to visit Rome?", "Spring (April-May) and autumn are ideal.")
+    print(cache.get(rome, "When is the best time to visit Rome?"))   # same content words
+    print(cache.get(rome, "Best time of year to visit Rome?"))      # near-duplicate hit
+    print(cache.get(rome, "Where do I eat in Rome?"))            # different question -> None
+    print(cache.get("chat:Paris", "best time to visit Paris"))   # other scope -> None
+
+    # Answers built on old data expire with it (weather TTL 0.2s here)
+    cache.put("weather:Oslo", "Weather in Oslo?", "-3°C and snowing.", data_age_s=0.5)
+    print("stale data stored:", cache.get("weather:Oslo", "Weather in Oslo?") is not None)
+
+    cache.put("weather:Paris", "Weather in Paris?", "22°C and partly cloudy.")
+    print(cache.get("weather:Paris", "weather in paris"))        # hit
+    time.sleep(0.3)
+    print(cache.get("weather:Paris", "weather in paris"))        # expired -> None
+
+    for city in ("Oslo", "Lima", "Kyiv"):
+        cache.put(f"chat:{city}", f"Best time to visit {city}?", f"Summer in {city}.")
+    print(cache.get(rome, "best time to visit Rome"))            # evicted -> None
+    print(cache.stats())
+    print("".join(replay_stream("Spring and autumn are ideal.")))
+
+    intent = {"tool": "weather", "location": "NYC", "calls": [{"tool": "weather", "location": "NYC"}]}
+    print(cache_scope(intent, [{"tool": "weather", "arg": "NYC"}], "Weather in NYC?", False,
+                      canonical=lambda c: "New York"))
+    assert cache_scope(intent, [{"tool": "weather", "arg": "New York"}], "Weather in New York?", False,
+                       canonical=lambda c: "New York") == "weather:New York"
+    print(cache_scope({"tool": "chat", "location": None}, [], "What's the weather like?", False))
+
+    # Different entities never share an entry, even on first turns
+    shared = AnswerCache()
+    questions = {
+        "Kenya": "What vaccinations do I need before traveling to Kenya from the United States?",
+        "Ghana": "What vaccinations do I need before traveling to Ghana from the United States?",
+    }
+    plans = {
+        "Kenya": [{"tool": "web_search", "arg": "vaccinations Kenya from United States"}],
+        "Ghana": [{"tool": "web_search", "arg": "vaccinations Ghana from United States"}],
+    }
+    for name in ("search", "chat"):
+        scopes = {country: cache_scope({"tool": "chat", "location": None},
+                                       plans[country] if name == "search" else [], q, True)
+                  for country, q in questions.items()}
+        shared.put(scopes["Kenya"], questions["Kenya"], "Yellow fever vaccination is required for Kenya.")
+        assert scopes["Kenya"] != scopes["Ghana"], scopes
+        assert shared.get(scopes["Ghana"], questions["Ghana"]) is None
+        assert shared.get(scopes["Kenya"], questions["Kenya"]) is not None
+    print("entities kept apart:", scopes)
@@ -1,101 +1,421 @@
 # assistant.py
 
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from llm_client import LLMClient
+from llm_scheduler import Priority
 from state_manager import StateManager
 from router import IntentRouter
-from tools import AVAILABLE_TOOLS
-from utils import (
-    EventLogger,
-    format_weather_payload,
-    format_attractions_payload
-)
-from prompts import SYSTEM_PROMPT, COT_PROMPT
-from reflection import apply_reflection
+from tool_executor import ToolExecutor, plan_tool_calls, merge_tool_context, result_age, TOOL_RESULT_TTLS
+from tools import TOOL_SCHEMAS, resolve_city
+from utils import EventLogger
+from trace_writer import JsonlTraceWriter
+from prompts import SYSTEM_PROMPT, COT_PROMPT, SUMMARY_PROMPT
+from reflection import apply_reflection, IncrementalReflector, REFLECTION_MODES
+from grounding import ReflectionGate
+from answer_cache import cache_scope, replay_stream
+from speculation import SpeculativeStream
+from metrics import CACHE_LOOKUPS, TOOL_CALLS, TURN_STAGE, TURNS
+from turn_events import (TurnEvent, ChunkCoalescer, paced, tool_event,
+                         ROUTER_DECISION, CHUNK, REFLECTION, FINAL)
+
+# "router": JSON router call picks tools, then the answer is streamed
+# "native": one streamed completion sees TOOL_SCHEMAS and calls tools itself
+ORCHESTRATION_MODES = ("router", "native")
 
 
 class TravelAssistant:
-    def __init__(self):
-        self.llm = LLMClient()
-        self.state = StateManager(system_prompt=SYSTEM_PROMPT)
-        self.router = IntentRouter(self.llm)
-        self.logger = EventLogger()
+    def __init__(self, llm=None, tool_executor=None, router_cache=None, logger=None,
+                 reflection_mode="post", reflection_gate=True, token_budget=None,
+                 trace_dir=None, compact_traces=False, orchestration="router", max_tool_rounds=2,
+                 answer_cache=None, speculative=False):
+        if reflection_mode not in REFLECTION_MODES:
+            raise ValueError(f"reflection_mode must be one of {REFLECTION_MODES}")
+        if orchestration not in ORCHESTRATION_MODES:
+            raise ValueError(f"orchestration must be one of {ORCHESTRATION_MODES}")
+
+        # llm / tool_executor / router_cache can be shared when hosting
+        # many sessions in one process (see server.py)
+        self.llm = llm or LLMClient()
+        # token_budget switches memory from a fixed turn window to a token
+        # window with a rolling summary of older turns
+        self.state = StateManager(
+            system_prompt=SYSTEM_PROMPT,
+            token_budget=token_budget,
+            summarizer=self.summarize_history if token_budget else None,
+            result_ttls=TOOL_RESULT_TTLS,
+        )
+        # trace_dir streams events to rotating JSONL files and keeps only a
+        # bounded tail in memory, for long-lived processes.
+        # compact_traces logs prompts as content-hash references.
+        if logger:
+            self.logger = logger
+        elif trace_dir:
+            sink = JsonlTraceWriter(directory=trace_dir, compact_prompts=compact_traces)
+            self.logger = EventLogger(sink=sink, max_events=1000, compact_prompts=compact_traces)
+        else:
+            self.logger = EventLogger(compact_prompts=compact_traces)
+        self.router = IntentRouter(self.llm, logger=self.logger, cache=router_cache)
+        self.tools = tool_executor or ToolExecutor()
+        self.orchestration = orchestration
+        # Native mode: tool-calling rounds before the model must answer
+        self.max_tool_rounds = max_tool_rounds
+
+        # "post": one reflection pass after the stream ends
+        # "incremental": segments are checked while generation continues
+        self.reflection_mode = reflection_mode
+        self.reflection_pool = (
+            ThreadPoolExecutor(max_workers=4, thread_name_prefix="reflection")
+            if reflection_mode == "incremental" else None
+        )
+        # Local grounding check; the reflection LLM call only runs for risky drafts
+        self.reflection_gate = ReflectionGate() if reflection_gate else None
+        # Shared near-duplicate answer cache (answer_cache.AnswerCache), router mode only
+        self.answer_cache = answer_cache
+        # Router mode: start the no-tool answer while the router's LLM tier
+        # runs, kept if the intent is chat (speculation.py)
+        self.speculation_pool = (
+            ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculation")
+            if speculative and orchestration == "router" else None
+        )
+
+    def close(self):
+        """Release per-session worker threads; shared llm/tools are left running."""
+        if self.reflection_pool:
+            self.reflection_pool.shutdown(wait=False)
+        if self.speculation_pool:
+            self.speculation_pool.shutdown(wait=False)
+        self.state.close()
+
+    def summarize_history(self, summary: str, evicted: list) -> str:
+        """Fold turns that left the token window into the rolling summary."""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nOlder messages:\n{transcript}"}
+        ]
+        return self.llm.chat(messages, stream=False, temperature=0, priority=Priority.OFFLINE)
+
+    def _run_tools(self, plan: list) -> list:
+        """
+        Run a validated plan concurrently and log each result. Calls with a
+        still-fresh result in session memory reuse it instead of running.
+        """
+        memory = self.state.memory
+        reused = {}
+        for i, call in enumerate(plan):
+            fresh = memory.fresh_result(call["tool"], call["arg"])
+            CACHE_LOOKUPS.inc(cache="tool_memory", result="miss" if fresh is None else "hit")
+            if fresh is not None:
+                reused[i] = fresh
+                TOOL_CALLS.inc(tool=call["tool"], status="reused")
+                self.logger.log("tool_memory_hit", {"tool": call["tool"], "arg": call["arg"],
+                                                    "age_s": fresh["age_s"]})
+        to_run = [call for i, call in enumerate(plan) if i not in reused]
+        if to_run:
+            self.logger.log("tool_call", {"calls": to_run})
+        ran = iter(self.tools.run(to_run) if to_run else [])
+
+        results = [reused[i] if i in reused else next(ran) for i in range(len(plan))]
+        for i, result in enumerate(results):
+            if i in reused:
+                continue
+            memory.remember_result(result)
+            self.logger.log("tool_raw_output", {
+                "tool": result["tool"],
+                "arg": result["arg"],
+                "status": result["status"],
+                "elapsed": result["elapsed"],
+                "output": result["raw"],
+            })
+        return results
 
-    def run_turn(self, user_msg: str):
+    def _native_stream(self, messages: list, user_msg: str, on_tool_context, timings: dict):
+        """
+        Native tool calling: the streamed completion either answers directly
+        or emits tool calls; those run, their results are appended as tool
+        messages and generation continues. Yields raw chunk and tool_result
+        events, reports the merged tool context through on_tool_context(text)
+        and adds tool time to timings["tools_s"].
         """
-        Execute a full interaction turn with:
-        - intent routing
+        messages = list(messages)
+        all_results = []
+        for round_index in range(self.max_tool_rounds + 1):
+            # Last round: tools stay declared (history references them) but may not be called
+            tool_choice = "auto" if round_index < self.max_tool_rounds else "none"
+            tool_calls = None
+            for kind, value in self.llm.stream_with_tools(messages, TOOL_SCHEMAS,
+                                                          tool_choice=tool_choice, temperature=0.4):
+                if kind == "text":
+                    yield TurnEvent(CHUNK, {"text": value})
+                else:
+                    tool_calls = value
+            if not tool_calls:
+                return
+
+            self.logger.log("native_tool_calls", {"round": round_index, "calls": tool_calls})
+            # Each call is validated like a router "calls" entry; every call id
+            # gets a tool message back, even when the call was rejected
+            planned = []
+            for call in tool_calls:
+                plan = plan_tool_calls({"calls": [dict(call["arguments"], tool=call["name"])]},
+                                       user_msg, max_calls=1)
+                planned.append(plan[0] if plan else None)
+            valid = [p for p in planned if p]
+            tools_start = time.perf_counter()
+            round_results = self._run_tools(valid) if valid else []
+            timings["tools_s"] += time.perf_counter() - tools_start
+            for result in round_results:
+                yield tool_event(result)
+            results = iter(round_results)
+
+            messages.append({"role": "assistant", "content": "", "tool_calls": [
+                {"id": c["id"], "type": "function",
+                 "function": {"name": c["name"], "arguments": json.dumps(c["arguments"])}}
+                for c in tool_calls
+            ]})
+            for call, plan in zip(tool_calls, planned):
+                if plan:
+                    result = next(results)
+                    all_results.append(result)
+                    content = result["text"]
+                else:
+                    content = f"Invalid call to {call['name']}: unknown tool or missing argument."
+                messages.append({"role": "tool", "tool_call_id": call["id"], "content": content})
+
+            tool_context_text = merge_tool_context(all_results)
+            self.logger.log("tool_formatted_context", {"text": tool_context_text})
+            on_tool_context(tool_context_text)
+
+    def run_turn(self, user_msg: str) -> str:
+        """Run a turn to completion and return the final answer (see stream_turn)."""
+        final = None
+        for event in self.stream_turn(user_msg):
+            if event.type == FINAL:
+                final = event.data["text"]
+        return final
+
+    def stream_turn(self, user_msg: str, coalesce_chars=32, coalesce_s=0.05):
+        """
+        Execute a full interaction turn, yielding TurnEvents (turn_events.py):
+        - intent routing (router mode) or native tool calling (native mode)
+        - answer cache lookup (router mode, when an answer_cache is shared in)
         - tool execution
         - prompt construction
-        - LLM streaming response
+        - LLM streaming response, as coalesced chunk events
         - reflection
         - event logging at every step
+
+        The final event carries the answer after reflection. Consume the
+        generator to the end: state and logs are updated before "final".
         """
+        turn_start = time.perf_counter()
+        # Per-stage wall time, logged as "turn_timing" (see bench_pipeline.py)
+        timings = {"router_s": 0.0, "tools_s": 0.0}
+
         # Log user input
         self.logger.log("user_input", {"text": user_msg})
+        first_turn = not self.state.history and not self.state.summary
+
+        # Session memory: cities and dates named in this message
+        memory = self.state.memory
+        memory.note_dates(user_msg)
+        named = self.router.local.find_cities(user_msg) if self.router.local else []
+        if named:
+            memory.note_destination(resolve_city(named[-1]) or named[-1])
 
         # Save to state
         self.state.add_user(user_msg)
 
-        # ------------ INTENT ROUTING ------------
-        intent = self.router.determine_intent(user_msg)
-        self.logger.log("router_decision", intent)
+        # Tool context is known up front in router mode, and only after the
+        # model's tool calls in native mode
+        tool_context_text = None
+        results = []
+        scope = cached = None
+        speculation = None
+        reflector = None
+        if self.reflection_mode == "incremental":
+            reflector = IncrementalReflector(
+                self.llm, self.reflection_pool, gate=self.reflection_gate,
+                tool_context=None, known_text=user_msg,
+            )
 
-        tool = intent.get("tool")
-        location = intent.get("location")
+        if self.orchestration == "router":
+            # ------------ INTENT ROUTING ------------
+            router_start = time.perf_counter()
 
-        tool_context_text = None
+            def speculate():
+                nonlocal speculation
+                if self.speculation_pool:
+                    speculation = SpeculativeStream(
+                        self.llm, self.speculation_pool, self.state.build_messages(cot_prompt=COT_PROMPT))
 
-        # ------------ TOOL LOGIC ------------
-        if tool in AVAILABLE_TOOLS and location:
-            self.logger.log("tool_call", {"tool": tool, "location": location})
+            intent = self.router.determine_intent(user_msg, default_location=memory.destination,
+                                                  before_llm=speculate)
+            timings["router_s"] = time.perf_counter() - router_start
+            self.logger.log("router_decision", intent)
+            # Places outside the gazetteer are only known once the router has read them
+            if not named and intent.get("tool") in ("weather", "attractions", "chat") and intent.get("location"):
+                memory.note_destination(resolve_city(intent["location"]) or intent["location"])
+            self.logger.log("session_memory", {"destination": memory.destination, "dates": memory.dates})
 
-            raw_output = AVAILABLE_TOOLS[tool](location)
-            self.logger.log("tool_raw_output", raw_output)
+            plan = plan_tool_calls(intent, user_msg)
 
-            # Format tool output so the LLM can use it well
-            if tool == "weather":
-                tool_context_text = format_weather_payload(raw_output)
-            elif tool == "attractions":
-                tool_context_text = format_attractions_payload(raw_output)
-            else:
-                tool_context_text = str(raw_output)
+            # ------------ ANSWER CACHE ------------
+            # A near-duplicate of a fresh, self-contained question skips tools,
+            # generation and reflection; the stored answer is streamed back
+            if self.answer_cache:
+                scope = cache_scope(intent, plan, user_msg, first_turn, canonical=resolve_city)
+                cached = self.answer_cache.get(scope, user_msg) if scope else None
+                self.logger.log("answer_cache", dict(
+                    {k: v for k, v in (cached or {}).items() if k != "answer"},
+                    scope=scope, hit=cached is not None))
+            yield TurnEvent(ROUTER_DECISION, {"intent": intent, "plan": plan, "cache_hit": bool(cached)})
 
-            self.logger.log("tool_formatted_context", {"text": tool_context_text})
+            # The speculative answer has no tool context: only a tool-free turn can use it
+            if speculation:
+                outcome = "cache_hit" if cached else "lost" if plan else "won"
+                if outcome != "won":
+                    speculation.cancel(outcome)
+                self.logger.log("speculation", {
+                    "outcome": outcome, "head_start_s": time.perf_counter() - speculation.started_at})
 
-        # ------------ BUILD LLM PROMPT ------------
-        messages = self.state.build_messages(
-            cot_prompt=COT_PROMPT,
-            tool_context=tool_context_text
-        )
+        if cached:
+            reflector = None
+            stream = (TurnEvent(CHUNK, {"text": text}) for text in replay_stream(cached["answer"]))
+        elif self.orchestration == "router":
+            # ------------ TOOL LOGIC ------------
+            # All validated calls run concurrently; latency is the slowest tool
+            if plan:
+                tools_start = time.perf_counter()
+                results = self._run_tools(plan)
+                timings["tools_s"] = time.perf_counter() - tools_start
+                for result in results:
+                    yield tool_event(result)
+
+                # Formatted outputs merged into one <tool_context> block
+                tool_context_text = merge_tool_context(results)
+                self.logger.log("tool_formatted_context", {"text": tool_context_text})
+                if reflector:
+                    reflector.tool_context = tool_context_text
+
+            # ------------ BUILD LLM PROMPT ------------
+            if speculation and not plan:
+                self.logger.log("prompt_to_llm", {"messages": speculation.messages, "speculative": True})
+                tokens = speculation.take()
+            else:
+                messages = self.state.build_messages(
+                    cot_prompt=COT_PROMPT,
+                    tool_context=tool_context_text
+                )
+                self.logger.log("prompt_to_llm", {"messages": messages})
+                tokens = self.llm.chat(messages, stream=True, temperature=0.4)
+            stream = (TurnEvent(CHUNK, {"text": text}) for text in tokens)
+        else:
+            messages = self.state.build_messages(cot_prompt=COT_PROMPT)
+            self.logger.log("prompt_to_llm", {"messages": messages, "tools": [
+                t["function"]["name"] for t in TOOL_SCHEMAS]})
+
+            def on_tool_context(text):
+                nonlocal tool_context_text
+                tool_context_text = text
+                if reflector:
+                    reflector.tool_context = text
 
-        self.logger.log("prompt_to_llm", {"messages": messages})
+            stream = self._native_stream(messages, user_msg, on_tool_context, timings)
 
         # ------------ STREAM LLM RESPONSE ------------
-        print("\nAssistant:")
-        final_text = ""
+        coalescer = ChunkCoalescer(max_chars=coalesce_chars, max_interval=coalesce_s)
+        first_chunk_at = None
 
-        for chunk in self.llm.chat(messages, stream=True, temperature=0.4):
-            final_text += chunk
-            print(chunk, end="", flush=True)
+        generation_start = time.perf_counter()
+        # paced() yields None when buffered text is due while the stream is idle
+        for event in paced(stream, coalescer.wait_time):
+            if event is None:
+                text = coalescer.due()
+                if text:
+                    yield TurnEvent(CHUNK, {"text": text})
+                continue
+            if event.type != CHUNK:
+                yield event
+                continue
+            chunk = event.data["text"]
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            if reflector:
+                reflector.feed(chunk)
+            text = coalescer.add(chunk)
+            if text:
+                yield TurnEvent(CHUNK, {"text": text})
+        text = coalescer.flush()
+        if text:
+            yield TurnEvent(CHUNK, {"text": text})
+        final_text = coalescer.text()
+        generation_s = time.perf_counter() - generation_start
 
-        # Log each streaming chunk  NOPE
         self.logger.log("llm_stream_chunks", {"all chunks": final_text})
 
         # ------------ REFLECTION / SAFETY PASS ------------
-        reflection = apply_reflection(self.llm, final_text)
+        if cached:
+            # Stored answers were reflected when they were generated
+            reflection = final_text
+        elif reflector:
+            reflection = reflector.finish()
+        else:
+            reflection = apply_reflection(
+                self.llm, final_text, gate=self.reflection_gate,
+                tool_context=tool_context_text, known_text=user_msg,
+            )
+        time_to_final_s = time.perf_counter() - generation_start
+
         self.logger.log("reflection_output", {"reflection": reflection})
+        self.logger.log("reflection_timing", {
+            "mode": self.reflection_mode,
+            "generation_s": generation_s,
+            "reflection_wait_s": time_to_final_s - generation_s,
+            "time_to_final_s": time_to_final_s,
+            "segments": reflector.segments_submitted if reflector else (0 if cached else 1),
+        })
+        if self.reflection_gate:
+            self.logger.log("reflection_gate", self.reflection_gate.stats())
+        yield TurnEvent(REFLECTION, {"text": reflection, "changed": reflection != final_text,
+                                     "mode": "cached" if cached else self.reflection_mode})
+
+        # generation_s spans the whole answer stream (including native tool rounds)
+        timing = dict(
+            timings,
+            cache_hit=bool(cached),
+            ttft_s=first_chunk_at - turn_start if first_chunk_at else None,
+            generation_s=generation_s,
+            reflection_s=time_to_final_s - generation_s,
+            total_s=time.perf_counter() - turn_start,
+        )
+        self.logger.log("turn_timing", timing)
+        for key, seconds in timing.items():
+            if key.endswith("_s") and seconds is not None:
+                TURN_STAGE.observe(seconds, stage=key[:-2])
+        TURNS.inc(orchestration=self.orchestration, cache_hit=str(bool(cached)).lower())
+
+        # Only answers whose tool lookups all succeeded are worth replaying,
+        # and only for as long as their oldest result stays fresh
+        if scope and not cached and all(r["status"] == "ok" for r in results):
+            data_age_s = max((result_age(r) for r in results), default=0.0)
+            self.answer_cache.put(scope, user_msg, reflection, data_age_s=data_age_s)
 
         # Save final assistant output
         self.state.add_assistant(reflection)
         self.logger.log("assistant_final", {"text": reflection})
 
-        print("\n" + "-" * 60)
-
-        return reflection  # optional, useful for testing harness
-
+        yield TurnEvent(FINAL, {"text": reflection, "timing": timing})
 
 if __name__ == "__main__":
+    from warmup import Prewarmer
+
     bot = TravelAssistant()
+    # Connections open while the first message is being typed
+    Prewarmer(bot.llm).start()
 
     while True:
         user = input("You: ")
@@ -103,5 +423,13 @@ if __name__ == "__main__":
             print("Goodbye!")
             break
 
-        bot.run_turn(user)
+        # The CLI is just another consumer of the event stream
+        print("\nAssistant:")
+        for event in bot.stream_turn(user):
+            if event.type == CHUNK:
+                print(event.data["text"], end="", flush=True)
+            elif event.type == REFLECTION and event.data["changed"]:
+                print("\n\n[Revised after review]\n" + event.data["text"])
+        print("\n" + "-" * 60)
     bot.logger.save()
+    bot.logger.close()
@@ -0,0 +1,100 @@
+# bench_orchestration.py
+"""
+Router vs native tool-calling orchestration against a local fake LLM backend.
+
+Every fake LLM response costs --latency seconds before its first byte, so
+each sequential LLM round-trip shows up in turn latency. Modes:
+
+- router:        IntentRouter (local tier, then JSON LLM call) + streamed answer
+- router-no-local: same, with the local tier disabled (every turn pays the router call)
+- native:        one streamed completion with tool schemas; tools run, generation continues
+
+    python bench_orchestration.py --rounds 5 --latency 0.3
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from assistant import TravelAssistant
+from fake_servers import FakeLLMServer
+from intent_classifier import LocalIntentClassifier
+from llm_client import LLMClient
+from turn_events import CHUNK
+from utils import EventLogger, percentiles
+
+MESSAGES = [
+    "Hi there!",
+    "What's the weather like in Paris right now?",
+    "Any must-see attractions in Rome and Tokyo?",
+    "Do I need a visa for a short holiday in Spain?",
+    "Somewhere sunny with great food for a long weekend?",
+]
+
+
+class ScriptedLLM(FakeLLMServer):
+    """Decides tools from the latest user message, identically for both modes."""
+
+    classifier = LocalIntentClassifier()
+
+    def router_decision(self, messages) -> dict:
+        text = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+        calls = []
+        lowered = text.lower()
+        for city in self.classifier.find_cities(text):
+            if "weather" in lowered:
+                calls.append({"tool": "weather", "location": city})
+            if "attraction" in lowered or "see" in lowered:
+                calls.append({"tool": "attractions", "location": city})
+        if "visa" in lowered:
+            calls.append({"tool": "kb_search", "query": "visa requirements"})
+        tool = calls[0]["tool"] if calls else "chat"
+        return {"tool": tool, "location": calls[0].get("location") if calls else None, "calls": calls}
+
+
+def run_mode(mode, server, rounds):
+    llm = LLMClient(api_key="fake", base_url=server.url)
+    latencies, ttfts = [], []
+    before = Counter(server.calls)
+
+    for _ in range(rounds):
+        bot = TravelAssistant(llm=llm, logger=EventLogger(), router_cache=False,
+                              orchestration="native" if mode == "native" else "router")
+        if mode == "router-no-local":
+            bot.router.local = None
+        for message in MESSAGES:
+            first = None
+            start = time.perf_counter()
+            for event in bot.stream_turn(message):
+                if event.type == CHUNK and first is None:
+                    first = time.perf_counter()
+            latencies.append(time.perf_counter() - start)
+            if first:
+                ttfts.append(first - start)
+
+    calls = Counter(server.calls)
+    calls.subtract(before)
+    turns = rounds * len(MESSAGES)
+    ms = lambda d: {k: round(v * 1000, 1) for k, v in d.items()}
+    return {
+        "mode": mode,
+        "llm_calls_per_turn": round(sum(calls.values()) / turns, 2),
+        "calls": {k: v for k, v in calls.items() if v},
+        "turn_ms": ms(dict(percentiles(latencies), mean=sum(latencies) / len(latencies))),
+        "ttft_ms": ms(percentiles(ttfts)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="conversations per mode")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first byte")
+    args = parser.parse_args()
+
+    with ScriptedLLM(ttft=args.latency) as server:
+        for mode in ("router", "router-no-local", "native"):
+            print(run_mode(mode, server, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
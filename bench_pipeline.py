@@ -0,0 +1,218 @@
+# bench_pipeline.py
+"""
+Per-stage latency benchmark for TravelAssistant.run_turn, no API keys needed.
+
+Runs the TEST_CONVERSATIONS scripts plus a few tool-heavy ones (--repeat
+times, --concurrency at once, one assistant per conversation sharing one
+LLMClient) against an LLM backend:
+
+- default:        synthetic ReplayBackend with lognormal time-to-first-token
+                  and a fixed token rate
+- --replay PATH:  responses recorded by RecordingBackend, with their timing
+- --record PATH:  live Groq calls (GROQ_TRAVEL_API_KEY), recorded to PATH
+
+Reports router, tool, first-token, generation, reflection and total turn
+time percentiles (ms) from the "turn_timing" events. --save writes them as a
+JSON baseline; --compare checks a run against one and exits 1 on regression.
+--metrics PATH writes the run's metrics registry (LLM latency and tokens
+per stage, tool calls, cache hit ratios) in Prometheus text format.
+--speculative starts the answer while the router's LLM tier runs and
+reports the speculation win rate and wasted tokens.
+
+    python bench_pipeline.py --save baselines/pipeline.json
+    python bench_pipeline.py --compare baselines/pipeline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import AnswerCache
+from assistant import TravelAssistant
+from intent_classifier import LocalIntentClassifier
+from llm_backends import GroqBackend, RecordingBackend, ReplayBackend, lognormal
+from llm_client import LLMClient
+from metrics import REGISTRY, SPECULATIONS, SPECULATION_WASTED_TOKENS
+from test_conversations import TEST_CONVERSATIONS
+from tool_executor import ToolExecutor
+from tools import AVAILABLE_TOOLS
+from utils import EventLogger, percentiles
+
+# The test scripts plus turns that exercise the tools
+BENCH_CONVERSATIONS = TEST_CONVERSATIONS + [
+    ["What's the weather in Paris?", "And top attractions in Rome and Tokyo?", "Do I need a visa?"],
+    ["Weather in London and New York?", "What should I see in London?"],
+]
+
+STAGES = ("router_s", "tools_s", "ttft_s", "generation_s", "reflection_s", "total_s")
+
+# Alternating answers: one the grounding gate passes, one it sends to reflection
+ANSWERS = [
+    "Happy to help! Spring and autumn are lovely times to visit, with mild days and fewer crowds. "
+    "Would you like ideas for where to stay?",
+    "A good base is the old town; rooms there start around $120 per night and the museum pass costs "
+    "about 35 euros. Want me to suggest a day-by-day plan?",
+]
+
+
+class SyntheticTravelLLM(ReplayBackend):
+    """Synthetic backend whose routing/tool decisions come from the local classifier."""
+
+    classifier = LocalIntentClassifier()
+
+    def _last_user(self, messages):
+        return next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+    def router_decision(self, messages) -> dict:
+        return self.classifier.classify(self._last_user(messages))[0]
+
+    def tool_calls_for(self, messages) -> list:
+        calls = self.router_decision(messages).get("calls") or []
+        return [{"name": c["tool"],
+                 "arguments": {k: v for k, v in c.items() if k in ("location", "query") and v}}
+                for c in calls if c.get("tool")]
+
+    def answer_for(self, messages) -> str:
+        turn = sum(1 for m in messages if m["role"] == "user")
+        return ANSWERS[turn % len(ANSWERS)]
+
+
+def delayed_tools(sampler, seed):
+    """Tools with sampled latency, seeded per call so thread order does not change the draws."""
+    seen = Counter()
+    lock = threading.Lock()
+
+    def wrap(name, fn):
+        def tool(arg):
+            with lock:
+                seen[(name, arg)] += 1
+                n = seen[(name, arg)]
+            time.sleep(sampler(random.Random(f"{seed}:{name}:{arg}:{n}")))
+            return fn(arg)
+        return tool
+    return {name: wrap(name, fn) for name, fn in AVAILABLE_TOOLS.items()}
+
+
+def build_backend(args):
+    if args.record:
+        return RecordingBackend(GroqBackend(), args.record)
+    if args.replay:
+        return ReplayBackend(recording=args.replay, seed=args.seed)
+    return SyntheticTravelLLM(ttft=lognormal(args.ttft_median, args.ttft_p99),
+                              tokens_per_second=args.tokens_per_second, seed=args.seed)
+
+
+def run(args) -> dict:
+    backend = build_backend(args)
+    llm = LLMClient(backend=backend)
+    tools = ToolExecutor(tools=delayed_tools(lognormal(args.tool_median, args.tool_p99), args.seed))
+    conversations = BENCH_CONVERSATIONS * args.repeat
+    answer_cache = AnswerCache() if args.answer_cache else None
+    REGISTRY.reset()
+
+    def converse(script):
+        bot = TravelAssistant(llm=llm, tool_executor=tools, logger=EventLogger(), router_cache=False,
+                              reflection_mode=args.reflection_mode, orchestration=args.orchestration,
+                              answer_cache=answer_cache, speculative=args.speculative)
+        for message in script:
+            bot.run_turn(message)
+        return [e["data"] for e in bot.logger.export() if e["type"] == "turn_timing"]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        timings = [t for turns in pool.map(converse, conversations) for t in turns]
+    wall = time.perf_counter() - start
+
+    stages = {}
+    for stage in STAGES:
+        values = [t[stage] for t in timings if t.get(stage) is not None]
+        stages[stage] = {k: round(v * 1000, 2) for k, v in percentiles(values).items()}
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "metrics")},
+        "turns": len(timings),
+        "wall_s": round(wall, 2),
+        "turns_per_s": round(len(timings) / wall, 2),
+        "stages_ms": stages,
+        "backend": backend.stats() if hasattr(backend, "stats") else {},
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "speculation": speculation_stats() if args.speculative else None,
+    }
+
+
+def speculation_stats() -> dict:
+    outcomes = {k[0]: v for k, v in SPECULATIONS.values().items()}
+    started = sum(outcomes.values())
+    return dict(outcomes, started=started,
+                win_rate=round(outcomes.get("won", 0) / started, 3) if started else None,
+                wasted_tokens={k[0]: v for k, v in SPECULATION_WASTED_TOKENS.values().items()})
+
+
+def compare(result, baseline, tolerance, min_delta_ms=5.0) -> list:
+    """Stage percentiles slower than baseline by more than tolerance (and min_delta_ms)."""
+    regressions = []
+    for stage, base in baseline["stages_ms"].items():
+        current = result["stages_ms"].get(stage, {})
+        for p, base_ms in base.items():
+            now_ms = current.get(p)
+            if now_ms is None:
+                continue
+            if now_ms > base_ms * (1 + tolerance) and now_ms - base_ms > min_delta_ms:
+                regressions.append(f"{stage} {p}: {base_ms} -> {now_ms} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the conversation scripts")
+    parser.add_argument("--concurrency", type=int, default=8, help="conversations in flight")
+    parser.add_argument("--ttft-median", type=float, default=0.25)
+    parser.add_argument("--ttft-p99", type=float, default=1.0)
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--tool-median", type=float, default=0.05)
+    parser.add_argument("--tool-p99", type=float, default=0.5)
+    parser.add_argument("--reflection-mode", choices=["post", "incremental"], default="post")
+    parser.add_argument("--orchestration", choices=["router", "native"], default="router")
+    parser.add_argument("--answer-cache", action="store_true", help="share one AnswerCache across conversations")
+    parser.add_argument("--speculative", action="store_true", help="start answers while the router's LLM tier runs")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--record", metavar="PATH", help="record live Groq traffic to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recording instead of synthetic responses")
+    parser.add_argument("--metrics", metavar="PATH", help="write the metrics registry (Prometheus text) to PATH")
+    parser.add_argument("--save", metavar="PATH", help="write the result as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+
+    if args.metrics:
+        REGISTRY.dump(args.metrics)
+        print(f"metrics written to {args.metrics}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench_server.py
+"""
+Load test for server.py against a local fake LLM backend.
+
+Opens --sessions concurrent sessions, sends --turns messages in each and
+reports sessions/sec plus time-to-first-token and full-turn percentiles.
+
+    python bench_server.py --sessions 200 --turns 3 --ttft 0.2 --token-delay 0.005
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fake_servers import FakeLLMServer
+from llm_client import LLMClient
+from server import TravelServer
+from utils import percentiles
+
+MESSAGES = ["Hi", "I want somewhere warm in March", "What should I pack?"]
+
+
+async def _request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    return reader, writer
+
+
+async def _read_headers(reader):
+    status = int((await reader.readline()).split()[1])
+    while (await reader.readline()).strip():
+        pass
+    return status
+
+
+async def create_session(port) -> str:
+    reader, writer = await _request(port, "POST", "/sessions")
+    await _read_headers(reader)
+    data = json.loads(await reader.read())
+    writer.close()
+    return data["session_id"]
+
+
+async def send_message(port, session_id, message):
+    """Returns (ttft_seconds, total_seconds, final_text)."""
+    start = time.perf_counter()
+    reader, writer = await _request(port, "POST", f"/sessions/{session_id}/messages", {"message": message})
+    await _read_headers(reader)
+
+    ttft, event, final = None, None, None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        line = line.decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            if event == "chunk" and ttft is None:
+                ttft = time.perf_counter() - start
+            if event in ("final", "error"):
+                final = json.loads(line[6:])
+                break
+    writer.close()
+    return ttft, time.perf_counter() - start, final
+
+
+async def run_load(port, sessions, turns):
+    ttfts, totals = [], []
+
+    async def one_session():
+        session_id = await create_session(port)
+        for i in range(turns):
+            ttft, total, _ = await send_message(port, session_id, MESSAGES[i % len(MESSAGES)])
+            if ttft is not None:
+                ttfts.append(ttft)
+            totals.append(total)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_session() for _ in range(sessions)))
+    return time.perf_counter() - start, ttfts, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-concurrent-turns", type=int, default=64)
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM latency before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="fake LLM delay per streamed word")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="serve repeated first-turn questions from the shared answer cache")
+    args = parser.parse_args()
+
+    with FakeLLMServer(ttft=args.ttft, token_delay=args.token_delay) as fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        llm = LLMClient(api_key="fake", base_url=fake.url)
+        server = TravelServer(llm=llm, port=0, max_concurrent_turns=args.max_concurrent_turns,
+                              session_db=os.path.join(tmp, "sessions.db"), answer_cache=args.answer_cache)
+        server.start_in_thread()
+
+        wall, ttfts, totals = asyncio.run(run_load(server.port, args.sessions, args.turns))
+
+        ms = lambda d: {k: round(v * 1000, 1) for k, v in d.items()}
+        print(f"sessions={args.sessions} turns/session={args.turns} "
+              f"max_concurrent_turns={args.max_concurrent_turns}")
+        print(f"wall={wall:.2f}s  sessions/sec={args.sessions / wall:.1f}  "
+              f"turns/sec={len(totals) / wall:.1f}")
+        print(f"time-to-first-token ms: {ms(percentiles(ttfts))}")
+        print(f"full turn ms:           {ms(percentiles(totals))}")
+        print(f"upstream LLM calls: {dict(fake.calls)}")
+        if server.answer_cache:
+            print(f"answer cache: {server.answer_cache.stats()}")
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
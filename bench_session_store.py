@@ -0,0 +1,135 @@
+# bench_session_store.py
+"""
+Resident memory and turn latency while cycling through many simulated sessions.
+
+Pass 1 opens --sessions new sessions and runs one turn in each.
+Pass 2 revisits --revisits random earlier sessions (cold ones are rehydrated).
+Each mode runs in its own subprocess so RSS numbers are independent:
+
+- store:  HotSessionCache (max --max-hot in memory) + SQLiteSessionStore
+- memory: every StateManager kept in a dict (the pre-store behaviour)
+
+    python bench_session_store.py --sessions 100000 --max-hot 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from prompts import COT_PROMPT, SYSTEM_PROMPT
+from session_store import HotSessionCache, SQLiteSessionStore
+from state_manager import StateManager
+from utils import percentiles
+
+ANSWER = ("Tokyo in spring is lovely: cherry blossoms peak in early April. Pack layers, "
+          "comfortable walking shoes and a light rain jacket. Would you like some ideas "
+          "for day trips as well?")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        # ru_maxrss is KB on Linux, bytes on macOS; peak rather than current
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def simulated_turn(state: StateManager, i: int):
+    state.add_user(f"Message {i}: what should I pack for Tokyo?")
+    state.build_messages(cot_prompt=COT_PROMPT)
+    state.add_assistant(ANSWER)
+
+
+def run_mode(mode, sessions, revisits, max_hot, db_path):
+    new_state = lambda: StateManager(system_prompt=SYSTEM_PROMPT)
+
+    if mode == "store":
+        store = SQLiteSessionStore(db_path)
+        cache = HotSessionCache(
+            store,
+            rehydrate=lambda sid, data: new_state().restore(data),
+            snapshot=lambda state: state.to_dict(),
+            max_hot=max_hot,
+        )
+        get = cache.get
+        add = cache.add
+        persist = cache.persist
+    else:
+        table = {}
+        get = table.get
+        add = table.__setitem__
+        persist = lambda sid, state: None
+
+    rss_start = rss_mb()
+    new_latencies, revisit_latencies, rss_samples = [], [], []
+
+    for i in range(sessions):
+        start = time.perf_counter()
+        state = new_state()
+        add(f"s{i}", state)
+        simulated_turn(state, i)
+        persist(f"s{i}", state)
+        new_latencies.append(time.perf_counter() - start)
+        if i % max(1, sessions // 10) == 0:
+            rss_samples.append(round(rss_mb(), 1))
+
+    rng = random.Random(7)
+    for i in range(revisits):
+        sid = f"s{rng.randrange(sessions)}"
+        start = time.perf_counter()
+        state = get(sid)
+        simulated_turn(state, i)
+        persist(sid, state)
+        revisit_latencies.append(time.perf_counter() - start)
+
+    result = {
+        "mode": mode,
+        "sessions": sessions,
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+        "rss_samples_mb": rss_samples,
+        "new_turn_us": {k: round(v * 1e6, 1) for k, v in percentiles(new_latencies).items()},
+        "revisit_turn_us": {k: round(v * 1e6, 1) for k, v in percentiles(revisit_latencies).items()},
+    }
+    if mode == "store":
+        store.flush()
+        result.update(cache.stats(), persisted=store.count())
+        store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    parser.add_argument("--revisits", type=int, default=20_000)
+    parser.add_argument("--max-hot", type=int, default=1000)
+    parser.add_argument("--mode", choices=["both", "store", "memory"], default="both")
+    args = parser.parse_args()
+
+    if args.mode != "both":
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run_mode(args.mode, args.sessions, args.revisits, args.max_hot,
+                              os.path.join(tmp, "sessions.db"))
+        print(json.dumps(result))
+        return
+
+    for mode in ("memory", "store"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--sessions", str(args.sessions),
+             "--revisits", str(args.revisits), "--max-hot", str(args.max_hot)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        print(json.dumps(json.loads(out.strip().splitlines()[-1]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
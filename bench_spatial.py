@@ -0,0 +1,101 @@
+# bench_spatial.py
+"""
+Query latency of the "nearby" spatial index as the POI count grows.
+
+Synthetic POIs are clustered around city centres (--per-city POIs each,
+spread over a few km), so a bigger dataset means more cities, as with a
+real dump. For each size it builds a SpatialIndex and times k-nearest,
+radius and category-filtered queries around random POIs, next to a
+brute-force scan of all points for reference.
+
+    python bench_spatial.py --sizes 1000 10000 100000 1000000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from spatial_index import SpatialIndex, haversine_km
+from utils import percentiles
+
+CATEGORIES = 8
+
+
+def synthetic_pois(n, per_city, rng):
+    cities = max(1, n // per_city)
+    centre_lat = rng.uniform(-55, 65, cities)
+    centre_lon = rng.uniform(-180, 180, cities)
+    owner = rng.integers(0, cities, n)
+    lat = centre_lat[owner] + rng.normal(0, 0.03, n)
+    lon = (centre_lon[owner] + rng.normal(0, 0.04, n) + 180) % 360 - 180
+    return lat, lon, rng.integers(0, CATEGORIES, n)
+
+
+def timed(fn, queries):
+    times = []
+    for lat, lon in queries:
+        start = time.perf_counter()
+        fn(lat, lon)
+        times.append(time.perf_counter() - start)
+    return {k: round(v * 1e6, 1) for k, v in percentiles(times).items()}
+
+
+def run_size(n, args, rng) -> dict:
+    lat, lon, category = synthetic_pois(n, args.per_city, rng)
+    start = time.perf_counter()
+    index = SpatialIndex(lat, lon, category, cell_deg=args.cell_deg)
+    build_s = time.perf_counter() - start
+
+    # Query points a few hundred metres from random POIs
+    picks = rng.integers(0, n, args.queries)
+    queries = list(zip(lat[picks] + rng.normal(0, 0.003, args.queries),
+                       lon[picks] + rng.normal(0, 0.003, args.queries)))
+    found = [len(index.radius(q[0], q[1], args.radius_km)[0]) for q in queries[:200]]
+
+    def brute(q_lat, q_lon):
+        distances = haversine_km(q_lat, q_lon, lat, lon)
+        return np.argpartition(distances, 9)[:10]
+
+    return {
+        "pois": n,
+        "cells": len(index.cell_keys),
+        "build_ms": round(build_s * 1000, 1),
+        "mean_in_radius": round(float(np.mean(found)), 1),
+        "us": {
+            "nearest_k10": timed(lambda a, b: index.nearest(a, b, k=10), queries),
+            f"radius_{args.radius_km}km": timed(lambda a, b: index.radius(a, b, args.radius_km), queries),
+            "nearest_k5_category": timed(lambda a, b: index.nearest(a, b, k=5, category=3), queries),
+            "brute_force_k10": timed(brute, queries[:args.brute_queries]),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--per-city", type=int, default=500, help="POIs per synthetic city")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--brute-queries", type=int, default=50)
+    parser.add_argument("--radius-km", type=float, default=1.0)
+    parser.add_argument("--cell-deg", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = [run_size(n, args, rng) for n in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'POIs':>9} {'cells':>8} {'build ms':>9} {'in radius':>9}  "
+          + "  ".join(f"{name} p50/p99 us" for name in results[0]["us"]))
+    for r in results:
+        cols = "  ".join(f"{t['p50']:>8}/{t['p99']:<8}".rjust(len(name) + 12) for name, t in r["us"].items())
+        print(f"{r['pois']:>9} {r['cells']:>8} {r['build_ms']:>9} {r['mean_in_radius']:>9}  {cols}")
+
+
+if __name__ == "__main__":
+    main()
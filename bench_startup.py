@@ -0,0 +1,110 @@
+# bench_startup.py
+"""
+Cold-start cost of a worker: import time, assistant construction time and
+the first turn's time-to-first-token, each run in a fresh interpreter.
+
+Local stand-in servers replace Groq and OpenWeather; --connect-delay is
+paid once per new connection, standing in for the DNS/TCP/TLS setup of
+the real APIs. The first message ("What's the weather in Paris?") needs
+both: a weather lookup, then the streamed answer.
+
+- cold:    nothing happens before the first message
+- prewarm: a Prewarmer (warmup.py) starts right after construction, and
+           the first message arrives --idle-s later, as on a fresh pod
+
+    python bench_startup.py --runs 5 --connect-delay 0.1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = ("cold", "prewarm")
+
+
+def child(args):
+    """One worker start; prints its timings as JSON."""
+    start = time.perf_counter()
+    import tools
+    from assistant import TravelAssistant
+    from llm_client import LLMClient
+    from turn_events import CHUNK
+    from utils import EventLogger
+    from warmup import Prewarmer
+    import_s = time.perf_counter() - start
+
+    tools.WEATHER_SERVICE.base_url = args.weather_url
+    start = time.perf_counter()
+    bot = TravelAssistant(llm=LLMClient(api_key="fake", base_url=args.llm_url),
+                          router_cache=False, logger=EventLogger())
+    construct_s = time.perf_counter() - start
+    if args.mode == "prewarm":
+        Prewarmer(bot.llm).start()
+
+    time.sleep(args.idle_s)
+    start = time.perf_counter()
+    ttft_s = None
+    for event in bot.stream_turn(args.message):
+        if event.type == CHUNK and ttft_s is None:
+            ttft_s = time.perf_counter() - start
+    first_turn_s = time.perf_counter() - start
+    print(json.dumps({"import_ms": import_s * 1000, "construct_ms": construct_s * 1000,
+                      "first_ttft_ms": ttft_s * 1000, "first_turn_ms": first_turn_s * 1000}))
+
+
+def run_child(args, mode, llm_url, weather_url) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--mode", mode,
+               "--llm-url", llm_url, "--weather-url", weather_url,
+               "--idle-s", str(args.idle_s), "--message", args.message]
+    env = dict(os.environ, OPENWEATHER_API_KEY="fake")
+    out = subprocess.run(command, capture_output=True, text=True, env=env, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--connect-delay", type=float, default=0.1, help="seconds per new upstream connection")
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--idle-s", type=float, default=1.0, help="pause before the first message")
+    parser.add_argument("--message", default="What's the weather in Paris?")
+    parser.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    # Internal: one measured worker start
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, default="cold", help=argparse.SUPPRESS)
+    parser.add_argument("--llm-url", help=argparse.SUPPRESS)
+    parser.add_argument("--weather-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    from fake_servers import FakeLLMServer, FakeWeatherServer
+    from utils import percentiles
+
+    results = {}
+    with FakeLLMServer(ttft=args.ttft, token_delay=args.token_delay, connect_delay=args.connect_delay) as llm, \
+            FakeWeatherServer(connect_delay=args.connect_delay) as weather:
+        for mode in args.modes:
+            runs = [run_child(args, mode, llm.url, weather.weather_url) for _ in range(args.runs)]
+            results[mode] = {metric: {k: round(v, 1) for k, v in percentiles([r[metric] for r in runs]).items()}
+                             for metric in runs[0]}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    metrics = list(next(iter(results.values())))
+    print(f"{'mode':<8} " + "  ".join(f"{m + ' p50/p90':>24}" for m in metrics))
+    for mode, r in results.items():
+        print(f"{mode:<8} " + "  ".join(f"{r[m]['p50']:>15}/{r[m]['p90']:<8}" for m in metrics))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# eval_runner.py
+"""
+Parallel evaluation of scripted conversations.
+
+- run(): every conversation gets its own TravelAssistant (no history leaks
+  between scripts) on a bounded worker pool; answers and tool results are
+  read from the stream_turn() events, nothing is read from stdout
+- score(): one JSON-mode LLM call per conversation (map), in parallel
+- reduce_scores(): aggregates the per-conversation scores into one report
+
+The LLM client, tool executor and router cache are shared, so rate limits
+and connection pools apply to the whole run.
+
+    python eval_runner.py --workers 16 --repeat 100 --synthetic -o eval_report.json
+"""
+
+import datetime
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant import TravelAssistant
+from llm_client import LLMClient
+from llm_scheduler import Priority
+from prompts import EVAL_SCORING_PROMPT
+from router_cache import RouterCache
+from tool_executor import ToolExecutor
+from turn_events import TOOL_RESULT, FINAL
+from utils import EventLogger, percentiles
+
+SCORE_METRICS = ("quality", "accuracy", "domain_consistency")
+
+
+class EvalRunner:
+    def __init__(self, llm=None, max_workers=8, assistant_options=None, max_chars_per_message=1500,
+                 save_traces=False):
+        self.llm = llm or LLMClient()
+        self.max_workers = max_workers
+        self.assistant_options = assistant_options or {}
+        # save_traces writes each conversation's event trace (EventLogger.save)
+        self.save_traces = save_traces
+        # Scoring prompts stay bounded however long a conversation gets
+        self.max_chars_per_message = max_chars_per_message
+        self.tools = ToolExecutor()
+        self.router_cache = RouterCache()
+
+    # ------------ RUN (one assistant per conversation) ------------
+
+    def run_conversation(self, conv_id, script) -> dict:
+        bot = TravelAssistant(llm=self.llm, tool_executor=self.tools, router_cache=self.router_cache,
+                              logger=EventLogger(), **self.assistant_options)
+        log = {"id": conv_id, "turns": []}
+        try:
+            for user_msg in script:
+                turn = {"user": user_msg, "tools": []}
+                for event in bot.stream_turn(user_msg):
+                    if event.type == TOOL_RESULT:
+                        turn["tools"].append(f"{event.data['tool']}({event.data['arg']}): {event.data['status']}")
+                    elif event.type == FINAL:
+                        turn["assistant"] = event.data["text"]
+                        turn["total_s"] = round(event.data["timing"]["total_s"], 3)
+                log["turns"].append(turn)
+        except Exception as e:
+            # One broken conversation must not sink the whole run
+            print(f"[Eval Error]: conversation {conv_id}: {e}")
+            log["error"] = str(e)
+        finally:
+            bot.close()
+            if self.save_traces:
+                self._save_trace(bot, log)
+        return log
+
+    def _save_trace(self, bot, log):
+        stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = f"conversation_trace_{stamp}_{log['id']:02d}.json"
+        try:
+            bot.logger.save(path)
+            log["trace"] = path
+        except OSError as e:
+            print(f"[Eval Error]: saving trace of conversation {log['id']}: {e}")
+
+    def run(self, conversations) -> list:
+        """conversations: iterable of scripts (lists of user messages); results keep input order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="eval") as pool:
+            return list(pool.map(lambda item: self.run_conversation(*item), enumerate(conversations, start=1)))
+
+    # ------------ MAP: score each conversation ------------
+
+    def _clip(self, text):
+        text = text or ""
+        limit = self.max_chars_per_message
+        return text if len(text) <= limit else text[:limit] + " [...]"
+
+    def score_conversation(self, log: dict) -> dict:
+        if log.get("error"):
+            return {"id": log["id"], "error": log["error"]}
+        transcript = [{"user": self._clip(t["user"]), "assistant": self._clip(t["assistant"])}
+                      for t in log["turns"]]
+        messages = [
+            {"role": "system", "content": EVAL_SCORING_PROMPT},
+            {"role": "user", "content": json.dumps(transcript, ensure_ascii=False)}
+        ]
+        try:
+            result = self.llm.chat(messages, json_mode=True, temperature=0, priority=Priority.OFFLINE)
+        except Exception as e:
+            print(f"[Eval Error]: scoring conversation {log['id']}: {e}")
+            return {"id": log["id"], "error": str(e)}
+        return dict(normalize_score(result), id=log["id"])
+
+    def score(self, logs: list) -> list:
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="eval-score") as pool:
+            return list(pool.map(self.score_conversation, logs))
+
+    # ------------ FULL PIPELINE ------------
+
+    def evaluate(self, conversations) -> dict:
+        start = time.perf_counter()
+        logs = self.run(conversations)
+        run_s = time.perf_counter() - start
+        scores = self.score(logs)
+        report = reduce_scores(scores)
+        turns = [t for log in logs for t in log["turns"]]
+        report["run"] = {
+            "conversations": len(logs),
+            "turns": len(turns),
+            "run_s": round(run_s, 2),
+            "score_s": round(time.perf_counter() - start - run_s, 2),
+            "turn_ms": {k: None if v is None else round(v * 1000, 1) for k, v in
+                        percentiles([t["total_s"] for t in turns if "total_s" in t]).items()},
+        }
+        return {"report": report, "logs": logs, "scores": scores}
+
+
+def normalize_score(result) -> dict:
+    """Coerce an LLM score object into the expected fields; bad values become None/[]."""
+    result = result if isinstance(result, dict) else {}
+    score = {}
+    for metric in SCORE_METRICS:
+        value = result.get(metric)
+        score[metric] = float(value) if isinstance(value, (int, float)) and 0 <= value <= 10 else None
+    for field in ("hallucinations", "improvements"):
+        items = result.get(field)
+        score[field] = [str(i) for i in items if i] if isinstance(items, list) else []
+    score["notes"] = str(result.get("notes") or "")
+    return score
+
+
+# ------------ REDUCE ------------
+
+def reduce_scores(scores: list, worst=10, top_improvements=10) -> dict:
+    scored = [s for s in scores if "error" not in s]
+    report = {
+        "conversations": len(scores),
+        "scored": len(scored),
+        "failed": [s["id"] for s in scores if "error" in s],
+        "metrics": {},
+    }
+    for metric in SCORE_METRICS:
+        values = [s[metric] for s in scored if s.get(metric) is not None]
+        if values:
+            report["metrics"][metric] = dict(
+                mean=round(sum(values) / len(values), 2), min=min(values),
+                **{k: round(v, 2) for k, v in percentiles(values, ps=(10, 50)).items()},
+            )
+
+    flagged = [s for s in scored if s["hallucinations"]]
+    report["hallucination_rate"] = round(len(flagged) / len(scored), 3) if scored else None
+    report["hallucinations"] = [{"id": s["id"], "claims": s["hallucinations"]} for s in flagged[:20]]
+
+    ranked = sorted((s for s in scored if s.get("quality") is not None), key=lambda s: s["quality"])
+    report["lowest_quality"] = [{"id": s["id"], "quality": s["quality"], "notes": s["notes"]}
+                                for s in ranked[:worst]]
+
+    suggestions = Counter(i.strip().lower().rstrip(".") for s in scored for i in s["improvements"])
+    report["top_improvements"] = suggestions.most_common(top_improvements)
+    return report
+
+
+def render_markdown(report: dict) -> str:
+    lines = ["# Conversation Evaluation", "",
+             f"Scored {report['scored']} of {report['conversations']} conversations."]
+    if report["failed"]:
+        lines.append(f"Failed: {', '.join(map(str, report['failed']))}")
+    lines += ["", "| Metric | Mean | Min | p10 | p50 |", "|---|---|---|---|---|"]
+    for metric, m in report["metrics"].items():
+        lines.append(f"| {metric} | {m['mean']} | {m['min']} | {m['p10']} | {m['p50']} |")
+    if report["hallucination_rate"] is not None:
+        lines += ["", f"Hallucination rate: {report['hallucination_rate']:.1%}"]
+    for item in report["hallucinations"]:
+        lines.append(f"- #{item['id']}: " + "; ".join(item["claims"]))
+    lines += ["", "## Lowest quality"]
+    lines += [f"- #{w['id']} ({w['quality']}): {w['notes']}" for w in report["lowest_quality"]]
+    lines += ["", "## Top improvements"]
+    lines += [f"- {text} ({count}x)" for text, count in report["top_improvements"]]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    import argparse
+    from llm_backends import ReplayBackend
+    from test_conversations import TEST_CONVERSATIONS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="copies of TEST_CONVERSATIONS to run")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="offline ReplayBackend (fixed scores) instead of the Groq API")
+    parser.add_argument("-o", "--output", help="write report, logs and scores as JSON")
+    args = parser.parse_args()
+
+    llm = None
+    if args.synthetic:
+        # JSON-mode calls (router + scoring) return this dict
+        llm = LLMClient(backend=ReplayBackend(ttft=0.05, router_decision=lambda messages: {
+            "tool": "chat", "location": None, "calls": [],
+            "quality": 8, "accuracy": 9, "domain_consistency": 9,
+            "hallucinations": [], "notes": "Friendly and on-topic.", "improvements": ["Ask about budget."],
+        }))
+
+    result = EvalRunner(llm=llm, max_workers=args.workers).evaluate(TEST_CONVERSATIONS * args.repeat)
+    print(render_markdown(result["report"]))
+    print(result["report"]["run"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,287 @@
+# fake_servers.py
+"""
+Local stand-in HTTP servers for benchmarks and quick test blocks.
+They bind to 127.0.0.1 on a free port and count every upstream call.
+connect_delay (seconds) is paid once per new connection, standing in for
+the DNS/TCP/TLS setup of a remote API.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class _FakeServer:
+    handler_class = None
+
+    def __init__(self, connect_delay=0.0):
+        self._lock = threading.Lock()
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(self.handler_class):
+            owner = server
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    owner = None
+
+    def setup(self):
+        super().setup()
+        with self.owner._lock:
+            self.owner.connections += 1
+        if self.owner.connect_delay:
+            time.sleep(self.owner.connect_delay)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ------------ OPENWEATHER ------------
+
+class _WeatherHandler(_Handler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        city = parse_qs(parsed.query).get("q", [""])[0]
+        owner = self.owner
+        with owner._lock:
+            owner.calls[city.lower()] += 1
+        if owner.delay:
+            time.sleep(owner.delay)
+
+        if city.lower() in owner.unknown_cities:
+            self._send_json(404, {"cod": "404", "message": "city not found"})
+            return
+
+        self._send_json(200, {
+            "name": city,
+            "main": {"temp": owner.temp},
+            "weather": [{"description": owner.description}],
+        })
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class FakeWeatherServer(_FakeServer):
+    """OpenWeather-compatible /data/2.5/weather endpoint with per-city call counts."""
+
+    handler_class = _WeatherHandler
+
+    def __init__(self, delay=0.0, temp=21.5, description="clear sky",
+                 unknown_cities=("narnia",), connect_delay=0.0):
+        super().__init__(connect_delay)
+        self.delay = delay
+        self.temp = temp
+        self.description = description
+        self.unknown_cities = set(unknown_cities)
+        self.calls = Counter()
+
+    @property
+    def weather_url(self):
+        return f"{self.url}/data/2.5/weather"
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+# ------------ GROQ / OPENAI-COMPATIBLE CHAT ------------
+
+class _LLMHandler(_Handler):
+    def do_GET(self):
+        # GET /openai/v1/models: what warm-up calls to open a connection
+        if not urlparse(self.path).path.endswith("/models"):
+            self._send_json(404, {"error": {"message": "not found", "type": "fake_error"}})
+            return
+        with self.owner._lock:
+            self.owner.calls["models"] += 1
+        self._send_json(200, {"object": "list", "data": [{"id": "fake", "object": "model"}]})
+
+    def do_POST(self):
+        owner = self.owner
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        with owner._lock:
+            failure = owner.failures.popleft() if owner.failures else None
+            owner.statuses[failure[0] if failure else 200] += 1
+        if failure:
+            status, retry_after = failure
+            headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+            self._send_json(status, {"error": {"message": f"injected {status}", "type": "fake_error"}},
+                            headers)
+            return
+
+        stream = bool(body.get("stream"))
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        tool_calls = None
+        if body.get("tools") and body.get("tool_choice") != "none" \
+                and body["messages"][-1].get("role") != "tool":
+            tool_calls = owner.tool_calls_for(body["messages"])
+        kind = "router" if json_mode else ("tool_calls" if tool_calls else
+                                           ("stream" if stream else "complete"))
+        with owner._lock:
+            owner.calls[kind] += 1
+
+        delay = owner.latency()
+        if delay:
+            time.sleep(delay)
+
+        if json_mode:
+            content = json.dumps(owner.router_decision(body["messages"]))
+        elif tool_calls:
+            self._stream(body, tool_calls=tool_calls)
+            return
+        elif stream:
+            self._stream(body, owner.answer_for(body["messages"]))
+            return
+        else:
+            # Reflection / summaries: echo the text under review unchanged
+            content = body["messages"][-1]["content"]
+
+        self._send_json(200, {
+            "id": "fake-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(content.split()),
+                      "total_tokens": 10 + len(content.split())},
+        })
+
+    def _stream(self, body, text="", tool_calls=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish=None):
+            chunk = {
+                "id": "fake-chunk",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            event({"role": "assistant", "content": ""})
+            if tool_calls:
+                for i, call in enumerate(tool_calls):
+                    event({"tool_calls": [{
+                        "index": i, "id": f"call_{i}", "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])},
+                    }]})
+                event({}, finish="tool_calls")
+            else:
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    if self.owner.token_delay:
+                        time.sleep(self.owner.token_delay)
+                    event({"content": word if i == len(words) - 1 else word + " "})
+                event({}, finish="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+
+
+class FakeLLMServer(_FakeServer):
+    """
+    Groq-compatible /openai/v1/chat/completions endpoint.
+    - JSON-mode calls answer with a router decision
+    - streamed calls emit `answer` word by word (ttft, then token_delay per word)
+    - calls offering `tools` stream tool calls from tool_calls_for(), or the
+      answer once tool results are in (or when no tool is needed)
+    - other calls echo the last message (reflection returns the answer unchanged)
+    - latency() sets the delay before each response (ttft by default);
+      override it to model a latency distribution
+    - `failures` is a queue of (status, retry_after) injected into the next
+      requests, e.g. server.failures.append((429, 1.0))
+    - GET /models answers a model list (connection warm-up)
+
+    Point LLMClient at it with LLMClient(api_key="fake", base_url=server.url).
+    """
+
+    handler_class = _LLMHandler
+
+    def __init__(self, ttft=0.0, token_delay=0.0,
+                 answer="Happy to help you plan your trip! Where are you thinking of going?",
+                 connect_delay=0.0):
+        super().__init__(connect_delay)
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.answer = answer
+        self.calls = Counter()
+        self.failures = deque()
+        self.statuses = Counter()
+
+    def latency(self) -> float:
+        return self.ttft
+
+    def router_decision(self, messages) -> dict:
+        return {"tool": "chat", "location": None, "calls": []}
+
+    def tool_calls_for(self, messages) -> list:
+        """Native tool calls mirror router_decision() so both orchestration modes agree."""
+        calls = self.router_decision(messages).get("calls") or []
+        return [{"name": c["tool"],
+                 "arguments": {k: v for k, v in c.items() if k in ("location", "query") and v}}
+                for c in calls if c.get("tool")]
+
+    def answer_for(self, messages) -> str:
+        return self.answer
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
@@ -0,0 +1,162 @@
+# grounding.py
+
+import re
+import threading
+
+# Each claim kind carries a weight: the probability-like cost of it being unsupported
+CLAIM_WEIGHTS = {
+    "temperature": 0.9,
+    "price": 0.8,
+    "realtime": 0.7,
+    "date": 0.4,
+    "number": 0.3,
+    "proper_noun": 0.3,
+}
+
+TEMPERATURE_PATTERN = re.compile(r"(-?\d+(?:\.\d+)?)\s*(?:°\s*[CF]?|degrees?\b|deg\b)", re.IGNORECASE)
+PRICE_PATTERN = re.compile(
+    r"(?:[$€£¥]\s*(\d[\d,]*(?:\.\d+)?))|(?:(\d[\d,]*(?:\.\d+)?)\s*(?:usd|eur|gbp|jpy|dollars?|euros?|pounds?|yen)\b)",
+    re.IGNORECASE,
+)
+DATE_PATTERN = re.compile(
+    r"\b(?:\d{4}-\d{2}-\d{2}|\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?"
+    r"|(?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+NUMBER_PATTERN = re.compile(r"\b\d+(?:[.,]\d+)?\b")
+REALTIME_PATTERN = re.compile(
+    r"\b(right now|currently|at the moment|as of|today'?s?|tonight|this week(?:end)?|"
+    r"latest|live|forecast|exchange rates?|visa[- ]free|requires? a visa|entry requirements?|"
+    r"open until|closed on)\b",
+    re.IGNORECASE,
+)
+PROPER_NOUN_PATTERN = re.compile(r"(?<![.!?\n]\s)(?<!^)(?<![.!?\n])\b([A-Z][\w'-]+(?:\s+[A-Z][\w'-]+)*)")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+[.!?]*")
+
+# Names the assistant may always use (persona, generic words that are capitalised)
+DEFAULT_KNOWN_NAMES = {"voyager", "i", "i'm", "i'd", "i'll"}
+
+
+class GroundingAnalyzer:
+    """
+    Cheap local check of a draft answer against the tool context.
+
+    Extracts temperatures, prices, dates, numbers, proper nouns and
+    real-time claims from the draft and marks each as supported when it
+    also appears in the tool context (or text the user wrote). The risk
+    score combines the weights of unsupported claims; claims inside
+    questions count half, since clarifying questions assert nothing.
+    """
+
+    def __init__(self, weights=None, known_names=None):
+        self.weights = dict(CLAIM_WEIGHTS, **(weights or {}))
+        self.known_names = set(DEFAULT_KNOWN_NAMES) | {n.lower() for n in (known_names or ())}
+
+    def extract_claims(self, draft: str) -> list:
+        claims = []
+        for sentence in SENTENCE_PATTERN.findall(draft):
+            is_question = sentence.rstrip().endswith("?")
+            taken = set()
+
+            def add(kind, text, span):
+                if any(s <= span[0] < e for s, e in taken):
+                    return
+                taken.add(span)
+                claims.append({"kind": kind, "text": text.strip(), "question": is_question})
+
+            for m in TEMPERATURE_PATTERN.finditer(sentence):
+                add("temperature", m.group(1), m.span())
+            for m in PRICE_PATTERN.finditer(sentence):
+                add("price", m.group(1) or m.group(2), m.span())
+            for m in DATE_PATTERN.finditer(sentence):
+                add("date", m.group(0), m.span())
+            for m in NUMBER_PATTERN.finditer(sentence):
+                add("number", m.group(0), m.span())
+            for m in REALTIME_PATTERN.finditer(sentence):
+                claims.append({"kind": "realtime", "text": m.group(0), "question": is_question})
+            for m in PROPER_NOUN_PATTERN.finditer(sentence.strip()):
+                if m.group(1).lower() not in self.known_names:
+                    claims.append({"kind": "proper_noun", "text": m.group(1), "question": is_question})
+        return claims
+
+    @staticmethod
+    def _supported(claim: dict, sources: str, has_tool_context: bool) -> bool:
+        kind, text = claim["kind"], claim["text"].lower()
+        if kind == "realtime":
+            # Real-time language is fine only when a tool actually supplied data
+            return has_tool_context
+        if kind in ("temperature", "price", "number"):
+            text = text.replace(",", "")
+            return re.search(rf"(?<![\d.]){re.escape(text)}(?![\d])", sources) is not None
+        return text in sources
+
+    def analyze(self, draft: str, tool_context=None, known_text=None) -> dict:
+        sources = " ".join(filter(None, [tool_context, known_text])).lower().replace(",", "")
+        claims = self.extract_claims(draft)
+
+        unsupported = []
+        survival = 1.0
+        for claim in claims:
+            if self._supported(claim, sources, bool(tool_context)):
+                continue
+            weight = self.weights[claim["kind"]]
+            if claim["question"]:
+                weight /= 2
+            survival *= 1.0 - weight
+            unsupported.append(claim)
+
+        return {
+            "risk": round(1.0 - survival, 4),
+            "claims": len(claims),
+            "unsupported": unsupported,
+        }
+
+
+class ReflectionGate:
+    """
+    Decides whether the reflection LLM call is worth paying for.
+    Counts how many reflections were skipped vs run.
+    """
+
+    def __init__(self, analyzer=None, threshold=0.5):
+        self.analyzer = analyzer or GroundingAnalyzer()
+        self.threshold = threshold
+        self.skipped = 0
+        self.ran = 0
+        self._lock = threading.Lock()
+
+    def should_reflect(self, draft: str, tool_context=None, known_text=None) -> bool:
+        report = self.analyzer.analyze(draft, tool_context, known_text)
+        run = report["risk"] >= self.threshold
+        with self._lock:
+            if run:
+                self.ran += 1
+            else:
+                self.skipped += 1
+        return run
+
+    def stats(self) -> dict:
+        total = self.ran + self.skipped
+        return {
+            "reflections_run": self.ran,
+            "reflections_skipped": self.skipped,
+            "skip_ratio": self.skipped / total if total else 0.0,
+        }
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    analyzer = GroundingAnalyzer()
+    context = "Weather in Tokyo: 18°C, light rain."
+    drafts = [
+        ("Welcome! I'm Voyager. Where are you thinking of travelling?", None),
+        ("Are you looking for pizza in a specific city?", None),
+        ("It's currently 18°C with light rain in Tokyo, so pack an umbrella.", context),
+        ("It's currently 25°C and sunny in Tokyo.", context),
+        ("Rome is 30°C today and the Vatican Museums cost €17.", None),
+        ("The Louvre and Montmartre are must-sees in Paris.", None),
+    ]
+    for draft, ctx in drafts:
+        report = analyzer.analyze(draft, tool_context=ctx, known_text="Tokyo Paris")
+        print(f"{report['risk']:.2f}  {draft}  {[c['text'] for c in report['unsupported']]}")
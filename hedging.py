@@ -0,0 +1,200 @@
+# hedging.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies with percentile lookup."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class Hedger:
+    """
+    Hedged requests for idempotent calls.
+
+    The primary request runs on a worker; if it has not finished after the
+    adaptive delay (the `percentile` of recently observed latencies, clamped
+    to [min_delay, max_delay]), a duplicate is fired and whichever finishes
+    first wins. The loser is cancelled if it has not started, otherwise its
+    result is ignored (its latency is still recorded once it finishes).
+    Hedges are capped at max_hedge_ratio of all calls.
+
+    Calls never queue for a worker: while max_workers calls are in flight,
+    further calls run unhedged on the caller's thread (counted as
+    `inline`), and a hedge that finds no free worker is skipped. Size
+    max_workers to the concurrency of the callers (TravelServer passes
+    twice its turn slots) so the pool does not become the bottleneck.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.05, max_delay=5.0, initial_delay=1.0,
+                 max_hedge_ratio=0.1, min_samples=20, window=200, max_workers=16):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker(window)
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._busy = 0
+
+        self.calls = 0
+        self.inline = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, self.latencies.percentile(self.percentile)))
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges_fired + 1 > self.max_hedge_ratio * self.calls:
+                return False
+            self.hedges_fired += 1
+            return True
+
+    def _timed(self, fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    def _submit(self, fn):
+        """Run fn on a free worker; None when every worker is taken."""
+        with self._lock:
+            if self._busy >= self.max_workers:
+                return None
+            self._busy += 1
+        future = self._pool.submit(self._timed, fn)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._busy -= 1
+        # Every attempt that ran counts, including a slow primary that lost
+        # to its hedge; recording only winners would hide the tail the
+        # hedge delay is derived from
+        if not future.cancelled() and future.exception() is None:
+            self.latencies.record(future.result()[1])
+
+    def call(self, fn):
+        with self._lock:
+            self.calls += 1
+
+        primary = self._submit(fn)
+        if primary is None:
+            with self._lock:
+                self.inline += 1
+            result, elapsed = self._timed(fn)
+            self.latencies.record(elapsed)
+            return result
+
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        hedge = None
+        if not done and self._may_hedge():
+            hedge = self._submit(fn)
+            if hedge is None:
+                with self._lock:
+                    self.hedges_fired -= 1   # no free worker: skipped, not queued
+        if hedge is None:
+            return primary.result()[0]
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()   # only stops a hedge that has not started
+                result = future.result()[0]
+                if future is hedge:
+                    with self._lock:
+                        self.hedges_won += 1
+                return result
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "inline": self.inline,
+            "hedge_delay_s": round(self.hedge_delay(), 4),
+        }
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import random
+    from fake_servers import FakeLLMServer
+    from llm_client import LLMClient
+    from router import IntentRouter
+    from utils import percentiles
+
+    class TailLatencyLLM(FakeLLMServer):
+        """92% of responses in ~20ms, 8% stall for 600ms."""
+        rng = random.Random(3)
+
+        def latency(self):
+            return 0.02 if self.rng.random() < 0.92 else 0.6
+
+    def measure(client, n=200):
+        router = IntentRouter(client, use_local_tier=False, cache=False)
+        samples = []
+        for i in range(n):
+            start = time.perf_counter()
+            router.determine_intent(f"Question number {i} about somewhere")
+            samples.append(time.perf_counter() - start)
+        return {k: round(v * 1000, 1) for k, v in percentiles(samples).items()}
+
+    with TailLatencyLLM() as server:
+        plain = LLMClient(api_key="fake", base_url=server.url)
+        print("plain   router ms:", measure(plain))
+
+        hedger = Hedger(percentile=90, max_hedge_ratio=0.15, initial_delay=0.1)
+        hedged = LLMClient(api_key="fake", base_url=server.url, hedging=hedger)
+        calls_before = server.total_calls
+        print("hedged  router ms:", measure(hedged))
+        print(hedger.stats(), "upstream requests:", server.total_calls - calls_before)
+
+    # Saturated pool: calls beyond max_workers run inline instead of queueing
+    hedger = Hedger(max_workers=4, initial_delay=0.05, max_hedge_ratio=1.0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as callers:
+        list(callers.map(lambda _: hedger.call(lambda: time.sleep(0.1)), range(16)))
+    print(f"16 concurrent calls, 4 hedge workers: {(time.perf_counter() - start) * 1000:.0f} ms",
+          hedger.stats())
+
+    # A hedge that wins still leaves the slow primary's latency in the window
+    hedger = Hedger(initial_delay=0.02, min_samples=1, max_hedge_ratio=1.0)
+    attempts = iter([0.3, 0.01])
+    hedger.call(lambda: time.sleep(next(attempts)))
+    time.sleep(0.35)
+    print("recorded after a won hedge:", sorted(round(s, 2) for s in hedger.latencies._samples))
@@ -0,0 +1,191 @@
+# intent_classifier.py
+
+import re
+
+# Small built-in gazetteer. Multi-word names are matched before single words
+# so "new york" wins over "york".
+KNOWN_CITIES = [
+    "Amsterdam", "Athens", "Bangkok", "Barcelona", "Berlin", "Boston",
+    "Budapest", "Buenos Aires", "Cairo", "Cape Town", "Chicago",
+    "Copenhagen", "Dubai", "Dublin", "Edinburgh", "Florence", "Hong Kong",
+    "Istanbul", "Jerusalem", "Kyoto", "Lisbon", "London", "Los Angeles",
+    "Madrid", "Marrakech", "Melbourne", "Mexico City", "Miami", "Milan",
+    "Montreal", "Moscow", "Mumbai", "Munich", "Naples", "New Delhi",
+    "New York", "Osaka", "Oslo", "Paris", "Prague", "Reykjavik",
+    "Rio de Janeiro", "Rome", "San Francisco", "Seoul", "Singapore",
+    "Stockholm", "Sydney", "Tel Aviv", "Tokyo", "Toronto", "Vancouver",
+    "Venice", "Vienna", "Zurich",
+]
+
+WEATHER_PATTERN = re.compile(
+    r"\b(weather|forecast|temperature|degrees|rain(?:ing|y)?|snow(?:ing|y)?|"
+    r"sunny|humid(?:ity)?|windy|storm(?:s|y)?)\b"
+    # hot/cold/warm only in a weather phrase: "how cold is it", "hot outside"
+    r"|\b(?:how|is it|it's|will it be|getting)\s+(?:\w+\s+)?(?:hot|cold|warm)\b"
+    r"|\b(?:hot|cold|warm)\s+(?:outside|out there|today|tonight|tomorrow|this (?:week|weekend)|right now)\b",
+    re.IGNORECASE,
+)
+
+# Bare hot/cold/warm ("a good hot dish", "warm places to visit"): maybe weather,
+# maybe not, so the LLM tier decides
+TEMPERATURE_WORD_PATTERN = re.compile(r"\b(hot|cold|warm)\b", re.IGNORECASE)
+
+ATTRACTIONS_PATTERN = re.compile(
+    r"\b(attractions?|sights?|sightseeing|landmarks?|museums?|things to (?:do|see)|"
+    r"what to (?:do|see)|places to (?:visit|see)|must[- ]see|day plan|itinerary|"
+    r"tourist spots?|points? of interest)\b",
+    re.IGNORECASE,
+)
+
+# "near X" / "nearby" needs an anchor place (landmark, hotel, earlier city): LLM router
+NEARBY_PATTERN = re.compile(r"\b(near(?:by)?|close to|around here|walking distance)\b", re.IGNORECASE)
+
+# Static-knowledge / live-fact topics are left to the LLM router
+KNOWLEDGE_PATTERN = re.compile(
+    r"\b(visas?|passports?|currency|exchange rates?|money|customs|vaccin\w*|"
+    r"news|price of|open(?:ing)? hours)\b",
+    re.IGNORECASE,
+)
+
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|hiya|good (?:morning|afternoon|evening)|thanks?|thank you|"
+    r"bye|goodbye|who are you\??)\b[\s!.,?]*",
+    re.IGNORECASE,
+)
+
+# Capitalised word that is not the first word of the message, or any word
+# following a travel preposition. Used to spot places missing from the gazetteer.
+PROPER_NOUN_PATTERN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]{2,}\b")
+PLACE_PREPOSITION_PATTERN = re.compile(r"\b(?:in|to|at|near|around|visiting)\s+([A-Za-z][\w-]{2,})")
+
+
+class LocalIntentClassifier:
+    """
+    Keyword/regex + gazetteer classifier that answers obvious routing
+    decisions without a network round-trip.
+
+    classify() returns (intent, confidence) where intent has the same
+    {"tool", "location", "calls"} shape as the LLM router output.
+    """
+
+    def __init__(self, cities=None):
+        self.cities = list(cities or KNOWN_CITIES)
+        self._city_lookup = {c.lower(): c for c in self.cities}
+        names = sorted(self._city_lookup, key=len, reverse=True)
+        self._city_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(n) for n in names) + r")\b",
+            re.IGNORECASE,
+        )
+
+    def find_cities(self, text: str) -> list:
+        found = []
+        for match in self._city_pattern.finditer(text):
+            city = self._city_lookup[match.group(1).lower()]
+            if city not in found:
+                found.append(city)
+        return found
+
+    def _has_unknown_place(self, text: str, known: list) -> bool:
+        known_lower = {c.lower() for c in known}
+        candidates = PROPER_NOUN_PATTERN.findall(text)
+        candidates += PLACE_PREPOSITION_PATTERN.findall(text)
+        for word in candidates:
+            if word.lower() in known_lower or word == "I":
+                continue
+            if word[0].isupper():
+                return True
+        return False
+
+    def classify(self, user_input: str, default_location=None):
+        """default_location (session destination) stands in when the message names no place."""
+        text = user_input.strip()
+        if not text:
+            return chat_intent(), 1.0
+
+        cities = self.find_cities(text)
+        tools = []
+        if WEATHER_PATTERN.search(text):
+            tools.append("weather")
+        if ATTRACTIONS_PATTERN.search(text):
+            tools.append("attractions")
+        wants_knowledge = bool(KNOWLEDGE_PATTERN.search(text))
+        unknown_place = self._has_unknown_place(text, cities)
+
+        # Pure greeting / small talk with nothing that looks like a place
+        if GREETING_PATTERN.match(text) and not cities and not unknown_place \
+                and not tools and not wants_knowledge:
+            return chat_intent(), 0.95
+
+        # Visa / currency / live facts -> kb_search or web_search, LLM decides
+        if wants_knowledge:
+            return chat_intent(cities[0] if cities else None), 0.3
+
+        # Proximity asks go to the "nearby" tool: around the session destination
+        # when no place is named, otherwise the LLM router extracts the anchor
+        if NEARBY_PATTERN.search(text):
+            if default_location and not cities and not unknown_place:
+                return plan_intent([{"tool": "nearby", "location": default_location}]), 0.85
+            return chat_intent(cities[0] if cities else None), 0.3
+
+        # Only a bare hot/cold/warm: below the fast-path threshold
+        if not tools and TEMPERATURE_WORD_PATTERN.search(text):
+            return chat_intent(cities[0] if cities else None), 0.5
+
+        # Clear tool(s) + known city/cities -> one call per (tool, city) pair
+        if cities and tools:
+            calls = [{"tool": t, "location": c} for t in tools for c in cities]
+            confidence = 0.8 if unknown_place else 0.9
+            return plan_intent(calls), confidence
+
+        # No place at all: the router prompt maps this to chat
+        if not cities and not unknown_place:
+            if tools and default_location:
+                # e.g. "what's the weather like?" after "I'm visiting Tokyo"
+                return plan_intent([{"tool": t, "location": default_location} for t in tools]), 0.85
+            if tools:
+                # e.g. "what's the weather like?" - may rely on earlier context
+                return chat_intent(), 0.6
+            return chat_intent(), 0.85
+
+        # City without a tool ask, or unfamiliar place names -> let the LLM decide
+        return chat_intent(cities[0] if cities else None), 0.3
+
+
+def chat_intent(location=None) -> dict:
+    return {"tool": "chat", "location": location, "calls": []}
+
+
+def plan_intent(calls: list) -> dict:
+    """Build a router result from a list of tool calls (first call mirrored at top level)."""
+    if not calls:
+        return chat_intent()
+    first = calls[0]
+    return {"tool": first["tool"], "location": first.get("location"), "calls": calls}
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    classifier = LocalIntentClassifier()
+    for q in [
+        "Hi",
+        "Is it raining in Tokyo?",
+        "Give me 3 things to see in London.",
+        "I want to go to France.",
+        "What's the weather like?",
+        "Weather in Reykjavik and Oslo",
+        "weather and attractions in Paris and Rome",
+        "Do I need a visa for Japan?",
+        "Where should I travel next month?",
+        "What are some attractions nearby?",
+        "How cold is it in Oslo?",
+        "Is it hot outside in Dubai today?",
+    ]:
+        print(q, "->", classifier.classify(q))
+    for q in ["What's the weather like?", "What are some attractions nearby?"]:
+        print(q, "(destination Tokyo) ->", classifier.classify(q, default_location="Tokyo"))
+
+    # Bare temperature adjectives are not weather asks
+    for q in ["Where's a good hot dish in Tokyo?", "Warm places to visit in Rome", "I'm cold"]:
+        intent, confidence = classifier.classify(q)
+        assert all(c["tool"] != "weather" for c in intent["calls"]), (q, intent)
+        print(q, "->", intent, confidence)
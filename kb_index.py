@@ -0,0 +1,345 @@
+# kb_index.py
+"""
+Offline retrieval index for the kb_search tool.
+
+Documents are split into overlapping word chunks and indexed two ways:
+- BM25 over an inverted index: per-term posting arrays, scored with NumPy
+  only for the query's terms, top-k by argpartition
+- optional dense vectors (any embedder: list[str] -> float32 array), kept in
+  an append-only float32 file that is memory-mapped for search
+
+Adding documents only appends postings/vectors for the new chunks; nothing
+is rebuilt. With a `directory`, chunks and vectors are persisted there and
+reloaded on the next start; add_directory() then only indexes files whose
+doc_id (path relative to the folder) is not in the index yet. Changed
+files are not re-indexed: give them a new name or start a fresh directory.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it me my of on or the there "
+    "this to what when where which who will with you your".split()
+)
+SEARCH_MODES = ("bm25", "dense", "hybrid")
+
+
+def _fold_plural(token: str) -> str:
+    # Light stemming so "cards" matches "card" and "visas" matches "visa"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [_fold_plural(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text: str, chunk_words=120, overlap=30) -> list:
+    """Split into ~chunk_words windows; consecutive chunks share `overlap` words."""
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [" ".join(words)] if words else []
+    step = max(1, chunk_words - overlap)
+    return [" ".join(words[i:i + chunk_words]) for i in range(0, len(words) - overlap, step)]
+
+
+@lru_cache(maxsize=1 << 18)
+def _feature_hash(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder: hashed unigrams + bigrams, L2-normalized.
+    Lexical rather than semantic, but stable across runs; swap in a real
+    sentence-embedding model by passing any callable with the same contract.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def __call__(self, texts: list):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+            if features:
+                buckets = np.fromiter((_feature_hash(f) for f in features), dtype=np.int64,
+                                      count=len(features)) % self.dim
+                out[row] = np.bincount(buckets, minlength=self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+
+class KnowledgeIndex:
+    def __init__(self, directory=None, embedder=None, chunk_words=120, overlap=30, k1=1.5, b=0.75):
+        self.directory = directory
+        self.embedder = embedder
+        self.chunk_words = chunk_words
+        self.overlap = overlap
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        self.chunks = []           # chunk_id -> {"doc_id", "title", "text"}
+        self.doc_ids = set()
+        self._postings = {}        # term -> (array('i') chunk ids, array('f') term freqs)
+        self._lengths = array("f")
+        self._total_length = 0.0
+        self._compiled = {}        # term -> (ids, tfs) as NumPy, dropped when the term changes
+        self._lengths_np = None
+
+        self._dim = None
+        self._vectors = None       # memmap (persistent) or ndarray, rows == len(self.chunks)
+        self._pending_vectors = []
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    # ------------ PATHS / PERSISTENCE ------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        chunks_path = self._path("chunks.jsonl")
+        if not os.path.exists(chunks_path):
+            return
+        with open(chunks_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index_chunk(json.loads(line))
+        meta_path = self._path("vectors.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+
+    # ------------ INDEXING ------------
+
+    def _index_chunk(self, chunk: dict) -> int:
+        chunk_id = len(self.chunks)
+        self.chunks.append(chunk)
+        self.doc_ids.add(chunk["doc_id"])
+        tokens = tokenize(chunk["title"] + " " + chunk["text"])
+        postings, compiled = self._postings, self._compiled
+        for term, tf in Counter(tokens).items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("i"), array("f"))
+            entry[0].append(chunk_id)
+            entry[1].append(tf)
+            if compiled:
+                compiled.pop(term, None)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        self._lengths_np = None
+        return chunk_id
+
+    def add_document(self, text: str, title="", doc_id=None) -> list:
+        """Chunk, index and (optionally) embed one document; returns its chunk ids."""
+        return self.add_documents([{"text": text, "title": title, "doc_id": doc_id}])
+
+    def add_documents(self, documents, batch_size=2048, skip_indexed=False) -> list:
+        """
+        documents: iterable of {"text", "title"?, "doc_id"?}. Chunks are
+        embedded and persisted in batches; returns the new chunk ids.
+        skip_indexed leaves out documents whose doc_id is already indexed
+        (e.g. reloaded from `directory`).
+        """
+        ids, batch = [], []
+        for document in documents:
+            title = document.get("title", "")
+            doc_id = document.get("doc_id") or title or f"doc-{len(self.chunks) + len(batch)}"
+            if skip_indexed and doc_id in self.doc_ids:
+                continue
+            batch.extend({"doc_id": doc_id, "title": title, "text": t}
+                         for t in chunk_text(document["text"], self.chunk_words, self.overlap))
+            if len(batch) >= batch_size:
+                ids += self._add_chunks(batch)
+                batch = []
+        if batch:
+            ids += self._add_chunks(batch)
+        return ids
+
+    def _add_chunks(self, new: list) -> list:
+        vectors = None
+        if self.embedder:
+            vectors = np.asarray(self.embedder([c["title"] + " " + c["text"] for c in new]),
+                                 dtype=np.float32)
+
+        with self._lock:
+            ids = [self._index_chunk(c) for c in new]
+            if self.directory:
+                with open(self._path("chunks.jsonl"), "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(c, ensure_ascii=False) + "\n" for c in new)
+            if vectors is not None:
+                self._append_vectors(vectors)
+        return ids
+
+    def add_directory(self, path, extensions=(".txt", ".md")) -> int:
+        """
+        Index every text file under path not indexed yet (title = file name,
+        doc_id = path relative to the folder); returns the chunk count added.
+        """
+        added = 0
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                doc_id = os.path.relpath(file_path, path)
+                if not name.endswith(extensions) or doc_id in self.doc_ids:
+                    continue
+                with open(file_path, encoding="utf-8") as f:
+                    title = os.path.splitext(name)[0].replace("_", " ").replace("-", " ")
+                    added += len(self.add_document(f.read(), title=title, doc_id=doc_id))
+        return added
+
+    def _append_vectors(self, vectors):
+        if self.directory:
+            if self._dim is None:
+                with open(self._path("vectors.json"), "w", encoding="utf-8") as f:
+                    json.dump({"dim": vectors.shape[1]}, f)
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+        else:
+            self._pending_vectors.append(vectors)
+        self._dim = vectors.shape[1]
+        self._vectors = None  # re-mapped on next dense query
+
+    def _vector_matrix(self):
+        if self._vectors is None and self._dim:
+            if self.directory:
+                rows = os.path.getsize(self._path("vectors.f32")) // (4 * self._dim)
+                self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32,
+                                          mode="r", shape=(rows, self._dim))
+            elif self._pending_vectors:
+                self._vectors = np.vstack(self._pending_vectors)
+                self._pending_vectors = [self._vectors]
+        return self._vectors
+
+    # ------------ SEARCH ------------
+
+    def _term_arrays(self, term):
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            ids, tfs = self._postings[term]
+            compiled = (np.frombuffer(ids, dtype=np.int32).copy(),
+                        np.frombuffer(tfs, dtype=np.float32).copy())
+            self._compiled[term] = compiled
+        return compiled
+
+    def bm25_scores(self, query: str):
+        with self._lock:
+            n = len(self.chunks)
+            if self._lengths_np is None:
+                self._lengths_np = np.frombuffer(self._lengths, dtype=np.float32).copy()
+            lengths = self._lengths_np
+            avgdl = self._total_length / n if n else 1.0
+            terms = [(t, self._term_arrays(t)) for t in set(tokenize(query)) if t in self._postings]
+
+        scores = np.zeros(n, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(avgdl, 1e-9))
+        for _, (ids, tfs) in terms:
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[ids])
+        return scores
+
+    def dense_scores(self, query: str):
+        with self._lock:
+            matrix = self._vector_matrix()
+        if matrix is None or not self.embedder:
+            return None
+        q = np.asarray(self.embedder([query]), dtype=np.float32)[0]
+        return matrix @ q
+
+    @staticmethod
+    def _top(scores, k):
+        positive = np.flatnonzero(scores > 0)
+        if not len(positive):
+            return []
+        k = min(k, len(positive))
+        best = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+        return best[np.argsort(-scores[best])].tolist()
+
+    def search(self, query: str, k=3, mode="bm25") -> list:
+        """
+        Top-k chunks as {"chunk_id", "doc_id", "title", "text", "score"}.
+        hybrid fuses the BM25 and dense rankings with reciprocal rank fusion.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}")
+        if not self.chunks:
+            return []
+
+        if mode == "bm25" or (mode == "hybrid" and not self.embedder):
+            scores = self.bm25_scores(query)
+        elif mode == "dense":
+            scores = self.dense_scores(query)
+            if scores is None:
+                return []
+        else:
+            depth = max(k * 10, 50)
+            scores = np.zeros(len(self.chunks), dtype=np.float32)
+            for ranking in (self._top(self.bm25_scores(query), depth),
+                            self._top(self.dense_scores(query), depth)):
+                for rank, chunk_id in enumerate(ranking):
+                    scores[chunk_id] += 1.0 / (60 + rank)
+
+        return [dict(self.chunks[i], chunk_id=i, score=round(float(scores[i]), 4))
+                for i in self._top(scores, k)]
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    index = KnowledgeIndex(embedder=HashingEmbedder())
+    index.add_documents([
+        {"title": "Schengen visas", "text": "Short-term tourism in the Schengen area (under 90 days) "
+                                            "does not require a visa for UK citizens."},
+        {"title": "Currency and money", "text": "Local vendors often require cash; use bank ATMs."},
+        {"title": "Tokyo transport", "text": "A Suica card works on Tokyo metro, JR lines and buses."},
+    ])
+    for mode in SEARCH_MODES:
+        print(mode, [(h["title"], h["score"]) for h in index.search("metro card in Tokyo", mode=mode)])
+
+    # Incremental add: the new document is searchable immediately
+    index.add_document("Paris Navigo passes cover metro, RER and buses for a week.", title="Paris transport")
+    print([h["title"] for h in index.search("Paris metro pass")])
+
+    # Scale: 20k chunks, persisted and memory-mapped
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(20000)] + ["visa", "metro", "currency", "ferry", "tram"]
+    with tempfile.TemporaryDirectory() as tmp:
+        big = KnowledgeIndex(directory=tmp, embedder=HashingEmbedder())
+        start = time.perf_counter()
+        big.add_documents({"title": f"doc {i}", "text": " ".join(rng.choices(vocabulary, k=60))}
+                          for i in range(20000))
+        print(f"indexed {len(big)} chunks in {time.perf_counter() - start:.1f}s")
+
+        reopened = KnowledgeIndex(directory=tmp, embedder=HashingEmbedder())
+        assert reopened.add_documents([{"title": "doc 0", "text": "again"}], skip_indexed=True) == []
+        for mode in SEARCH_MODES:
+            reopened.search("visa metro", mode=mode)  # compile postings / map vectors
+            start = time.perf_counter()
+            for _ in range(100):
+                reopened.search("visa for the metro and ferry", k=5, mode=mode)
+            print(f"{mode}: {(time.perf_counter() - start) * 10:.2f} ms/query over {len(reopened)} chunks")
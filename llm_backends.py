@@ -0,0 +1,351 @@
+# llm_backends.py
+"""
+Pluggable chat-completion backends for LLMClient.
+
+A backend is any object with create(**params) taking the same keyword
+arguments as Groq's chat.completions.create (model, messages, stream,
+response_format, tools, tool_choice, temperature, timeout) and returning
+an object, or for stream=True an iterator of chunks, with the SDK's
+attribute shape (choices[0].message.content, choices[0].delta.content, ...).
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from state_manager import estimate_tokens
+
+# Request fields that identify a call for replay (timeout is not one of them)
+REQUEST_KEY_FIELDS = ("model", "messages", "temperature", "stream", "response_format", "tools", "tool_choice")
+
+
+def request_key(params: dict) -> str:
+    payload = {k: params.get(k) for k in REQUEST_KEY_FIELDS}
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def to_namespace(value):
+    """OpenAI-format dicts -> objects with the SDK's attribute access."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(v) for v in value]
+    return value
+
+
+def to_plain(value):
+    """SDK objects (pydantic) or namespaces -> JSON-serializable dicts."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {k: to_plain(v) for k, v in vars(value).items()}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    return value
+
+
+# ------------ LATENCY DISTRIBUTIONS ------------
+# Samplers are callables rng -> seconds
+
+def constant(seconds):
+    return lambda rng: seconds
+
+
+def lognormal(median, p99):
+    """Right-skewed latency with the given median and 99th percentile."""
+    sigma = math.log(p99 / median) / 2.326 if p99 > median else 0.0
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def empirical(samples):
+    """Resample observed latencies (e.g. from a recording)."""
+    samples = list(samples)
+    return lambda rng: rng.choice(samples)
+
+
+# ------------ BACKENDS ------------
+
+class GroqBackend:
+    """
+    Live Groq API. Retries are owned by the scheduler, not the SDK.
+
+    The SDK is imported and its client built on first use (or by warm_up(),
+    see warmup.py), so constructing an assistant stays cheap. Idle pooled
+    connections are kept for keepalive_expiry seconds instead of httpx's 5.
+    """
+
+    def __init__(self, api_key=None, base_url=None, keepalive_expiry=60.0):
+        self.api_key = api_key or os.getenv("GROQ_TRAVEL_API_KEY")
+        if not self.api_key:
+            raise ValueError("Missing GROQ_TRAVEL_API_KEY environment variable.")
+        self.base_url = base_url
+        self.keepalive_expiry = keepalive_expiry
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from groq import DefaultHttpxClient, Groq
+
+                    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20,
+                                          keepalive_expiry=self.keepalive_expiry)
+                    self._client = Groq(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                        http_client=DefaultHttpxClient(limits=limits))
+        return self._client
+
+    def create(self, **params):
+        return self.client.chat.completions.create(**params)
+
+    def warm_up(self, timeout=10):
+        """Load the SDK and open a pooled connection with a cheap GET /models."""
+        self.client.models.list(timeout=timeout)
+
+
+class RecordingBackend:
+    """
+    Wraps another backend and appends every exchange to a JSONL file:
+    request key, the request itself, latency, and either the response or
+    each streamed chunk with its offset (seconds) from the request start.
+    """
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def _request(self, params):
+        return {k: params.get(k) for k in REQUEST_KEY_FIELDS if params.get(k) is not None}
+
+    def create(self, **params):
+        start = time.perf_counter()
+        result = self.inner.create(**params)
+        if not params.get("stream"):
+            self._write({"key": request_key(params), "request": self._request(params),
+                         "latency_s": round(time.perf_counter() - start, 4),
+                         "response": to_plain(result)})
+            return result
+        return self._record_stream(params, start, result)
+
+    def warm_up(self):
+        warm_up = getattr(self.inner, "warm_up", None)
+        if warm_up:
+            warm_up()
+
+    def _record_stream(self, params, start, stream):
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append([round(time.perf_counter() - start, 4), to_plain(chunk)])
+                yield chunk
+        finally:
+            self._write({"key": request_key(params), "request": self._request(params),
+                         "latency_s": round(time.perf_counter() - start, 4), "chunks": chunks})
+
+
+def load_recording(path) -> dict:
+    """key -> list of recorded exchanges (repeated requests replay in order)."""
+    recording = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recording.setdefault(record["key"], []).append(record)
+    return recording
+
+
+class ReplayBackend:
+    """
+    Serves completions without network or API key.
+
+    - requests found in `recording` (load_recording output or a path) are
+      replayed with their recorded timing, scaled by `speed`
+    - anything else gets a synthetic response: JSON mode returns
+      router_decision(messages), tool-enabled calls emit tool_calls_for(messages)
+      (none by default), streams emit answer_for(messages) word by word, and
+      other calls echo the last message (reflection keeps the answer)
+
+    Synthetic latency: `ttft` (seconds or a sampler) before the first byte,
+    then `tokens_per_second` for streamed words (None = instant).
+    """
+
+    def __init__(self, recording=None, ttft=0.0, tokens_per_second=None, speed=1.0,
+                 answer="Happy to help you plan your trip! Where are you thinking of going?",
+                 router_decision=None, seed=None):
+        if isinstance(recording, str):
+            recording = load_recording(recording)
+        self.recording = recording or {}
+        self._cursor = Counter()
+        self.ttft = ttft if callable(ttft) else constant(ttft)
+        self.tokens_per_second = tokens_per_second
+        self.speed = speed
+        self.answer = answer
+        self._router_decision = router_decision
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._seen = Counter()
+        self._lock = threading.Lock()
+
+        self.calls = Counter()   # router / tool_calls / stream / complete
+        self.replayed = 0
+        self.synthetic = 0
+
+    # ------------ OVERRIDABLE BEHAVIOUR ------------
+
+    def router_decision(self, messages) -> dict:
+        if self._router_decision:
+            return self._router_decision(messages)
+        return {"tool": "chat", "location": None, "calls": []}
+
+    def tool_calls_for(self, messages) -> list:
+        return []
+
+    def answer_for(self, messages) -> str:
+        return self.answer
+
+    # ------------ create() ------------
+
+    def _sample(self, sampler, key):
+        # With a seed, each draw depends only on the request and how often it
+        # was seen, so concurrent runs get the same latencies in any thread order
+        with self._lock:
+            self._seen[key] += 1
+            if self.seed is None:
+                return max(0.0, sampler(self._rng))
+            rng = random.Random(f"{self.seed}:{key}:{self._seen[key]}")
+        return max(0.0, sampler(rng))
+
+    def create(self, **params):
+        key = request_key(params)
+        with self._lock:
+            records = self.recording.get(key)
+            record = None
+            if records:
+                record = records[min(self._cursor[key], len(records) - 1)]
+                self._cursor[key] += 1
+        if record is not None:
+            with self._lock:
+                self.replayed += 1
+                self.calls["replay"] += 1
+            return self._replay(record)
+
+        with self._lock:
+            self.synthetic += 1
+        return self._synthetic(params, key)
+
+    def _replay(self, record):
+        if "response" in record:
+            time.sleep(record["latency_s"] * self.speed)
+            return to_namespace(record["response"])
+
+        def generator():
+            start = time.perf_counter()
+            for offset, chunk in record["chunks"]:
+                delay = offset * self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                yield to_namespace(chunk)
+        return generator()
+
+    def _synthetic(self, params, key):
+        messages = params["messages"]
+        json_mode = (params.get("response_format") or {}).get("type") == "json_object"
+        tool_calls = None
+        if params.get("tools") and params.get("tool_choice") != "none" \
+                and messages[-1].get("role") != "tool":
+            tool_calls = self.tool_calls_for(messages)
+        kind = "router" if json_mode else ("tool_calls" if tool_calls else
+                                           ("stream" if params.get("stream") else "complete"))
+        with self._lock:
+            self.calls[kind] += 1
+
+        ttft = self._sample(self.ttft, key)
+        if params.get("stream"):
+            text = "" if tool_calls else self.answer_for(messages)
+            return self._stream(text, tool_calls, ttft)
+
+        content = json.dumps(self.router_decision(messages)) if json_mode \
+            else str(messages[-1].get("content") or "")
+        time.sleep(ttft)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        return to_namespace({
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content, "tool_calls": None}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _stream(self, text, tool_calls, ttft):
+        def chunk(delta, finish=None):
+            delta = dict({"content": None, "tool_calls": None}, **delta)
+            return to_namespace({"choices": [{"index": 0, "delta": delta, "finish_reason": finish}]})
+
+        token_delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+        def generator():
+            time.sleep(ttft)
+            if tool_calls:
+                for i, call in enumerate(tool_calls):
+                    yield chunk({"tool_calls": [{
+                        "index": i, "id": f"call_{i}", "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])},
+                    }]})
+                yield chunk({}, finish="tool_calls")
+                return
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                if token_delay and i:
+                    time.sleep(token_delay)
+                yield chunk({"content": word if i == len(words) - 1 else word + " "})
+            yield chunk({}, finish="stop")
+        return generator()
+
+    def stats(self) -> dict:
+        return {"replayed": self.replayed, "synthetic": self.synthetic, "calls": dict(self.calls)}
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import tempfile
+    from llm_client import LLMClient
+
+    messages = [{"role": "user", "content": "Weather in Rome?"}]
+
+    # 1. Synthetic responses, no API key needed
+    replay = ReplayBackend(ttft=lognormal(0.05, 0.2), tokens_per_second=200, seed=1)
+    client = LLMClient(backend=replay)
+    print("stream:", "".join(client.chat(messages, stream=True)))
+    print("router:", client.chat(messages, json_mode=True))
+    print(replay.stats())
+
+    # 2. Record, then replay the recording with its timing
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.jsonl")
+        recorder = RecordingBackend(ReplayBackend(ttft=0.1, answer="Rome is sunny today."), path)
+        recorded = LLMClient(backend=recorder)
+        first = "".join(recorded.chat(messages, stream=True))
+
+        playback = ReplayBackend(recording=path)
+        start = time.perf_counter()
+        again = "".join(LLMClient(backend=playback).chat(messages, stream=True))
+        print(f"replayed {again!r} in {time.perf_counter() - start:.2f}s", playback.stats())
+        assert first == again
@@ -1,24 +1,103 @@
-import os
 import json
+import time
 from types import GeneratorType
-from groq import Groq
+
+from hedging import Hedger
+from llm_backends import GroqBackend
+from llm_scheduler import RequestScheduler, Priority
+from metrics import (LLM_LATENCY, LLM_TTFT, LLM_TOKEN_RATE, LLM_PROMPT_TOKENS,
+                     LLM_COMPLETION_TOKENS, LLM_ERRORS)
+from state_manager import estimate_tokens
+
+# Completion tokens reserved per call when estimating tokens-per-minute usage
+COMPLETION_TOKEN_RESERVE = 300
+
+# Hedging only applies to near-deterministic calls, where duplicates are interchangeable
+HEDGE_MAX_TEMPERATURE = 0.3
+
+# Metrics "stage" label per priority
+STAGES = {
+    Priority.MAIN: "generation",
+    Priority.ROUTER: "router",
+    Priority.REFLECTION: "reflection",
+    Priority.OFFLINE: "offline",
+}
+
+
+def _record_usage(labels, prompt_tokens, completion_tokens):
+    LLM_PROMPT_TOKENS.inc(prompt_tokens, **labels)
+    LLM_COMPLETION_TOKENS.inc(completion_tokens, **labels)
+
+
+def _measured_stream(chunks, labels, start, prompt_tokens, text_of):
+    """
+    Pass chunks through while recording time-to-first-token, total stream
+    time, token rate and (estimated) token counts; text_of(chunk) -> str.
+    """
+    first_at = None
+    chars = 0
+    try:
+        for chunk in chunks:
+            if first_at is None:
+                first_at = time.perf_counter()
+                LLM_TTFT.observe(first_at - start, **labels)
+            chars += len(text_of(chunk) or "")
+            yield chunk
+    except GeneratorExit:
+        # Abandoned by the consumer (a cancelled speculative stream):
+        # release the connection and count the tokens read so far
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+        _record_usage(labels, prompt_tokens, (chars + 3) // 4)
+        raise
+    except Exception as e:
+        LLM_ERRORS.inc(error=type(e).__name__, **labels)
+        raise
+    end = time.perf_counter()
+    LLM_LATENCY.observe(end - start, **labels)
+    completion_tokens = (chars + 3) // 4
+    _record_usage(labels, prompt_tokens, completion_tokens)
+    if first_at is not None and completion_tokens and end - first_at > 0.01:
+        LLM_TOKEN_RATE.observe(completion_tokens / (end - first_at), **labels)
 
 
 class LLMClient:
-    def __init__(self):
-        self.api_key = os.getenv("GROQ_TRAVEL_API_KEY")
-        if not self.api_key:
-            raise ValueError("Missing GROQ_TRAVEL_API_KEY environment variable.")
+    def __init__(self, api_key=None, base_url=None, model="llama-3.1-8b-instant", scheduler=None,
+                 hedging=False, backend=None):
+        """
+        api_key defaults to GROQ_TRAVEL_API_KEY; base_url points the client
+        at a Groq-compatible endpoint (e.g. a local stand-in server).
+        backend replaces the Groq API altogether (see llm_backends.py:
+        recording, replay/synthetic); no API key is needed then.
+        scheduler handles rate limits, priorities, retries and deadlines.
+        hedging=True (or a Hedger) enables hedged requests for calls made
+        with hedge=True.
+        """
+        self.backend = backend or GroqBackend(api_key=api_key, base_url=base_url)
+        self.model = model
+        self.scheduler = scheduler or RequestScheduler()
+        self.hedger = Hedger() if hedging is True else (hedging or None)
 
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama-3.1-8b-instant"
+    def warm_up(self):
+        """Load the backend SDK and open its connection, if the backend supports it."""
+        warm_up = getattr(self.backend, "warm_up", None)
+        if warm_up:
+            warm_up()
 
-    def chat(self, messages, stream=False, json_mode=False, temperature=0):
+    def chat(self, messages, stream=False, json_mode=False, temperature=0,
+             priority=Priority.MAIN, timeout=None, hedge=False):
         """
-        Wrapper for Groq chat completion.
+        Wrapper for a Groq(-compatible) chat completion.
         - JSON mode ALWAYS disables streaming.
         - stream=True returns a generator only for main assistant responses.
         - stream=False ALWAYS returns a final string.
+        - priority orders calls when rate limited (main answer > router >
+          reflection > offline); timeout is the call's deadline in seconds,
+          covering queueing, retries and the request itself.
+        - hedge=True marks an idempotent call: if hedging is enabled and the
+          call is non-stream and low temperature, a slow request is raced
+          against a duplicate.
         """
 
         # JSON mode MUST disable streaming
@@ -35,7 +114,24 @@ class LLMClient:
         if json_mode:
             params["response_format"] = {"type": "json_object"}
 
-        completion = self.client.chat.completions.create(**params)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        est_tokens = prompt_tokens + COMPLETION_TOKEN_RESERVE
+        request = lambda: self.scheduler.call(
+            lambda timeout: self.backend.create(**params, timeout=timeout),
+            priority=priority,
+            est_tokens=est_tokens,
+            timeout=timeout,
+        )
+        labels = {"stage": STAGES.get(priority, "other"), "model": self.model}
+        start = time.perf_counter()
+        try:
+            if hedge and self.hedger and not stream and temperature <= HEDGE_MAX_TEMPERATURE:
+                completion = self.hedger.call(request)
+            else:
+                completion = request()
+        except Exception as e:
+            LLM_ERRORS.inc(error=type(e).__name__, **labels)
+            raise
 
         # -----------------------------------------------------------
         # STREAMING MODE (normal assistant responses)
@@ -43,7 +139,8 @@ class LLMClient:
         if stream:
             # Return a clean generator for streaming
             def generator():
-                for chunk in completion:
+                for chunk in _measured_stream(completion, labels, start, prompt_tokens,
+                                              lambda c: c.choices[0].delta.content):
                     delta = chunk.choices[0].delta.content
                     if delta:
                         yield delta
@@ -54,16 +151,23 @@ class LLMClient:
         # But Groq sometimes returns a generator anyway → handle it!
         # -----------------------------------------------------------
         if isinstance(completion, GeneratorType):
-            # Unexpected generator → consume fully
-            text = ""
-            for chunk in completion:
-                delta = chunk.choices[0].delta.content
-                if delta:
-                    text += delta
-            return text
-
-        # Normal response object
-        content = completion.choices[0].message.content
+            # Unexpected generator → consume fully, measured like a stream
+            content = "".join(
+                chunk.choices[0].delta.content or ""
+                for chunk in _measured_stream(completion, labels, start, prompt_tokens,
+                                              lambda c: c.choices[0].delta.content)
+            )
+        else:
+            # Normal response object
+            content = completion.choices[0].message.content
+            LLM_LATENCY.observe(time.perf_counter() - start, **labels)
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                self.scheduler.settle(est_tokens, getattr(usage, "total_tokens", None))
+                _record_usage(labels, getattr(usage, "prompt_tokens", 0) or 0,
+                              getattr(usage, "completion_tokens", 0) or 0)
+            else:
+                _record_usage(labels, prompt_tokens, estimate_tokens(content or ""))
 
         # -----------------------------------------------------------
         # JSON MODE PARSING
@@ -75,3 +179,68 @@ class LLMClient:
                 return {}
 
         return content
+
+    def stream_with_tools(self, messages, tools, tool_choice="auto", temperature=0.4,
+                          priority=Priority.MAIN, timeout=None):
+        """
+        Streamed completion with native tool calling.
+        Yields ("text", delta) while the model answers and, if it chose to
+        call tools instead, one final ("tool_calls", [{"id", "name", "arguments"}])
+        with arguments parsed to a dict ({} when malformed).
+        """
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+            "tools": tools,
+            "tool_choice": tool_choice,
+        }
+
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages) \
+            + estimate_tokens(json.dumps(tools))
+        est_tokens = prompt_tokens + COMPLETION_TOKEN_RESERVE
+        labels = {"stage": STAGES.get(priority, "other"), "model": self.model}
+        start = time.perf_counter()
+        try:
+            completion = self.scheduler.call(
+                lambda timeout: self.backend.create(**params, timeout=timeout),
+                priority=priority,
+                est_tokens=est_tokens,
+                timeout=timeout,
+            )
+        except Exception as e:
+            LLM_ERRORS.inc(error=type(e).__name__, **labels)
+            raise
+
+        def chunk_text(chunk):
+            delta = chunk.choices[0].delta
+            fragments = delta.tool_calls or []
+            return (delta.content or "") + "".join(
+                (f.function.arguments or "") for f in fragments if f.function)
+
+        # Tool calls arrive as fragments keyed by index; arguments are a JSON string
+        calls = {}
+        for chunk in _measured_stream(completion, labels, start, prompt_tokens, chunk_text):
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield "text", delta.content
+            for fragment in delta.tool_calls or []:
+                call = calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+                if fragment.id:
+                    call["id"] = fragment.id
+                if fragment.function:
+                    call["name"] += fragment.function.name or ""
+                    call["arguments"] += fragment.function.arguments or ""
+
+        if calls:
+            parsed = []
+            for index in sorted(calls):
+                call = calls[index]
+                try:
+                    arguments = json.loads(call["arguments"] or "{}")
+                except ValueError:
+                    arguments = {}
+                parsed.append({"id": call["id"] or f"call_{index}", "name": call["name"],
+                               "arguments": arguments if isinstance(arguments, dict) else {}})
+            yield "tool_calls", parsed
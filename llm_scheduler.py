@@ -0,0 +1,254 @@
+# llm_scheduler.py
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from enum import IntEnum
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTIONS = {"APIConnectionError", "APITimeoutError"}
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    MAIN = 0        # streamed answer the user is waiting on
+    ROUTER = 1
+    REFLECTION = 2
+    OFFLINE = 3     # summaries, evaluation, analysis
+
+
+# Deadline (seconds) applied when a caller does not pass one
+DEFAULT_DEADLINES = {
+    Priority.MAIN: 30.0,
+    Priority.ROUTER: 8.0,
+    Priority.REFLECTION: 20.0,
+    Priority.OFFLINE: 120.0,
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute; capacity defaults to one minute of budget."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # oversized requests wait for a full bucket
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge (delta > 0) or refund (delta < 0) after the real usage is known."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def is_retryable(exc) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    if type(exc).__name__ in RETRYABLE_EXCEPTIONS:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError)) and not isinstance(exc, DeadlineExceeded)
+
+
+def retry_after_seconds(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    """
+    Admission control for LLM calls:
+    - token buckets for requests/minute and estimated tokens/minute
+      (None = unlimited; defaults read GROQ_RPM / GROQ_TPM)
+    - strict priority order among waiting calls (Priority)
+    - jittered exponential retry on retryable errors, honouring Retry-After;
+      a 429 also pauses admission for everyone until the server's hint passes
+    - per-call deadlines: no admission, retry or request outlives the deadline
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=4,
+                 base_delay=0.5, max_delay=8.0):
+        rpm = requests_per_minute or _env_number("GROQ_RPM")
+        tpm = tokens_per_minute or _env_number("GROQ_TPM")
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiting = []                 # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+
+        self.admitted = 0
+        self.retries = 0
+        self.deadline_misses = 0
+
+    # ------------ ADMISSION ------------
+
+    def _wait_time(self, est_tokens, now) -> float:
+        waits = [self._paused_until - now]
+        if self.request_bucket:
+            waits.append(self.request_bucket.wait_time(1, now))
+        if self.token_bucket:
+            waits.append(self.token_bucket.wait_time(est_tokens, now))
+        return max(0.0, *waits)
+
+    def acquire(self, priority, est_tokens, deadline):
+        ticket = (int(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiting[0] == ticket:
+                        wait = self._wait_time(est_tokens, now)
+                        if wait <= 0:
+                            if self.request_bucket:
+                                self.request_bucket.consume(1)
+                            if self.token_bucket:
+                                self.token_bucket.consume(est_tokens)
+                            self.admitted += 1
+                            return
+                    else:
+                        wait = 0.05  # not our turn; woken by notify when the head moves
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.deadline_misses += 1
+                        raise DeadlineExceeded("LLM call deadline passed while waiting for rate limit")
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def settle(self, est_tokens, actual_tokens):
+        if self.token_bucket and actual_tokens is not None:
+            with self._cond:
+                self.token_bucket.adjust(actual_tokens - est_tokens)
+
+    def _pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    # ------------ CALL WITH RETRIES ------------
+
+    def call(self, fn, priority=Priority.MAIN, est_tokens=1, timeout=None):
+        """
+        Run fn(timeout=remaining_seconds) under admission control with retries.
+        Raises DeadlineExceeded, or the last error once retries are exhausted.
+        """
+        if timeout is None:
+            timeout = DEFAULT_DEADLINES[Priority(priority)]
+        deadline = time.monotonic() + timeout
+
+        attempt = 0
+        while True:
+            self.acquire(priority, est_tokens, deadline)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.deadline_misses += 1
+                raise DeadlineExceeded("LLM call deadline passed before the request was sent")
+            try:
+                return fn(timeout=remaining)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                hint = retry_after_seconds(e)
+                backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay = hint if hint is not None else backoff * random.uniform(0.5, 1.5)
+                if getattr(e, "status_code", None) == 429:
+                    self._pause(delay)
+                if time.monotonic() + delay >= deadline:
+                    raise
+
+                attempt += 1
+                self.retries += 1
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {"admitted": self.admitted, "retries": self.retries,
+                "deadline_misses": self.deadline_misses, "waiting": len(self._waiting)}
+
+
+def _env_number(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    from fake_servers import FakeLLMServer
+    from llm_client import LLMClient
+
+    messages = [{"role": "user", "content": "Hi"}]
+
+    # 1. 429 / 5xx responses are retried transparently
+    with FakeLLMServer() as server:
+        server.failures.extend([(429, 0.2), (503, None), (500, None)])
+        client = LLMClient(api_key="fake", base_url=server.url,
+                           scheduler=RequestScheduler(base_delay=0.05))
+        print("streamed:", "".join(client.chat(messages, stream=True)))
+        print("server statuses:", dict(server.statuses), "scheduler:", client.scheduler.stats())
+        assert client.scheduler.retries == 3
+
+        # 2. Non-retryable errors surface immediately
+        server.failures.append((400, None))
+        try:
+            client.chat(messages)
+        except Exception as e:
+            print("400 surfaced:", type(e).__name__)
+
+        # 3. Deadlines: a permanently failing upstream gives up within the deadline
+        server.failures.extend([(503, None)] * 20)
+        start = time.monotonic()
+        try:
+            client.chat(messages, timeout=1.0)
+        except Exception as e:
+            print(f"gave up after {time.monotonic() - start:.2f}s:", type(e).__name__)
+        server.failures.clear()
+
+    # 4. Priority: with 1 request/second, queued calls are admitted MAIN first
+    scheduler = RequestScheduler(requests_per_minute=60)
+    scheduler.request_bucket.tokens = 0
+    order = []
+
+    def submit(priority):
+        scheduler.call(lambda timeout: order.append(priority.name), priority=priority, timeout=10)
+
+    threads = [threading.Thread(target=submit, args=(p,)) for p in
+               (Priority.OFFLINE, Priority.REFLECTION, Priority.ROUTER, Priority.MAIN)]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    print("admission order:", order)
+    assert order == ["MAIN", "ROUTER", "REFLECTION", "OFFLINE"]
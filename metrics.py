@@ -0,0 +1,265 @@
+# metrics.py
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms are plain dicts keyed by label values, updated
+under one lock: an observation costs about a microsecond, cheap enough to
+stay on for every LLM call, tool call and turn. Gauges are computed from
+callbacks when rendered (e.g. cache hit ratios).
+
+    REGISTRY.render()          # text for GET /metrics (see server.py)
+    REGISTRY.dump(path)        # same text, written atomically to a file
+
+The metrics the pipeline records are defined at the bottom of this module.
+"""
+
+import bisect
+import math
+import os
+import threading
+
+# Seconds; spans local tiers (sub-ms) up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels, lock):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = lock
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        return self.header() + [f"{self.name}{_format_labels(self.labels, k)} {_format_value(v)}"
+                                for k, v in sorted(self.values().items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels, lock, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels, lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket (non-cumulative) counts, +Inf last, then sum
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def summary(self, **labels) -> dict:
+        """count / sum / mean for one label set (handy in tests and reports)."""
+        series = self._values.get(self._key(labels))
+        if not series:
+            return {"count": 0, "sum": 0.0, "mean": None}
+        count = sum(series[:-1])
+        return {"count": count, "sum": series[-1], "mean": series[-1] / count}
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(bound)))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Computed at render time: fn() -> {label values tuple: number}."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels, lock, fn):
+        super().__init__(name, help_text, labels, lock)
+        self.fn = fn
+
+    def render(self) -> list:
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"[Metrics Error]: gauge {self.name}: {e}")
+            values = {}
+        return self.header() + [f"{self.name}{_format_labels(self.labels, k)} {_format_value(v)}"
+                                for k, v in sorted(values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="voyager_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._register(Counter(self.prefix + name, help_text, labels, self._lock))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help_text, labels, self._lock, buckets))
+
+    def gauge(self, name, help_text, fn, labels=()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help_text, labels, self._lock, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        """Clear recorded values (benchmarks measuring one run at a time)."""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric._values.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+# ------------ PIPELINE METRICS ------------
+# stage: router / generation / reflection / offline (LLM calls, from Priority)
+
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_seconds", "LLM call latency: full response, or whole stream for streamed calls",
+    ("stage", "model"))
+LLM_TTFT = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time from request to first streamed token", ("stage", "model"))
+LLM_TOKEN_RATE = REGISTRY.histogram(
+    "llm_tokens_per_second", "Completion tokens per second after the first token", ("stage", "model"),
+    buckets=RATE_BUCKETS)
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "llm_prompt_tokens_total", "Prompt tokens (API usage, or estimated for streams)", ("stage", "model"))
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    "llm_completion_tokens_total", "Completion tokens (API usage, or estimated for streams)", ("stage", "model"))
+LLM_ERRORS = REGISTRY.counter("llm_errors_total", "Failed LLM calls", ("stage", "model", "error"))
+
+TOOL_LATENCY = REGISTRY.histogram("tool_call_seconds", "Tool call latency", ("tool", "status"))
+TOOL_CALLS = REGISTRY.counter("tool_calls_total", "Tool calls by outcome (ok/timeout/error/reused)",
+                              ("tool", "status"))
+
+TURN_STAGE = REGISTRY.histogram(
+    "turn_stage_seconds", "Per-turn wall time by stage (router, tools, ttft, generation, reflection, total)",
+    ("stage",))
+TURNS = REGISTRY.counter("turns_total", "Completed turns", ("orchestration", "cache_hit"))
+REFLECTIONS = REGISTRY.counter("reflection_total", "Reflection passes by outcome (skipped/unchanged/revised)",
+                               ("kind", "outcome"))
+
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by result (hit/stale/miss)",
+                                 ("cache", "result"))
+
+
+def _cache_hit_ratios():
+    totals, hits = {}, {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        totals[cache] = totals.get(cache, 0) + count
+        if result != "miss":
+            hits[cache] = hits.get(cache, 0) + count
+    return {(cache,): round(hits.get(cache, 0) / total, 4) for cache, total in totals.items() if total}
+
+
+CACHE_HIT_RATIO = REGISTRY.gauge("cache_hit_ratio", "Hits (fresh or stale) / lookups since start",
+                                 _cache_hit_ratios, ("cache",))
+
+SPECULATIONS = REGISTRY.counter("speculation_total", "Speculative answer streams by outcome (won/lost/cache_hit)",
+                                ("outcome",))
+SPECULATION_WASTED_TOKENS = REGISTRY.counter(
+    "speculation_wasted_tokens_total", "Estimated tokens of cancelled speculative streams", ("kind",))
+
+
+def _speculation_win_ratio():
+    outcomes = SPECULATIONS.values()
+    total = sum(outcomes.values())
+    return {(): round(outcomes.get(("won",), 0) / total, 4)} if total else {}
+
+
+SPECULATION_WIN_RATIO = REGISTRY.gauge("speculation_win_ratio", "Speculative streams used / started",
+                                       _speculation_win_ratio)
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import time
+
+    registry = MetricsRegistry(prefix="demo_")
+    latency = registry.histogram("request_seconds", "Demo latency", ("stage",), buckets=(0.1, 0.5, 1.0))
+    errors = registry.counter("errors_total", "Demo errors", ("stage", "error"))
+    for value in (0.05, 0.2, 0.7, 3.0):
+        latency.observe(value, stage="router")
+    errors.inc(stage="router", error="Timeout")
+    registry.gauge("queue_depth", "Demo gauge", lambda: {(): 3})
+    print(registry.render())
+    print(latency.summary(stage="router"))
+
+    # Overhead of an always-on observation
+    n = 200000
+    start = time.perf_counter()
+    for i in range(n):
+        latency.observe(0.3, stage="generation")
+    print(f"observe: {(time.perf_counter() - start) / n * 1e6:.2f} us")
+    start = time.perf_counter()
+    for i in range(n):
+        errors.inc(stage="generation", error="x")
+    print(f"inc:     {(time.perf_counter() - start) / n * 1e6:.2f} us")
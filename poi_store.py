@@ -0,0 +1,443 @@
+# poi_store.py
+"""
+Compact, array-backed store of cities and points of interest.
+
+POIs are sorted by city (then popularity), so each city's POIs are one
+contiguous slice [city_offsets[c], city_offsets[c + 1]). Columns are NumPy
+arrays and POI names one UTF-8 blob with offsets; save() writes them as
+.npy/.bin files that load() memory-maps, so startup cost does not grow
+with the dataset.
+
+SpatialIndex (built on first nearby() call from the lat/lon/category
+columns) answers radius and k-nearest queries around a POI, a city or raw
+coordinates.
+
+find_poi() binary-searches a sorted index of normalized POI names that
+is built with the store and saved alongside it, so looking up a landmark
+never scans the dataset.
+
+CityResolver maps user spellings to a canonical city id: exact names and
+aliases first (NYC, Roma), then a trigram index with an edit-distance check
+for misspellings (Tokio).
+
+    python poi_store.py build pois.csv data/pois     # or pois.parquet
+"""
+
+import csv
+import json
+import os
+import unicodedata
+
+import numpy as np
+
+from spatial_index import SpatialIndex
+
+# Columns expected in the CSV / Parquet dump; popularity is optional
+POI_COLUMNS = ("city", "country", "name", "category", "lat", "lon", "popularity")
+
+CITY_ALIASES = {
+    "nyc": "New York", "new york city": "New York", "ny": "New York", "manhattan": "New York",
+    "la": "Los Angeles", "sf": "San Francisco",
+    "roma": "Rome", "paris france": "Paris", "tokio": "Tokyo", "tokyo japan": "Tokyo",
+    "londres": "London", "londra": "London", "muenchen": "Munich", "münchen": "Munich",
+    "wien": "Vienna", "praha": "Prague", "lisboa": "Lisbon", "firenze": "Florence",
+    "venezia": "Venice", "napoli": "Naples", "köln": "Cologne", "bombay": "Mumbai",
+    "peking": "Beijing", "saigon": "Ho Chi Minh City", "cdmx": "Mexico City",
+}
+
+# Seed data used when no dataset is configured (see tools.get_poi_store)
+SEED_POIS = [
+    ("Paris", "FR", "Eiffel Tower", "landmark", 48.8584, 2.2945),
+    ("Paris", "FR", "Louvre Museum", "museum", 48.8606, 2.3376),
+    ("Paris", "FR", "Montmartre", "neighborhood", 48.8867, 2.3431),
+    ("Tokyo", "JP", "Shibuya Crossing", "landmark", 35.6595, 139.7005),
+    ("Tokyo", "JP", "Senso-ji Temple", "religious site", 35.7148, 139.7967),
+    ("Tokyo", "JP", "Meiji Shrine", "religious site", 35.6764, 139.6993),
+    ("Rome", "IT", "Colosseum", "landmark", 41.8902, 12.4922),
+    ("Rome", "IT", "Trevi Fountain", "landmark", 41.9009, 12.4833),
+    ("Rome", "IT", "Vatican Museums", "museum", 41.9065, 12.4536),
+    ("London", "GB", "British Museum", "museum", 51.5194, -0.1270),
+    ("London", "GB", "Tower of London", "landmark", 51.5081, -0.0759),
+    ("London", "GB", "London Eye", "landmark", 51.5033, -0.1196),
+    ("New York", "US", "Statue of Liberty", "landmark", 40.6892, -74.0445),
+    ("New York", "US", "Central Park", "park", 40.7829, -73.9654),
+    ("New York", "US", "Empire State Building", "landmark", 40.7484, -73.9857),
+]
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent- and whitespace-insensitive key."""
+    text = unicodedata.normalize("NFKD", name.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.replace("-", " ").replace(".", " ").split())
+
+
+def build_name_index(names) -> dict:
+    """Normalized POI names as a UTF-8 blob in byte order, with the POI of each (lowest id first)."""
+    keys = sorted((normalize_name(name).encode("utf-8"), i) for i, name in enumerate(names))
+    key_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(k) for k, _ in keys], out=key_offsets[1:])
+    return {
+        "key_poi": np.fromiter((i for _, i in keys), dtype=np.int32, count=len(keys)),
+        "key_offsets": key_offsets,
+        "keys": np.frombuffer(b"".join(k for k, _ in keys), dtype=np.uint8),
+    }
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CityResolver:
+    """
+    Canonical city ids for free-text names.
+    resolve() tries the exact/alias table (dict lookup), then scores trigram
+    overlap with one vectorized bincount and confirms the best candidates
+    with a bounded edit distance.
+    """
+
+    def __init__(self, city_names: list, aliases=None, max_candidates=5):
+        self.city_names = city_names
+        self.max_candidates = max_candidates
+        self._exact = {}
+        keys, owners = [], []
+        for city_id, name in enumerate(city_names):
+            key = normalize_name(name)
+            self._exact.setdefault(key, city_id)
+            keys.append(key)
+            owners.append(city_id)
+        for alias, target in (CITY_ALIASES if aliases is None else aliases).items():
+            city_id = self._exact.get(normalize_name(target))
+            if city_id is not None:
+                key = normalize_name(alias)
+                self._exact.setdefault(key, city_id)
+                keys.append(key)
+                owners.append(city_id)
+
+        # Trigram -> key ids; keys include aliases so "Tokyoo" can reach "Tokio" -> Tokyo
+        postings = {}
+        for key_id, key in enumerate(keys):
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(key_id)
+        self._keys = keys
+        self._owners = np.asarray(owners, dtype=np.int32)
+        self._gram_counts = np.asarray([len(trigrams(k)) for k in keys], dtype=np.int32)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+    def resolve(self, name: str):
+        """City id, or None when nothing is close enough."""
+        if not name:
+            return None
+        key = normalize_name(name)
+        city_id = self._exact.get(key)
+        if city_id is not None:
+            return city_id
+
+        grams = trigrams(key)
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        if not lists:
+            return None
+        shared = np.bincount(np.concatenate(lists), minlength=len(self._keys))
+        candidates = np.flatnonzero(shared)
+        jaccard = shared[candidates] / (len(grams) + self._gram_counts[candidates] - shared[candidates])
+        if len(candidates) > self.max_candidates:
+            keep = np.argpartition(-jaccard, self.max_candidates - 1)[:self.max_candidates]
+            candidates, jaccard = candidates[keep], jaccard[keep]
+        top = candidates[np.argsort(-jaccard)]
+
+        limit = max(1, len(key) // 4)
+        best, best_distance = None, limit + 1
+        for key_id in top:
+            distance = edit_distance(key, self._keys[key_id], limit)
+            if distance < best_distance:
+                best, best_distance = int(self._owners[key_id]), distance
+        return best
+
+    def exact(self, name: str):
+        """City id from the exact/alias table only (no fuzzy matching), or None."""
+        return self._exact.get(normalize_name(name)) if name else None
+
+    def canonical(self, name: str, fuzzy=True):
+        city_id = self.resolve(name) if fuzzy else self.exact(name)
+        return self.city_names[city_id] if city_id is not None else None
+
+
+class POIStore:
+    def __init__(self, meta: dict, arrays: dict):
+        self.city_names = meta["city_names"]
+        self.countries = meta["countries"]
+        self.categories = meta["categories"]
+        self.aliases = meta.get("aliases")
+        self.city_offsets = arrays["city_offsets"]   # int64, len(cities) + 1
+        self.lat = arrays["lat"]                     # float32 per POI
+        self.lon = arrays["lon"]
+        self.category = arrays["category"]           # int16 index into categories
+        self.city = arrays["city"]                   # int32 city id per POI
+        self.name_offsets = arrays["name_offsets"]   # int64, len(POIs) + 1
+        self.names = arrays["names"]                 # uint8 UTF-8 blob
+        if "key_poi" not in arrays:
+            # Stores saved before the name index existed: build it once here
+            arrays.update(build_name_index(self.poi_name(i) for i in range(len(self.lat))))
+        self.key_poi = arrays["key_poi"]             # int32 POI id per sorted name key
+        self.key_offsets = arrays["key_offsets"]     # int64, len(POIs) + 1
+        self.keys = arrays["keys"]                   # uint8 UTF-8 blob, byte-sorted
+        self._resolver = None
+        self._spatial = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def resolver(self) -> CityResolver:
+        if self._resolver is None:
+            self._resolver = CityResolver(self.city_names, self.aliases)
+        return self._resolver
+
+    @property
+    def spatial(self) -> SpatialIndex:
+        if self._spatial is None:
+            self._spatial = SpatialIndex(self.lat, self.lon, self.category)
+        return self._spatial
+
+    # ------------ BUILD ------------
+
+    @classmethod
+    def from_records(cls, records, aliases=None):
+        """records: iterable of (city, country, name, category, lat, lon[, popularity])."""
+        rows = []
+        for record in records:
+            city, country, name, category, lat, lon = record[:6]
+            popularity = float(record[6]) if len(record) > 6 and record[6] not in (None, "") else 0.0
+            rows.append((city.strip(), country.strip(), name.strip(), category.strip() or "other",
+                         float(lat), float(lon), popularity))
+
+        city_ids, city_names, countries = {}, [], []
+        for city, country, *_ in rows:
+            key = (normalize_name(city), country)
+            if key not in city_ids:
+                city_ids[key] = len(city_names)
+                city_names.append(city)
+                countries.append(country)
+        categories = sorted({r[3] for r in rows})
+        category_ids = {c: i for i, c in enumerate(categories)}
+
+        # Stable sort keeps file order among equally popular POIs
+        order = sorted(range(len(rows)),
+                       key=lambda i: (city_ids[(normalize_name(rows[i][0]), rows[i][1])], -rows[i][6]))
+        city_col = np.fromiter((city_ids[(normalize_name(rows[i][0]), rows[i][1])] for i in order),
+                               dtype=np.int32, count=len(order))
+        encoded = [rows[i][2].encode("utf-8") for i in order]
+        name_index = build_name_index(rows[i][2] for i in order)
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=name_offsets[1:])
+
+        arrays = {
+            "city": city_col,
+            "city_offsets": np.searchsorted(city_col, np.arange(len(city_names) + 1)).astype(np.int64),
+            "lat": np.fromiter((rows[i][4] for i in order), dtype=np.float32, count=len(order)),
+            "lon": np.fromiter((rows[i][5] for i in order), dtype=np.float32, count=len(order)),
+            "category": np.fromiter((category_ids[rows[i][3]] for i in order), dtype=np.int16,
+                                    count=len(order)),
+            "name_offsets": name_offsets,
+            "names": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            **name_index,
+        }
+        meta = {"city_names": city_names, "countries": countries, "categories": categories,
+                "aliases": aliases}
+        return cls(meta, arrays)
+
+    @classmethod
+    def from_file(cls, path, aliases=None):
+        return cls.from_records(read_poi_records(path), aliases)
+
+    # ------------ PERSISTENCE (memory-mapped) ------------
+
+    ARRAY_NAMES = ("city", "city_offsets", "lat", "lon", "category", "name_offsets")
+    INDEX_ARRAY_NAMES = ("key_poi", "key_offsets")
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAY_NAMES + self.INDEX_ARRAY_NAMES:
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(getattr(self, name)))
+        np.asarray(self.names).tofile(os.path.join(directory, "names.bin"))
+        np.asarray(self.keys).tofile(os.path.join(directory, "keys.bin"))
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"city_names": self.city_names, "countries": self.countries,
+                       "categories": self.categories, "aliases": self.aliases}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                  for name in cls.ARRAY_NAMES}
+        arrays["names"] = _load_blob(os.path.join(directory, "names.bin"))
+        if os.path.exists(os.path.join(directory, "keys.bin")):
+            for name in cls.INDEX_ARRAY_NAMES:
+                arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            arrays["keys"] = _load_blob(os.path.join(directory, "keys.bin"))
+        return cls(meta, arrays)
+
+    # ------------ QUERIES ------------
+
+    def poi_name(self, i: int) -> str:
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+
+    def poi(self, i: int) -> dict:
+        return {"name": self.poi_name(i), "category": self.categories[self.category[i]],
+                "city": self.city_names[self.city[i]],
+                "lat": round(float(self.lat[i]), 5), "lon": round(float(self.lon[i]), 5)}
+
+    def city_pois(self, city_id: int, k=None, category=None) -> list:
+        """A city's POIs, most popular first, optionally filtered by category name."""
+        start, end = int(self.city_offsets[city_id]), int(self.city_offsets[city_id + 1])
+        indices = np.arange(start, end)
+        if category is not None:
+            if category not in self.categories:
+                return []
+            indices = indices[np.asarray(self.category[start:end]) == self.categories.index(category)]
+        return [self.poi(int(i)) for i in indices[:k]]
+
+    def _name_key(self, i: int) -> bytes:
+        return bytes(self.keys[self.key_offsets[i]:self.key_offsets[i + 1]])
+
+    def find_poi(self, name: str):
+        """POI index for an exact (normalized) name, e.g. "eiffel tower", or None."""
+        target = normalize_name(name).encode("utf-8")
+        lo, hi = 0, len(self.key_poi)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name_key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.key_poi) and self._name_key(lo) == target:
+            return int(self.key_poi[lo])
+        return None
+
+    def city_center(self, city_id: int):
+        """Mean coordinates of a city's POIs."""
+        start, end = int(self.city_offsets[city_id]), int(self.city_offsets[city_id + 1])
+        if start == end:
+            return None
+        return float(np.mean(self.lat[start:end])), float(np.mean(self.lon[start:end]))
+
+    def category_ids(self, category: str) -> list:
+        """Category codes matching a name, singular or plural ("museums" -> museum)."""
+        key = normalize_name(category)
+        return [i for i, c in enumerate(self.categories)
+                if normalize_name(c) in (key, key.rstrip("s"), key[:-2] if key.endswith("es") else key)]
+
+    def nearby(self, lat, lon, k=5, radius_km=None, category=None, exclude=None) -> list:
+        """
+        POIs around (lat, lon), nearest first, each with distance_km: the k
+        nearest (within 50 km), or all within radius_km (at most k).
+        """
+        codes = None
+        if category is not None:
+            codes = self.category_ids(category)
+            if not codes:
+                return []
+        extra = 0 if exclude is None else 1
+        if radius_km is None:
+            indices, distances = self.spatial.nearest(lat, lon, k=k + extra, category=codes)
+        else:
+            indices, distances = self.spatial.radius(lat, lon, radius_km, category=codes, limit=k + extra)
+        results = []
+        for i, distance in zip(indices, distances):
+            if int(i) == exclude:
+                continue
+            results.append(dict(self.poi(int(i)), distance_km=round(float(distance), 2)))
+        return results[:k]
+
+
+def _load_blob(path):
+    return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+
+def read_poi_records(path):
+    """Rows from a CSV (header with POI_COLUMNS) or Parquet file (needs pyarrow)."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet POI dumps requires pyarrow (pip install pyarrow)")
+        table = pq.read_table(path)
+        columns = [c for c in POI_COLUMNS if c in table.column_names]
+        data = table.select(columns).to_pydict()
+        yield from zip(*(data[c] for c in columns))
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield tuple(row.get(c, "") for c in POI_COLUMNS)
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import random
+    import sys
+    import tempfile
+    import time
+
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        store = POIStore.from_file(sys.argv[2])
+        store.save(sys.argv[3])
+        print(f"{len(store)} POIs in {len(store.city_names)} cities -> {sys.argv[3]}")
+        sys.exit(0)
+
+    seed = POIStore.from_records(SEED_POIS)
+    for query in ("NYC", "Roma", "Tokio", "paris", "Londn", "Narnia"):
+        city_id = seed.resolver.resolve(query)
+        print(f"{query!r:10} ->", seed.city_names[city_id] if city_id is not None else None,
+              [p["name"] for p in seed.city_pois(city_id, k=2)] if city_id is not None else [])
+    louvre = seed.find_poi("louvre museum")
+    print("near the Louvre:", seed.nearby(float(seed.lat[louvre]), float(seed.lon[louvre]), k=2, exclude=louvre))
+
+    # Scale: ~13k synthetic cities x 10 POIs, saved and memory-mapped
+    rng = random.Random(1)
+    syllables = ["ka", "lo", "mi", "ra", "ten", "bur", "gov", "sel", "an", "vi", "do", "port", "ville"]
+    cities = sorted({"".join(rng.choices(syllables, k=rng.randint(2, 4))).title() for _ in range(40000)})[:30000]
+    records = [(c, "XX", f"{c} sight {j}", rng.choice(["museum", "park", "landmark"]),
+                rng.uniform(-60, 60), rng.uniform(-180, 180), rng.random())
+               for c in cities for j in range(10)] + SEED_POIS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        POIStore.from_records(records).save(tmp)
+        print(f"built + saved {len(records)} POIs / {len(cities)} cities in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        store = POIStore.load(tmp)
+        resolver = store.resolver
+        print(f"load + resolver: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        queries = ["Tokio", "Roma", "NYC"] + [c[:-1] + "x" for c in rng.sample(cities, 200)]
+        start = time.perf_counter()
+        hits = sum(resolver.resolve(q) is not None for q in queries)
+        per_query = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"fuzzy resolve: {per_query:.0f} us/query, {hits}/{len(queries)} resolved")
+        print(store.city_pois(resolver.resolve("Tokio"), k=3))
+
+        start = time.perf_counter()
+        found = [store.find_poi(q) for q in ("Eiffel Tower", "colosseum", f"{cities[7]} sight 3", "Narnia")]
+        print(f"find_poi x4 on a cold store: {(time.perf_counter() - start) * 1000:.2f} ms ->",
+              [store.poi_name(i) if i is not None else None for i in found])
+
+        tokyo = store.city_center(resolver.resolve("Tokio"))
+        print("near Tokyo:", [(p["name"], p["distance_km"]) for p in store.nearby(*tokyo, k=3)])
@@ -1,10 +1,154 @@
 # reflection.py
 
-from prompts import REFLECTION_PROMPT
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from prompts import REFLECTION_PROMPT, SEGMENT_REFLECTION_PROMPT
+from llm_scheduler import Priority
+from metrics import REFLECTIONS
+
+REFLECTION_MODES = ("post", "incremental")
+
+# Boundary = paragraph break, or whitespace after sentence-ending punctuation
+_BOUNDARY = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+
+def apply_reflection(llm_client, assistant_answer, gate=None, tool_context=None, known_text=None):
+    """
+    Run the REFLECTION_PROMPT pass. With a gate, the LLM call is skipped
+    (answer returned unchanged) when the local grounding risk is low.
+    """
+    if gate and not gate.should_reflect(assistant_answer, tool_context, known_text):
+        REFLECTIONS.inc(kind="post", outcome="skipped")
+        return assistant_answer
 
-def apply_reflection(llm_client, assistant_answer):
     messages = [
         {"role": "system", "content": REFLECTION_PROMPT},
         {"role": "user", "content": assistant_answer}
     ]
-    return llm_client.chat(messages, stream=False, temperature=0.1)
+    checked = llm_client.chat(messages, stream=False, temperature=0.1,
+                              priority=Priority.REFLECTION, hedge=True)
+    REFLECTIONS.inc(kind="post", outcome=_outcome(assistant_answer, checked))
+    return checked
+
+
+def _outcome(original, checked):
+    return "unchanged" if (checked or "").strip() == original.strip() else "revised"
+
+
+def reflect_segment(llm_client, segment, gate=None, tool_context=None, known_text=None):
+    """Check one segment; whitespace around it is preserved so segments re-join cleanly."""
+    body = segment.strip()
+    if not body:
+        return segment
+    if gate and not gate.should_reflect(body, tool_context, known_text):
+        REFLECTIONS.inc(kind="segment", outcome="skipped")
+        return segment
+
+    messages = [
+        {"role": "system", "content": SEGMENT_REFLECTION_PROMPT},
+        {"role": "user", "content": body}
+    ]
+    try:
+        checked = llm_client.chat(messages, stream=False, temperature=0.1,
+                                  priority=Priority.REFLECTION, hedge=True)
+    except Exception as e:
+        print(f"[Reflection Error]: {e}")
+        REFLECTIONS.inc(kind="segment", outcome="error")
+        return segment
+    if not checked or not checked.strip():
+        REFLECTIONS.inc(kind="segment", outcome="error")
+        return segment
+    REFLECTIONS.inc(kind="segment", outcome=_outcome(body, checked))
+
+    leading = segment[:len(segment) - len(segment.lstrip())]
+    trailing = segment[len(segment.rstrip()):]
+    return f"{leading}{checked.strip()}{trailing}"
+
+
+class IncrementalReflector:
+    """
+    Reflection that overlaps with generation.
+
+    feed() receives streamed chunks, cuts them into sentence/paragraph
+    segments of at least min_chars and checks each one on a worker pool
+    while the model keeps generating. finish() checks the tail and
+    re-assembles the answer in order, so the wait after the stream ends
+    is roughly one segment check instead of a full second completion.
+    """
+
+    def __init__(self, llm_client, executor: ThreadPoolExecutor, min_chars=160,
+                 gate=None, tool_context=None, known_text=None):
+        self.llm = llm_client
+        self.executor = executor
+        self.min_chars = min_chars
+        self.gate = gate
+        self.tool_context = tool_context
+        self.known_text = known_text
+        self._buffer = ""
+        self._futures = []
+
+    def feed(self, chunk: str):
+        self._buffer += chunk
+        if len(self._buffer) < self.min_chars:
+            return
+
+        # Cut at the last boundary that leaves a segment of at least min_chars
+        cut = None
+        for match in _BOUNDARY.finditer(self._buffer):
+            if match.end() >= self.min_chars:
+                cut = match.end()
+        if cut is None:
+            return
+
+        segment, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        self._submit(segment)
+
+    def _submit(self, segment: str):
+        self._futures.append(self.executor.submit(
+            reflect_segment, self.llm, segment, self.gate, self.tool_context, self.known_text
+        ))
+
+    @property
+    def segments_submitted(self) -> int:
+        return len(self._futures)
+
+    def finish(self) -> str:
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = ""
+        return "".join(f.result() for f in self._futures)
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import time
+
+    class SlowEchoLLM:
+        """Returns the input unchanged; latency grows with the text it must rewrite."""
+        def chat(self, messages, stream=False, json_mode=False, temperature=0, **kwargs):
+            time.sleep(0.1 + 0.004 * len(messages[-1]["content"]))
+            return messages[-1]["content"]
+
+    answer = ("Paris is lovely in spring. The Louvre is the largest art museum in the world. "
+              "Montmartre has great views over the city.\n\nFor food, try a bistro near the "
+              "Marais. Book the Eiffel Tower ahead of time to skip the queues. Enjoy your trip!")
+    tokens = answer.split(" ")
+
+    reflector = IncrementalReflector(SlowEchoLLM(), ThreadPoolExecutor(max_workers=4), min_chars=60)
+    start = time.perf_counter()
+    for i, token in enumerate(tokens):
+        time.sleep(0.02)  # simulated generation speed
+        reflector.feed(token if i == len(tokens) - 1 else token + " ")
+    generation = time.perf_counter() - start
+    final = reflector.finish()
+    total = time.perf_counter() - start
+
+    assert final == answer
+
+    start = time.perf_counter()
+    apply_reflection(SlowEchoLLM(), answer)
+    post = generation + time.perf_counter() - start
+
+    print(f"segments={reflector.segments_submitted} generation={generation:.2f}s "
+          f"incremental time_to_final={total:.2f}s, post time_to_final={post:.2f}s")
@@ -1,17 +1,57 @@
 # router.py
 from llm_client import LLMClient
 from prompts import ROUTER_PROMPT
+from intent_classifier import LocalIntentClassifier, chat_intent
+from router_cache import RouterCache
+from llm_scheduler import Priority
+from tool_executor import LOCATION_TOOLS
 
 class IntentRouter:
-    def __init__(self, client: LLMClient):
+    def __init__(self, client: LLMClient, logger=None,
+                 confidence_threshold=0.75, use_local_tier=True, cache=None):
         self.client = client
+        self.logger = logger
+        self.confidence_threshold = confidence_threshold
+        self.local = LocalIntentClassifier() if use_local_tier else None
+        # Memo of LLM decisions; pass cache=False to disable
+        self.cache = RouterCache() if cache is None else (cache or None)
 
-    def determine_intent(self, user_input: str) -> dict:
+    def _log_tier(self, tier: str, confidence=None):
+        if self.logger:
+            self.logger.log("router_tier", {"tier": tier, "confidence": confidence})
+
+    def determine_intent(self, user_input: str, default_location=None, before_llm=None) -> dict:
         """
-        The router MUST always call the LLM in JSON mode
-        and MUST NOT stream under any circumstances.
+        Tiered routing:
+        1. Local keyword/gazetteer classifier for high-confidence cases.
+        2. Cache of earlier LLM decisions for the same normalized text.
+        3. LLM fallback, which MUST always run in JSON mode
+           and MUST NOT stream under any circumstances.
+
+        default_location (the session's destination) fills location tool
+        calls the message leaves without a city, in every tier.
+        before_llm() is called when routing falls through to the LLM tier
+        (the assistant starts a speculative answer there).
         """
+        confidence = None
+        if self.local:
+            intent, confidence = self.local.classify(user_input, default_location=default_location)
+            if confidence >= self.confidence_threshold:
+                self._log_tier("local", confidence)
+                return intent
+
+        if self.cache:
+            cached = self.cache.get(user_input)
+            if cached is not None:
+                self._log_tier("cache", confidence)
+                return fill_locations(cached, default_location)
 
+        self._log_tier("llm", confidence)
+        if before_llm:
+            before_llm()
+        return fill_locations(self._llm_intent(user_input), default_location)
+
+    def _llm_intent(self, user_input: str) -> dict:
         messages = [
             {"role": "system", "content": ROUTER_PROMPT},
             {"role": "user", "content": user_input}
@@ -22,18 +62,53 @@ class IntentRouter:
                 messages,
                 json_mode=True,       # ALWAYS JSON
                 stream=False,         # NEVER STREAM
-                temperature=0         # Deterministic
+                temperature=0,        # Deterministic
+                priority=Priority.ROUTER,
+                hedge=True            # idempotent: safe to race a duplicate
             )
 
             # Ensure valid structure
             if isinstance(result, dict):
+                valid = bool(result.get("tool"))
+                result = normalize_intent(result)
+                # Only real LLM decisions are memoized, never fallbacks
+                if self.cache and valid:
+                    self.cache.put(user_input, result)
                 return result
             else:
-                return {"tool": "chat", "location": None}
+                return chat_intent()
 
         except Exception as e:
             print(f"[Router Error]: {e}")
-            return {"tool": "chat", "location": None}
+            return chat_intent()
+
+
+def normalize_intent(result: dict) -> dict:
+    """
+    Make sure a router result carries the list contract:
+    {"tool", "location", "calls": [{"tool", "location" | "query"}, ...]}.
+    Older single-tool answers are wrapped into a one-element plan.
+    """
+    calls = result.get("calls")
+    if not isinstance(calls, list):
+        tool = result.get("tool")
+        calls = [] if tool in (None, "chat") else [
+            {"tool": tool, "location": result.get("location")}
+        ]
+    return {"tool": result.get("tool"), "location": result.get("location"), "calls": calls}
+
+
+def fill_locations(intent: dict, location) -> dict:
+    """Location tool calls without a city get `location`; memoized intents stay untouched."""
+    if not location:
+        return intent
+    calls = [dict(c, location=location)
+             if isinstance(c, dict) and c.get("tool") in LOCATION_TOOLS and not c.get("location") else c
+             for c in intent.get("calls") or []]
+    filled = dict(intent, calls=calls)
+    if calls and isinstance(calls[0], dict):
+        filled["location"] = calls[0].get("location", intent.get("location"))
+    return filled
 
 
 # --- QUICK TEST BLOCK ---
@@ -47,6 +122,7 @@ if __name__ == "__main__":
         "Hi, who are you?",  # Should be 'chat'
         "Is it raining in Tokyo right now?",  # Should be 'weather' -> 'Tokyo'
         "Give me 3 things to see in London.",  # Should be 'attractions' -> 'London'
+        "Weather and attractions in Paris and Rome",  # Four calls
         "I want to go to France."  # Ambiguous, likely 'chat' or 'attractions'
     ]
 
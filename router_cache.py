@@ -0,0 +1,188 @@
+# router_cache.py
+
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import CACHE_LOOKUPS
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Casefold and collapse punctuation/whitespace: 'Weather in  PARIS?!' -> 'weather in paris'."""
+    text = _PUNCTUATION.sub(" ", text.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class RouterCache:
+    """
+    LRU + TTL memo of router decisions keyed on normalized user text.
+
+    - max_size bounds the number of entries (least recently used evicted first)
+    - ttl is in seconds; expired entries count as misses
+    - persist_path (optional) keeps the cache on disk so a restart starts warm;
+      a background thread writes it every persist_interval seconds while
+      there are new entries, and close() writes the last ones. put() never
+      touches the disk, so persistence errors cannot fail a routing decision.
+    """
+
+    def __init__(self, max_size=1024, ttl=24 * 3600, persist_path=None, persist_interval=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self._entries = OrderedDict()  # key -> (stored_at, intent)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if persist_path:
+            self.load()
+            self._thread = threading.Thread(target=self._persist_loop, name="router-cache-persist",
+                                            daemon=True)
+            self._thread.start()
+
+    def get(self, user_input: str):
+        key = normalize_text(user_input)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="router", result="miss")
+                return None
+
+            stored_at, intent = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="router", result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="router", result="hit")
+            return dict(intent)
+
+    def put(self, user_input: str, intent: dict):
+        key = normalize_text(user_input)
+        if not key:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), dict(intent))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    # ------------ PERSISTENCE ------------
+
+    def save(self, path=None):
+        path = path or self.persist_path
+        with self._lock:
+            rows = [[k, t, v] for k, (t, v) in self._entries.items()]
+            self._dirty = False
+        # One writer at a time, each through its own temp file in the target
+        # directory; os.replace is atomic, never leaves a half-written cache
+        with self._save_lock:
+            fd, tmp_path = tempfile.mkstemp(prefix=".router_cache_", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(path)))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(rows, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                raise
+
+    def _persist(self):
+        try:
+            self.save()
+        except Exception as e:
+            with self._lock:
+                self._dirty = True   # retried on the next interval
+            print(f"[Router Cache Error]: could not save {self.persist_path}: {e}")
+
+    def _persist_loop(self):
+        while not self._stop.wait(self.persist_interval):
+            if self._dirty:
+                self._persist()
+
+    def close(self):
+        """Stop background persistence and write entries not saved yet."""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._dirty:
+            self._persist()
+
+    def load(self, path=None):
+        path = path or self.persist_path
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Router Cache]: ignoring unreadable cache file {path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, stored_at, intent in rows[-self.max_size:]:
+                if now - stored_at <= self.ttl and isinstance(intent, dict):
+                    self._entries[key] = (stored_at, intent)
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    cache = RouterCache(max_size=2, ttl=60)
+    cache.put("Weather in Paris?", {"tool": "weather", "location": "Paris"})
+    print(cache.get("weather   in PARIS"))          # hit
+    cache.put("things to do in Rome", {"tool": "attractions", "location": "Rome"})
+    cache.put("weather in Oslo", {"tool": "weather", "location": "Oslo"})
+    print(cache.get("Things to do in Rome!"))       # hit
+    print(cache.get("weather in paris"))            # evicted -> None
+    print(cache.stats())
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Concurrent puts with persistence: no shared temp file, nothing raised
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "router_cache.json")
+        cache = RouterCache(persist_path=path, persist_interval=0.01)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda i: cache.put(f"weather in city {i}", {"tool": "weather"}), range(2000)))
+        cache.close()
+        reloaded = RouterCache(persist_path=path)
+        reloaded.close()
+        print("reloaded:", reloaded.stats()["size"], "entries,", "leftover files:", sorted(os.listdir(tmp)))
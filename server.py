@@ -0,0 +1,328 @@
+# server.py
+"""
+Multi-session HTTP/SSE front end for TravelAssistant (stdlib asyncio only).
+
+POST   /sessions                   -> 201 {"session_id": "..."}
+POST   /sessions/<id>/messages     {"message": "..."} -> text/event-stream
+                                   events: chunk {"text"}, final {"text"}, error {"error"}
+DELETE /sessions/<id>              -> 204
+GET    /health                     -> 200 {"hot_sessions": n, "active_turns": n, ...}
+GET    /metrics                    -> 200 Prometheus text (latency histograms, tokens,
+                                   cache hit ratios; see metrics.py)
+
+All sessions share one LLMClient, tool executor, router cache and answer
+cache (near-duplicate questions are answered without an LLM call). Turns in
+one session are serialized by a per-session lock; max_concurrent_turns caps
+turns in flight across the whole process.
+
+Conversation state is written behind to a SQLite session store after each
+turn. Only max_hot_sessions live in memory; idle or least-recently-used
+sessions are dropped and lazily rehydrated when they come back. A session
+is pinned in memory while a request holds it, and a session deleted during
+a turn stays deleted. close() releases every session and closes the store.
+
+prewarm=True loads the LLM SDK and opens the Groq and OpenWeather
+connections in the background at startup, keeping them alive while idle
+(see warmup.py), so the first turn does not pay for them.
+
+    python server.py --port 8080 --max-concurrent-turns 32
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import AnswerCache
+from assistant import TravelAssistant
+from hedging import Hedger
+from llm_client import LLMClient
+from metrics import REGISTRY
+from router_cache import RouterCache
+from session_store import SQLiteSessionStore, HotSessionCache
+from tool_executor import ToolExecutor
+from turn_events import CHUNK, FINAL
+from utils import EventLogger
+from warmup import Prewarmer
+
+_REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+            404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class Session:
+    def __init__(self, session_id: str, assistant: TravelAssistant):
+        self.id = session_id
+        self.assistant = assistant
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+
+
+class TravelServer:
+    def __init__(self, llm=None, host="127.0.0.1", port=8080, max_concurrent_turns=32,
+                 assistant_options=None, session_db="sessions.db", max_hot_sessions=10000,
+                 idle_timeout=1800, answer_cache=True, prewarm=False, keepalive_s=30):
+        self.llm = llm or LLMClient()
+        self.host = host
+        self.port = port
+        self.max_concurrent_turns = max_concurrent_turns
+        self.assistant_options = assistant_options or {}
+
+        self.tool_executor = ToolExecutor(max_workers=16)
+        self.router_cache = RouterCache()
+        # answer_cache=True builds the default AnswerCache; False disables it
+        self.answer_cache = AnswerCache() if answer_cache is True else (answer_cache or None)
+        self.store = SQLiteSessionStore(session_db)
+        self.sessions = HotSessionCache(
+            self.store,
+            rehydrate=self._rehydrate,
+            snapshot=lambda session: session.assistant.state.to_dict(),
+            max_hot=max_hot_sessions,
+            idle_timeout=idle_timeout,
+            on_evict=lambda session: session.assistant.close(),
+        )
+        self.active_turns = 0
+        self.prewarmer = Prewarmer(self.llm, keepalive_s=keepalive_s) if prewarm else None
+
+        # stream_turn is blocking (Groq SDK); it runs on this pool, one thread per turn slot
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent_turns, thread_name_prefix="turn")
+        self._turn_slots = None
+        self._server = None
+        self._evictor = None
+
+    # ------------ SESSIONS ------------
+
+    def _new_assistant(self) -> TravelAssistant:
+        return TravelAssistant(
+            llm=self.llm,
+            tool_executor=self.tool_executor,
+            router_cache=self.router_cache,
+            answer_cache=self.answer_cache,
+            logger=EventLogger(max_events=200),
+            **self.assistant_options,
+        )
+
+    def new_session(self) -> Session:
+        session = Session(uuid.uuid4().hex, self._new_assistant())
+        self.sessions.add(session.id, session)
+        return session
+
+    def _rehydrate(self, session_id: str, state: dict) -> Session:
+        assistant = self._new_assistant()
+        assistant.state.restore(state)
+        return Session(session_id, assistant)
+
+    async def _evict_idle_sessions(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            self.sessions.evict_idle()
+
+    # ------------ HTTP ------------
+
+    async def start(self):
+        if self.prewarmer:
+            self.prewarmer.start()
+        self._turn_slots = asyncio.Semaphore(self.max_concurrent_turns)
+        self._evictor = asyncio.ensure_future(self._evict_idle_sessions())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Voyager server listening on http://{self.host}:{self.port}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """Shutdown: let running turns finish and persist, then release sessions and the store."""
+        if self.prewarmer:
+            self.prewarmer.stop()
+        if self._evictor:
+            self._evictor.cancel()
+        self._pool.shutdown(wait=True)
+        self.sessions.close()
+        self.store.close()
+        self.router_cache.close()
+
+    def start_in_thread(self):
+        """Run the server on a background event loop (benchmarks / embedding)."""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="travel-server", daemon=True).start()
+        ready.wait()
+        return self
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, path, _ = request_line.split(" ", 2)
+
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            body = await reader.readexactly(length) if length else b""
+            await self._route(method, path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"[Server Error]: {e}")
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        parts = [p for p in path.split("?")[0].split("/") if p]
+
+        if parts == ["health"] and method == "GET":
+            await self._send_json(writer, 200, dict(
+                self.sessions.stats(), active_turns=self.active_turns,
+                answer_cache=self.answer_cache.stats() if self.answer_cache else None,
+                prewarm=self.prewarmer.stats() if self.prewarmer else None))
+        elif parts == ["metrics"] and method == "GET":
+            await self._send_text(writer, 200, REGISTRY.render(), "text/plain; version=0.0.4")
+        elif parts == ["sessions"] and method == "POST":
+            session = self.new_session()
+            await self._send_json(writer, 201, {"session_id": session.id})
+        elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+            self.sessions.remove(parts[1])
+            await self._send_json(writer, 204, None)
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages" and method == "POST":
+            try:
+                message = json.loads(body or b"{}")["message"]
+            except (ValueError, KeyError, TypeError):
+                await self._send_json(writer, 400, {"error": "expected JSON body {\"message\": ...}"})
+                return
+            # get() may rehydrate from disk; keep that off the event loop. The
+            # pin keeps this exact object in memory until the turn is saved
+            session = await asyncio.get_running_loop().run_in_executor(
+                self._pool, lambda: self.sessions.get(parts[1], pin=True))
+            if session is None:
+                await self._send_json(writer, 404, {"error": "unknown session"})
+                return
+            try:
+                await self._stream_turn(session, message, writer)
+            finally:
+                self.sessions.unpin(session.id)
+        else:
+            await self._send_json(writer, 404, {"error": "not found"})
+
+    @staticmethod
+    async def _send_json(writer, status, payload):
+        body = "" if payload is None else json.dumps(payload)
+        await TravelServer._send_text(writer, status, body, "application/json")
+
+    @staticmethod
+    async def _send_text(writer, status, text, content_type):
+        body = text.encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    # ------------ SSE TURN ------------
+
+    async def _stream_turn(self, session: Session, message: str, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        client_gone = False
+
+        async def send(event, data):
+            nonlocal client_gone
+            if client_gone:
+                return
+            try:
+                writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                await writer.drain()
+            except ConnectionError:
+                client_gone = True
+
+        async with session.lock:            # one turn at a time per session
+            async with self._turn_slots:    # global concurrency limit
+                self.active_turns += 1
+                session.last_active = time.monotonic()
+                loop = asyncio.get_running_loop()
+                events = asyncio.Queue()
+
+                def push(kind, payload):
+                    loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+
+                def run():
+                    try:
+                        final = None
+                        for event in session.assistant.stream_turn(message):
+                            if event.type == CHUNK:
+                                push("chunk", event.data["text"])
+                            elif event.type == FINAL:
+                                final = event.data["text"]
+                        # Write-behind; skipped if the session was deleted meanwhile
+                        self.sessions.persist(session.id, session)
+                        push("final", final)
+                    except Exception as e:
+                        push("error", str(e))
+
+                loop.run_in_executor(self._pool, run)
+                try:
+                    # Drain until the turn finishes even if the client left,
+                    # so the session lock is only released once state is saved
+                    while True:
+                        kind, payload = await events.get()
+                        if kind == "error":
+                            await send("error", {"error": payload})
+                            break
+                        await send(kind, {"text": payload})
+                        if kind == "final":
+                            break
+                finally:
+                    self.active_turns -= 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voyager multi-session SSE server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrent-turns", type=int, default=32)
+    parser.add_argument("--session-db", default="sessions.db")
+    parser.add_argument("--max-hot-sessions", type=int, default=10000)
+    parser.add_argument("--hedge", action="store_true",
+                        help="hedge slow router/reflection calls with a duplicate request")
+    parser.add_argument("--orchestration", choices=["router", "native"], default="router")
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="always generate, even for near-duplicate questions")
+    parser.add_argument("--speculative", action="store_true",
+                        help="start the no-tool answer while the router's LLM call runs")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="open and keep alive the Groq/OpenWeather connections at startup")
+    args = parser.parse_args()
+
+    # Router and reflection calls of every running turn may hedge at once
+    hedging = Hedger(max_workers=2 * args.max_concurrent_turns) if args.hedge else False
+    server = TravelServer(llm=LLMClient(hedging=hedging), host=args.host, port=args.port,
+                          max_concurrent_turns=args.max_concurrent_turns,
+                          assistant_options={"orchestration": args.orchestration,
+                                             "speculative": args.speculative},
+                          session_db=args.session_db, max_hot_sessions=args.max_hot_sessions,
+                          answer_cache=not args.no_answer_cache, prewarm=args.prewarm)
+    asyncio.run(server.serve_forever())
@@ -0,0 +1,332 @@
+# session_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SQLiteSessionStore:
+    """
+    Embedded session store (SQLite in WAL mode) with write-behind.
+
+    save() only records the latest snapshot per session in memory; a
+    background thread writes pending snapshots in one transaction every
+    flush_interval seconds. load() sees pending writes first, so a session
+    evicted from memory a moment ago rehydrates correctly.
+    """
+
+    def __init__(self, path="sessions.db", flush_interval=0.2):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = {}  # session_id -> JSON text, or None for delete
+        self._writing = {}  # batch currently being committed, still visible to load()
+        self._pending_lock = threading.Lock()
+        self._flushed = threading.Condition(self._pending_lock)
+        self._stop = threading.Event()
+
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._reader.commit()
+
+        self.writes = 0
+        self._thread = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ------------ API ------------
+
+    def save(self, session_id: str, state: dict):
+        payload = json.dumps(state, ensure_ascii=False)
+        with self._pending_lock:
+            self._pending[session_id] = payload
+
+    def delete(self, session_id: str):
+        with self._pending_lock:
+            self._pending[session_id] = None
+
+    def load(self, session_id: str):
+        with self._pending_lock:
+            for snapshots in (self._pending, self._writing):
+                if session_id in snapshots:
+                    payload = snapshots[session_id]
+                    return json.loads(payload) if payload is not None else None
+        with self._read_lock:
+            row = self._reader.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Block until everything saved so far is committed: nothing pending and
+        no batch mid-commit. False if timeout (seconds) ran out first.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._pending_lock:
+            while self._pending or self._writing:
+                wait = self.flush_interval * 4
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return False
+                self._flushed.wait(wait)
+        return True
+
+    def close(self, timeout=30):
+        if not self.flush(timeout):
+            print(f"[Session Store Error]: close: unsaved sessions after {timeout}s")
+        self._stop.set()
+        self._thread.join()
+        self._reader.close()
+
+    # ------------ WRITER THREAD ------------
+
+    def _write_loop(self):
+        writer = self._connect()
+        while not self._stop.is_set():
+            time.sleep(self.flush_interval)
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                self._writing = batch
+            if batch:
+                now = time.time()
+                upserts = [(sid, data, now) for sid, data in batch.items() if data is not None]
+                deletes = [(sid,) for sid, data in batch.items() if data is None]
+                try:
+                    writer.execute("BEGIN")
+                    writer.executemany("INSERT OR REPLACE INTO sessions (id, data, updated) "
+                                       "VALUES (?, ?, ?)", upserts)
+                    writer.executemany("DELETE FROM sessions WHERE id = ?", deletes)
+                    writer.execute("COMMIT")
+                    self.writes += len(batch)
+                except sqlite3.Error as e:
+                    print(f"[Session Store Error]: {e}")
+                    try:
+                        writer.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass  # no transaction left to roll back; keep the writer alive
+                    with self._pending_lock:
+                        # Retry next round unless a newer snapshot arrived meanwhile
+                        for sid, data in batch.items():
+                            self._pending.setdefault(sid, data)
+            with self._pending_lock:
+                self._writing = {}
+                self._flushed.notify_all()
+        writer.close()
+
+
+class HotSessionCache:
+    """
+    Bounded in-memory LRU of live sessions in front of a session store.
+
+    - get(): hot hit, or lazy rehydration through `rehydrate(session_id, state)`
+    - persist(): write-behind snapshot after a turn
+    - eviction (capacity or idle) only drops the object; its state is already
+      queued in the store, so memory stays bounded however many sessions exist
+    - get(pin=True) pins the object until unpin(): pinned sessions are never
+      evicted, so a request never works on a copy a second request rehydrated
+    - remove() during a pinned request leaves a tombstone: persist() skips the
+      session until the last unpin, so a finishing turn cannot resurrect it
+    - on_evict(obj) runs for every object dropped for good (evicted, removed
+      or at close), e.g. to release its worker threads
+    """
+
+    def __init__(self, store, rehydrate, snapshot, max_hot=10000, idle_timeout=1800,
+                 can_evict=lambda obj: True, on_evict=None):
+        self.store = store
+        self.rehydrate = rehydrate    # (session_id, state_dict) -> live object
+        self.snapshot = snapshot      # live object -> state_dict
+        self.can_evict = can_evict    # extra veto on top of pins
+        self.on_evict = on_evict
+        self.max_hot = max_hot
+        self.idle_timeout = idle_timeout
+        self._hot = OrderedDict()     # session_id -> (last_active, object)
+        self._pins = {}               # session_id -> requests holding the object
+        self._removed = {}            # session_id -> object removed while pinned
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.rehydrations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._hot)
+
+    def add(self, session_id: str, obj):
+        with self._lock:
+            self._hot[session_id] = (time.monotonic(), obj)
+            dropped = self._evict_over_capacity()
+        self._dropped(dropped)
+        self.persist(session_id, obj)
+
+    def _pin(self, session_id):
+        self._pins[session_id] = self._pins.get(session_id, 0) + 1
+
+    def get(self, session_id: str, pin=False):
+        with self._lock:
+            entry = self._hot.get(session_id)
+            if entry is not None:
+                self._hot[session_id] = (time.monotonic(), entry[1])
+                self._hot.move_to_end(session_id)
+                self.hits += 1
+                if pin:
+                    self._pin(session_id)
+                return entry[1]
+
+        state = self.store.load(session_id)
+        if state is None:
+            return None
+        obj = self.rehydrate(session_id, state)
+        with self._lock:
+            # Another thread may have rehydrated it meanwhile; keep the first copy
+            if session_id in self._hot:
+                first = self._hot[session_id][1]
+                if pin:
+                    self._pin(session_id)
+                dropped = [obj]
+            else:
+                first = obj
+                self._hot[session_id] = (time.monotonic(), obj)
+                self.rehydrations += 1
+                if pin:
+                    self._pin(session_id)
+                dropped = self._evict_over_capacity()
+        self._dropped(dropped)
+        return first
+
+    def unpin(self, session_id: str):
+        with self._lock:
+            count = self._pins.get(session_id, 0) - 1
+            if count > 0:
+                self._pins[session_id] = count
+                return
+            self._pins.pop(session_id, None)
+            removed = self._removed.pop(session_id, None)
+        self._dropped([removed] if removed is not None else [])
+
+    def persist(self, session_id: str, obj):
+        state = self.snapshot(obj)
+        with self._lock:
+            if session_id in self._removed:
+                return  # deleted while its turn ran
+            self.store.save(session_id, state)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            entry = self._hot.pop(session_id, None)
+            dropped = [entry[1]] if entry else []
+            if session_id in self._pins:
+                # Still in use: released, and its tombstone cleared, at the last unpin
+                self._removed.setdefault(session_id, entry[1] if entry else None)
+                dropped = []
+            self.store.delete(session_id)
+        self._dropped(dropped)
+
+    def close(self):
+        """Release every object still in memory (shutdown; their state is in the store)."""
+        with self._lock:
+            dropped = [obj for _, obj in self._hot.values()]
+            dropped += [obj for obj in self._removed.values() if obj is not None]
+            self._hot.clear()
+            self._removed.clear()
+        self._dropped(dropped)
+
+    def _evictable(self, session_id, obj) -> bool:
+        return session_id not in self._pins and self.can_evict(obj)
+
+    def _dropped(self, objects):
+        if not self.on_evict:
+            return
+        for obj in objects:
+            try:
+                self.on_evict(obj)
+            except Exception as e:
+                print(f"[Session Cache Error]: {e}")
+
+    def _evict_over_capacity(self) -> list:
+        """Evicted objects; the caller passes them to _dropped() outside the lock."""
+        excess = len(self._hot) - self.max_hot
+        if excess <= 0:
+            return []
+        victims = []
+        for session_id, (_, obj) in self._hot.items():  # oldest first
+            if len(victims) >= excess:
+                break
+            if self._evictable(session_id, obj):
+                victims.append(session_id)
+        self.evictions += len(victims)
+        return [self._hot.pop(session_id)[1] for session_id in victims]
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle longer than idle_timeout; returns how many were evicted."""
+        cutoff = time.monotonic() - self.idle_timeout
+        dropped = []
+        with self._lock:
+            for session_id, (last_active, obj) in list(self._hot.items()):
+                if last_active >= cutoff:
+                    break  # LRU order: the rest are more recent
+                if self._evictable(session_id, obj):
+                    del self._hot[session_id]
+                    dropped.append(obj)
+            self.evictions += len(dropped)
+        self._dropped(dropped)
+        return len(dropped)
+
+    def stats(self) -> dict:
+        return {"hot": len(self._hot), "hits": self.hits,
+                "rehydrations": self.rehydrations, "evictions": self.evictions}
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import tempfile
+    from state_manager import StateManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, "sessions.db"))
+        cache = HotSessionCache(
+            store,
+            rehydrate=lambda sid, state: StateManager(system_prompt="sys").restore(state),
+            snapshot=lambda state: state.to_dict(),
+            max_hot=2,
+        )
+        for sid in ("a", "b", "c"):
+            state = StateManager(system_prompt="sys")
+            state.add_user(f"hello from {sid}")
+            cache.add(sid, state)
+
+        print(cache.stats())                 # "a" was evicted from memory
+        print(cache.get("a").history)        # ...and rehydrates from the store
+
+        # A pinned session is never evicted, and deleting it mid-turn is final
+        pinned = cache.get("b", pin=True)
+        for sid in ("d", "e", "f"):
+            cache.add(sid, StateManager(system_prompt="sys"))
+        assert cache.get("b") is pinned
+        cache.remove("b")
+        pinned.add_user("late turn")
+        cache.persist("b", pinned)           # skipped: tombstoned
+        cache.unpin("b")
+        store.flush()
+        assert cache.get("b") is None and store.load("b") is None
+        print("pinned + deleted:", cache.stats())
+        store.close()
+
+        # A restarted process sees every session
+        reopened = SQLiteSessionStore(os.path.join(tmp, "sessions.db"))
+        print(reopened.count(), reopened.load("c"))
+        reopened.close()
@@ -0,0 +1,114 @@
+# speculation.py
+"""
+Speculative start of the answer stream while the router's LLM tier runs.
+
+A turn the router sends to chat is answered from a prompt that is already
+known before routing finishes: the conversation messages without tool
+context. SpeculativeStream starts that completion on a worker thread and
+buffers its tokens. Once the intent is known the assistant either
+- take()s the stream (chat intent): the router round-trip is hidden, or
+- cancel()s it (tool plan or answer-cache hit): the worker stops reading
+  and closes the stream, and the tokens spent are counted as wasted.
+
+Outcomes and wasted tokens are exported as voyager_speculation_total and
+voyager_speculation_wasted_tokens_total (see metrics.py), so the win rate
+can be read from real traffic.
+"""
+
+import queue
+import threading
+import time
+
+from metrics import SPECULATIONS, SPECULATION_WASTED_TOKENS
+from state_manager import estimate_tokens
+
+_DONE = object()
+
+
+class SpeculativeStream:
+    def __init__(self, llm, pool, messages, temperature=0.4):
+        self.messages = messages
+        self.started_at = time.perf_counter()
+        self.completion_chars = 0
+        self._queue = queue.Queue()
+        self._cancelled = threading.Event()
+        self._resolved = False
+        self._future = pool.submit(self._run, llm, messages, temperature)
+
+    def _run(self, llm, messages, temperature):
+        stream = None
+        try:
+            stream = llm.chat(messages, stream=True, temperature=temperature)
+            for text in stream:
+                if self._cancelled.is_set():
+                    break
+                self.completion_chars += len(text)
+                self._queue.put(text)
+        except Exception as e:
+            self._queue.put(e)
+        finally:
+            if stream is not None:
+                stream.close()   # releases the connection of an abandoned stream
+            self._queue.put(_DONE)
+
+    def take(self):
+        """Buffered and remaining tokens, as the turn's answer stream."""
+        self._resolve("won")
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def cancel(self, outcome="lost"):
+        """Stop the stream; outcome labels why ("lost": tools needed, "cache_hit")."""
+        if self._resolved:
+            return
+        self._cancelled.set()
+        self._resolve(outcome)
+        # Tokens are only known once the worker has stopped reading
+        self._future.add_done_callback(lambda _: self._count_waste())
+
+    def _resolve(self, outcome):
+        if not self._resolved:
+            self._resolved = True
+            SPECULATIONS.inc(outcome=outcome)
+
+    def _count_waste(self):
+        prompt = sum(estimate_tokens(str(m.get("content") or "")) for m in self.messages)
+        SPECULATION_WASTED_TOKENS.inc(prompt, kind="prompt")
+        SPECULATION_WASTED_TOKENS.inc((self.completion_chars + 3) // 4, kind="completion")
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    from llm_backends import ReplayBackend
+    from llm_client import LLMClient
+    from metrics import REGISTRY
+
+    class SlowAnswers(ReplayBackend):
+        def answer_for(self, messages):
+            return "Spring and autumn are the best seasons to visit, with mild days and fewer crowds."
+
+    llm = LLMClient(backend=SlowAnswers(ttft=0.2, tokens_per_second=50))
+    pool = ThreadPoolExecutor(max_workers=2)
+    messages = [{"role": "user", "content": "When should I visit Lisbon?"}]
+
+    start = time.perf_counter()
+    spec = SpeculativeStream(llm, pool, messages)
+    time.sleep(0.3)   # the router's LLM call would run here
+    first = None
+    for token in spec.take():
+        first = first or time.perf_counter() - start
+    print(f"won:  first token after {first * 1000:.0f} ms (serial: 300 ms router + 200 ms TTFT)")
+
+    spec = SpeculativeStream(llm, pool, messages)
+    time.sleep(0.3)
+    spec.cancel()
+    pool.shutdown(wait=True)
+    print("\n".join(line for line in REGISTRY.render().splitlines()
+                    if line.startswith("voyager_speculation")))
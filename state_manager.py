@@ -1,25 +1,194 @@
 # state_manager.py
 
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|" \
+          r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+DATE_PATTERN = re.compile(
+    r"\b(today|tonight|tomorrow|this (?:week(?:end)?|month|summer|winter|spring|autumn|fall)|"
+    r"next (?:week(?:end)?|month|year|summer|winter|spring|autumn|fall)|"
+    rf"(?:in|early|late|mid)[- ]{_MONTHS}|"
+    rf"{_MONTHS} \d{{1,2}}(?:st|nd|rd|th)?(?:\s*[-–]\s*\d{{1,2}})?|"
+    rf"\d{{1,2}}(?:st|nd|rd|th)?(?: of)? {_MONTHS}|"
+    r"\d{4}-\d{2}-\d{2})\b",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token plus a small per-message overhead (no tokenizer needed)."""
+    return (len(text) + 3) // 4 + 4
+
+
+class SessionMemory:
+    """
+    Structured per-session facts, kept next to the message history:
+    - destination: canonical city the user is currently talking about
+    - dates: travel date phrases as the user wrote them ("next week", "in March")
+    - tool results with the time they were fetched; fresh_result() returns
+      one while it is younger than the tool's TTL (ttls: tool -> seconds)
+    """
+
+    def __init__(self, ttls=None, max_results=32):
+        self.ttls = ttls or {}
+        self.max_results = max_results
+        self.destination = None
+        self.dates = None
+        self._results = OrderedDict()   # (tool, arg) -> {"result": ..., "at": epoch seconds}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(tool, arg):
+        return f"{tool}:{' '.join(str(arg).casefold().split())}"
+
+    def note_destination(self, city):
+        if city:
+            self.destination = city
+
+    def note_dates(self, text: str):
+        """Remember date phrases in text; returns them (empty list if none)."""
+        found = [m.group(1) for m in DATE_PATTERN.finditer(text)]
+        if found:
+            self.dates = ", ".join(found)
+        return found
+
+    def remember_result(self, result: dict):
+        if result.get("status") != "ok":
+            return
+        key = self._key(result["tool"], result["arg"])
+        with self._lock:
+            self._results[key] = {"result": dict(result), "at": time.time()}
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def fresh_result(self, tool: str, arg: str):
+        """A stored tool result still within its TTL (tools without a TTL are never reused)."""
+        ttl = self.ttls.get(tool)
+        if not ttl:
+            return None
+        with self._lock:
+            entry = self._results.get(self._key(tool, arg))
+        if entry is None or time.time() - entry["at"] > ttl:
+            return None
+        return dict(entry["result"], age_s=round(time.time() - entry["at"], 1))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            results = [[k, v["result"], v["at"]] for k, v in self._results.items()]
+        return {"destination": self.destination, "dates": self.dates, "results": results}
+
+    def restore(self, data: dict):
+        self.destination = data.get("destination")
+        self.dates = data.get("dates")
+        with self._lock:
+            self._results = OrderedDict(
+                (key, {"result": result, "at": at}) for key, result, at in data.get("results", []))
+        return self
+
+
 class StateManager:
-    def __init__(self, system_prompt: str, max_turns=8):
+    """
+    Conversation memory.
+
+    Default mode keeps the last max_turns * 2 messages.
+    Token-budget mode (token_budget=N) keeps the newest messages whose
+    cached token counts fit in N tokens; older messages are folded into a
+    rolling summary by `summarizer(summary, messages) -> str` on a
+    background thread, off the request path.
+
+    `memory` (SessionMemory) holds the destination, dates and recent tool
+    results; result_ttls sets how long each tool's results count as fresh.
+    """
+
+    def __init__(self, system_prompt: str, max_turns=8, token_budget=None, summarizer=None,
+                 result_ttls=None):
         self.system_prompt = system_prompt
         self.max_turns = max_turns
         self.history = []
+        self.memory = SessionMemory(ttls=result_ttls)
+
+        # Token-budget mode
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.summary = ""
+        self._token_counts = []   # parallel to history, computed once per message
+        self._window_start = 0    # index of the oldest message inside the budget
+        self._window_tokens = 0
+        self._summary_lock = threading.Lock()
+        self._summary_pool = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+            if token_budget and summarizer else None
+        )
 
     def add_user(self, msg):
-        self.history.append({"role": "user", "content": msg})
+        self._append({"role": "user", "content": msg})
 
     def add_assistant(self, msg):
-        self.history.append({"role": "assistant", "content": msg})
+        self._append({"role": "assistant", "content": msg})
+
+    def _append(self, message):
+        self.history.append(message)
+        tokens = estimate_tokens(message["content"])
+        self._token_counts.append(tokens)
+        if not self.token_budget:
+            return
+
+        # Slide the window start forward; always keep the newest message
+        self._window_tokens += tokens
+        evict_from = self._window_start
+        while self._window_tokens > self.token_budget and self._window_start < len(self.history) - 1:
+            self._window_tokens -= self._token_counts[self._window_start]
+            self._window_start += 1
+
+        if self._window_start > evict_from and self._summary_pool:
+            evicted = self.history[evict_from:self._window_start]
+            self._summary_pool.submit(self._fold_into_summary, evicted)
+
+    def _fold_into_summary(self, evicted):
+        try:
+            updated = self.summarizer(self.summary, evicted)
+        except Exception as e:
+            print(f"[Summary Error]: {e}")
+            return
+        if updated:
+            with self._summary_lock:
+                self.summary = updated.strip()
+
+    def wait_for_summary(self):
+        """Block until queued summary updates are applied (tests / shutdown)."""
+        if self._summary_pool:
+            self._summary_pool.submit(lambda: None).result()
+
+    def close(self):
+        """Stop the background summary worker (pending summaries still finish)."""
+        if self._summary_pool:
+            self._summary_pool.shutdown(wait=False)
 
     def build_messages(self, cot_prompt, tool_context=None):
+        # Stable prefix first, so it is identical across turns
         messages = [
             {"role": "system", "content": self.system_prompt},
             {"role": "system", "content": cot_prompt}
         ]
 
-        # Sliding window
-        recent = self.history[-(self.max_turns * 2):]
+        if self.token_budget:
+            with self._summary_lock:
+                summary = self.summary
+            if summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"<conversation_summary>{summary}</conversation_summary>"
+                })
+            # Window bounds are maintained on add; no re-scan of the history here
+            recent = self.history[self._window_start:]
+        else:
+            # Sliding window
+            recent = self.history[-(self.max_turns * 2):]
         messages.extend(recent)
 
         if tool_context:
@@ -30,6 +199,32 @@ class StateManager:
 
         return messages
 
+    # ------------ PERSISTENCE (see session_store.py) ------------
+
+    def to_dict(self) -> dict:
+        """Per-session state only; prompts and budgets are process configuration."""
+        with self._summary_lock:
+            summary = self.summary
+        return {"history": list(self.history), "summary": summary, "memory": self.memory.to_dict()}
+
+    def restore(self, data: dict):
+        """Rehydrate from to_dict() output; rebuilds token counts and the window."""
+        self.history = list(data.get("history", []))
+        self.summary = data.get("summary", "")
+        self.memory.restore(data.get("memory", {}))
+        self._token_counts = [estimate_tokens(m["content"]) for m in self.history]
+        self._window_start = len(self.history)
+        self._window_tokens = 0
+        if self.token_budget:
+            # Newest-first fill, done once per rehydration
+            while self._window_start > 0:
+                tokens = self._token_counts[self._window_start - 1]
+                if self._window_tokens + tokens > self.token_budget and self._window_start < len(self.history):
+                    break
+                self._window_start -= 1
+                self._window_tokens += tokens
+        return self
+
     def update_system_prompt(self, new_prompt: str):
         """Useful if you want to change the persona dynamically."""
         self.system_prompt = new_prompt
@@ -37,6 +232,8 @@ class StateManager:
 
 # --- QUICK TEST BLOCK ---
 if __name__ == "__main__":
+    import json
+
     # 1. Initialize with a persona
     state = StateManager(system_prompt="You are a helpful travel guide.")
 
@@ -47,13 +244,37 @@ if __name__ == "__main__":
 
     # 3. Test Normal Retrieval
     print("--- Normal Request ---")
-    print(state.build_messages())
+    print(state.build_messages(cot_prompt="Think step by step."))
 
     # 4. Test Context Injection (The "Weather" Scenario)
     print("\n--- Request with Weather Context ---")
     weather_data = "Current Weather in Tokyo: 5°C, Heavy Rain."
-    final_payload = state.get_messages_for_llm(temporary_context=weather_data)
+    final_payload = state.build_messages(cot_prompt="Think step by step.", tool_context=weather_data)
 
     # Print nicely to see the structure
-    import json
-    print(json.dumps(final_payload, indent=2))
\ No newline at end of file
+    print(json.dumps(final_payload, indent=2))
+
+    # 5. Token-budget mode with a background rolling summary
+    print("\n--- Token Budget Mode ---")
+    def summarize(summary, messages):
+        return (summary + " | " if summary else "") + "; ".join(m["content"][:20] for m in messages)
+
+    budgeted = StateManager(system_prompt="You are a helpful travel guide.",
+                            token_budget=60, summarizer=summarize)
+    budgeted.add_user("I want to go to Tokyo in April with my two kids.")
+    budgeted.add_assistant("Great choice! Cherry blossom season is busy, " * 4)
+    budgeted.add_user("What should I pack?")
+    budgeted.add_assistant("Layers and comfortable shoes.")
+    budgeted.wait_for_summary()
+    print(json.dumps(budgeted.build_messages(cot_prompt="Think step by step."), indent=2))
+
+    # 6. Session memory: destination, dates, fresh tool results
+    print("\n--- Session Memory ---")
+    remembering = StateManager(system_prompt="You are a helpful travel guide.", result_ttls={"weather": 600})
+    remembering.memory.note_destination("Tokyo")
+    print(remembering.memory.note_dates("I'm visiting Tokyo next week, back on March 12"))
+    remembering.memory.remember_result({"tool": "weather", "arg": "Tokyo", "status": "ok",
+                                        "raw": {"temp": 18}, "text": "Weather in Tokyo: 18°C."})
+    print(remembering.memory.fresh_result("weather", "tokyo"))
+    restored = StateManager(system_prompt="x", result_ttls={"weather": 600}).restore(remembering.to_dict())
+    print(restored.memory.destination, restored.memory.dates, restored.memory.fresh_result("weather", "Tokyo"))
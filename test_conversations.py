@@ -2,8 +2,7 @@
 
 import json
 import datetime
-from assistant import TravelAssistant
-from llm_client import LLMClient
+from eval_runner import EvalRunner, reduce_scores, render_markdown
 
 TEST_CONVERSATIONS = [
     # Travel queries
@@ -24,27 +23,22 @@ TEST_CONVERSATIONS = [
 ]
 
 
-def run_simulation():
+def run_simulation(runner=None):
+    """
+    Each conversation runs in its own assistant, in parallel (see eval_runner.py),
+    and its event trace is saved next to the test log.
+    """
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    bot = TravelAssistant()
-    logs = {"timestamp": timestamp, "runs": []}
-
-    print("\n=== Running 10 Conversation Simulations ===\n")
+    runner = runner or EvalRunner(save_traces=True)
 
-    for i, convo in enumerate(TEST_CONVERSATIONS):
-        print(f"\n--- Conversation {i + 1} ---")
-        convo_log = {"id": i + 1, "turns": []}
+    print(f"\n=== Running {len(TEST_CONVERSATIONS)} Conversation Simulations ===\n")
+    logs = {"timestamp": timestamp, "runs": runner.run(TEST_CONVERSATIONS)}
 
-        for user_msg in convo:
-            print(f"\nUser: {user_msg}")
-            convo_log["turns"].append({"user": user_msg})
+    for convo_log in logs["runs"]:
+        print(f"\n--- Conversation {convo_log['id']} ---")
+        for turn in convo_log["turns"]:
+            print(f"\nUser: {turn['user']}\nAssistant: {turn['assistant']}")
 
-            # Capture assistant response instead of printing only
-            response = capture_assistant_output(bot, user_msg)
-            convo_log["turns"][-1]["assistant"] = response
-
-        logs["runs"].append(convo_log)
-    bot.logger.save()
     OUTPUT_FILE = f"test_logs_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(logs, f, indent=2, ensure_ascii=False)
@@ -53,65 +47,16 @@ def run_simulation():
     return logs
 
 
-def capture_assistant_output(bot, user_msg):
-    """Utility: run a turn but capture printed streaming output."""
-    from io import StringIO
-    import sys
-
-    old_stdout = sys.stdout
-    sys.stdout = buffer = StringIO()
-
-    bot.run_turn(user_msg)
-
-    sys.stdout = old_stdout
-    output = buffer.getvalue()
-
-    # Clean up stream output (remove separators)
-    cleaned = output.replace("Assistant:", "").replace("------------------------------------------------------------",
-                                                       "")
-    return cleaned.strip()
-
-
-def analyze_with_llm(log_data):
+def analyze_with_llm(log_data, runner=None):
     """
-    Optional: Ask the LLM to analyze all 10 conversations
-    and produce the structured report.
+    Optional: Ask the LLM to score each conversation (one call per
+    conversation, in parallel) and reduce the scores into one report.
     """
     print("\n=== Sending Logs to LLM for Analysis ===\n")
 
-    client = LLMClient()
-
-    messages = [
-        {
-            "role": "system",
-            "content":
-                """
-                You are a senior AI evaluator. Analyze each conversation from a travel assistant
-                for quality, relevance, tone, hallucination risk, and travel-domain adherence.
-
-                For each conversation, provide:
-                - Quality score (0–10)
-                - Accuracy score
-                - Travel-domain consistency score
-                - Notes on tone, naturalness, and helpfulness
-                - Any hallucinations detected
-                - What the assistant could improve
-
-                Return structured markdown with headers.
-                """
-        },
-        {
-            "role": "user",
-            "content": json.dumps(log_data, indent=2, ensure_ascii=False)
-        }
-    ]
-    # Always returns a STRING now
-    report_text = client.chat(
-        messages,
-        stream=False,  # force non-streaming
-        json_mode=False,  # needed for safe eval mode
-        temperature=0.2
-    )
+    runner = runner or EvalRunner()
+    report = reduce_scores(runner.score(log_data["runs"]))
+    report_text = render_markdown(report)
 
     OUTPUT_FILE = f"test_analysis_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -122,12 +67,13 @@ def analyze_with_llm(log_data):
 
 
 if __name__ == "__main__":
-    logs = run_simulation()
-    gen_report = analyze_with_llm(logs)
+    runner = EvalRunner(save_traces=True)
+    logs = run_simulation(runner)
+    gen_report = analyze_with_llm(logs, runner)
 
 
     run_analysis = input("\nRun LLM analysis? (y/n): ").strip().lower()
     if run_analysis == "y":
-        gen_report = analyze_with_llm(logs)
+        gen_report = analyze_with_llm(logs, runner)
         print(gen_report)
 
@@ -0,0 +1,206 @@
+# tool_executor.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from metrics import TOOL_CALLS, TOOL_LATENCY
+from tools import AVAILABLE_TOOLS
+from utils import format_tool_output
+
+LOCATION_TOOLS = {"weather", "attractions", "nearby"}
+QUERY_TOOLS = {"kb_search", "web_search"}
+
+# Seconds each tool may take before its result is dropped from the turn
+DEFAULT_TOOL_TIMEOUTS = {
+    "weather": 6.0,
+    "attractions": 2.0,
+    "nearby": 2.0,
+    "kb_search": 2.0,
+    "web_search": 8.0,
+}
+
+# Seconds a successful result stays fresh enough to reuse within a session
+# (see StateManager.memory) and to back a cached answer (see answer_cache.py)
+TOOL_RESULT_TTLS = {
+    "weather": 10 * 60,
+    "web_search": 60 * 60,
+    "kb_search": 24 * 3600,
+    "attractions": 7 * 24 * 3600,
+    "nearby": 7 * 24 * 3600,
+}
+
+
+def _clean_arg(value):
+    if not isinstance(value, str):
+        return None
+    value = " ".join(value.split())
+    if not value or value.lower() in ("null", "none", "n/a", "unknown"):
+        return None
+    return value[:120]
+
+
+def plan_tool_calls(intent: dict, user_msg: str, max_calls=6) -> list:
+    """
+    Turn a router result into a validated, de-duplicated list of
+    {"tool": name, "arg": value} invocations.
+
+    Accepts both the list contract ("calls") and the legacy single
+    {"tool", "location"} shape. Unknown tools and missing cities are dropped.
+    """
+    calls = intent.get("calls")
+    if not isinstance(calls, list) or not calls:
+        calls = [{"tool": intent.get("tool"), "location": intent.get("location")}]
+
+    plan, seen = [], set()
+    for call in calls:
+        if not isinstance(call, dict):
+            continue
+        tool = call.get("tool")
+        if tool not in AVAILABLE_TOOLS:
+            continue
+
+        if tool in LOCATION_TOOLS:
+            arg = _clean_arg(call.get("location"))
+        else:
+            arg = _clean_arg(call.get("query")) or _clean_arg(call.get("location")) \
+                or _clean_arg(user_msg)
+        if arg is None:
+            continue
+
+        key = (tool, arg.casefold())
+        if key in seen:
+            continue
+        seen.add(key)
+        plan.append({"tool": tool, "arg": arg})
+
+        if len(plan) >= max_calls:
+            break
+    return plan
+
+
+class ToolExecutor:
+    """
+    Runs a tool plan concurrently on a bounded thread pool.
+    Each call gets its own timeout, so the turn waits for the slowest
+    tool (capped) rather than the sum of all tools.
+
+    A call's timeout counts from when it starts running, so time spent
+    queued behind other turns' calls on a busy pool is not charged to it.
+    Waiting in the queue is bounded separately by queue_timeout (default:
+    the tool's own timeout); a call still queued then is cancelled and never
+    runs. A call that is already running cannot be interrupted: on timeout
+    the turn stops waiting and drops its result, but the tool keeps its
+    worker until it returns, so tools should carry their own I/O timeouts.
+    """
+
+    def __init__(self, tools=None, max_workers=4, timeouts=None, default_timeout=5.0,
+                 queue_timeout=None):
+        self.tools = tools or AVAILABLE_TOOLS
+        self.timeouts = dict(DEFAULT_TOOL_TIMEOUTS, **(timeouts or {}))
+        self.default_timeout = default_timeout
+        self.queue_timeout = queue_timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def _invoke(self, tool: str, arg: str, state: dict):
+        start = time.perf_counter()
+        state["started"] = start
+        state["running"].set()
+        raw = self.tools[tool](arg)
+        return raw, time.perf_counter() - start
+
+    def _wait(self, call, state, future, submitted):
+        """(raw, elapsed) of a call, or raises FutureTimeout if it ran or queued too long."""
+        timeout = self.timeouts.get(call["tool"], self.default_timeout)
+        queue_timeout = timeout if self.queue_timeout is None else self.queue_timeout
+        queue_left = max(0.0, submitted + queue_timeout - time.perf_counter())
+        if not state["running"].wait(queue_left) and future.cancel():
+            raise FutureTimeout()
+        state["running"].wait()   # cancel() failed: the call has just started
+        try:
+            return future.result(timeout=max(0.0, state["started"] + timeout - time.perf_counter()))
+        except FutureTimeout:
+            future.cancel()   # no-op for a running call: its result is simply dropped
+            raise
+
+    def run(self, plan: list) -> list:
+        submitted = time.perf_counter()
+        futures = []
+        for call in plan:
+            state = {"running": threading.Event()}
+            futures.append((call, state, self.pool.submit(self._invoke, call["tool"], call["arg"], state)))
+
+        results = []
+        for call, state, future in futures:
+            result = {"tool": call["tool"], "arg": call["arg"]}
+            try:
+                raw, elapsed = self._wait(call, state, future, submitted)
+                result.update(status="ok", raw=raw, elapsed=elapsed,
+                              text=format_tool_output(call["tool"], raw))
+            except FutureTimeout:
+                result.update(status="timeout", raw=None, elapsed=time.perf_counter() - submitted,
+                              text=f"{call['tool']} lookup for {call['arg']} timed out.")
+            except Exception as e:
+                print(f"[Tool Error]: {call['tool']}({call['arg']}): {e}")
+                result.update(status="error", raw=None, elapsed=time.perf_counter() - submitted,
+                              text=f"{call['tool']} lookup for {call['arg']} is unavailable.")
+            TOOL_LATENCY.observe(result["elapsed"], tool=call["tool"], status=result["status"])
+            TOOL_CALLS.inc(tool=call["tool"], status=result["status"])
+            results.append(result)
+        return results
+
+
+def result_age(result: dict) -> float:
+    """
+    Seconds since a result's data was fetched: time spent in session memory
+    plus the age of a cached upstream answer (weather served from its cache).
+    """
+    raw = result.get("raw")
+    upstream = raw.get("age_s", 0.0) if isinstance(raw, dict) else 0.0
+    return result.get("age_s", 0.0) + upstream
+
+
+def merge_tool_context(results: list):
+    """Join the formatted outputs of a plan into one <tool_context> body."""
+    texts = [r["text"] for r in results if r.get("text")]
+    return "\n\n".join(texts) if texts else None
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    def slow(arg):
+        time.sleep(0.5)
+        return {"city": arg, "items": ["Slow Museum"]}
+
+    def hang(arg):
+        time.sleep(3)
+        return {"city": arg, "items": []}
+
+    executor = ToolExecutor(
+        tools=dict(AVAILABLE_TOOLS, attractions=slow, web_search=hang),
+        timeouts={"web_search": 1.0},
+    )
+    intent = {"calls": [
+        {"tool": "weather", "location": "Paris"},
+        {"tool": "attractions", "location": "Paris"},
+        {"tool": "attractions", "location": "Rome"},
+        {"tool": "attractions", "location": "rome"},       # duplicate
+        {"tool": "teleport", "location": "Mars"},           # unknown tool
+        {"tool": "weather", "location": None},              # no city
+        {"tool": "web_search", "query": "Louvre opening hours"},
+    ]}
+    plan = plan_tool_calls(intent, "weather and attractions in Paris and Rome")
+    print(plan)
+
+    start = time.perf_counter()
+    results = executor.run(plan)
+    print(f"{time.perf_counter() - start:.2f}s (slowest capped tool, not the sum)")
+    print(merge_tool_context(results))
+
+    # A busy pool: calls queued behind others get their full timeout once they run
+    busy = ToolExecutor(tools=dict(AVAILABLE_TOOLS, attractions=slow), max_workers=1,
+                        timeouts={"attractions": 0.8}, queue_timeout=2.0)
+    queued = [{"tool": "attractions", "arg": city} for city in ("Paris", "Rome", "Oslo")]
+    start = time.perf_counter()
+    print([r["status"] for r in busy.run(queued)], f"{time.perf_counter() - start:.2f}s "
+          "(3 x 0.5s calls on one worker, 0.8s timeout each from their start)")
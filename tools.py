@@ -1,56 +1,165 @@
 # tools.py
 import os
-import requests
+import re
+import threading
+
+from kb_index import HashingEmbedder, KnowledgeIndex
+from poi_store import POIStore, SEED_POIS
+from weather_service import WeatherService
 
 WEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
+# Shared across sessions: pooled connections, TTL cache, single-flight lookups
+WEATHER_SERVICE = WeatherService(api_key=WEATHER_API_KEY)
+
+# POI dataset: a directory written by `python poi_store.py build pois.csv DIR`
+# (memory-mapped on first use); the built-in seed cities otherwise
+POI_DIR = os.getenv("TRAVEL_POI_DIR")
+
+_poi_store = None
+_poi_lock = threading.Lock()
+
+
+def get_poi_store() -> POIStore:
+    global _poi_store
+    with _poi_lock:
+        if _poi_store is None:
+            _poi_store = POIStore.load(POI_DIR) if POI_DIR else POIStore.from_records(SEED_POIS)
+    return _poi_store
+
+
+def resolve_city(city: str, fuzzy=False):
+    """
+    Canonical city name for exact names and aliases ("NYC", "Roma", "Tokio"),
+    or None. fuzzy=True also corrects misspellings ("Pariss"), but turns real
+    cities missing from the dataset into lookalikes ("Nome" -> Rome), so only
+    use it as a fallback.
+    """
+    return get_poi_store().resolver.canonical(city, fuzzy=fuzzy)
+
+
 def get_weather(city: str) -> dict:
+    # Canonical names also make "NYC" and "New York" share one weather cache entry
+    city = resolve_city(city) or city
     if not WEATHER_API_KEY:
         return {"status": "mock", "city": city,
                 "temp": 22, "description": "partly cloudy"}
 
-    try:
-        res = requests.get(
-            "http://api.openweathermap.org/data/2.5/weather",
-            params={"q": city, "appid": WEATHER_API_KEY, "units": "metric"}
-        ).json()
-
-        return {
-            "status": "ok",
-            "city": city,
-            "temp": res["main"]["temp"],
-            "description": res["weather"][0]["description"]
-        }
-    except:
-        return {"status": "error", "city": city}
-
-def get_attractions(city: str) -> dict:
-    mock = {
-        "paris": ["Eiffel Tower", "Louvre Museum", "Montmartre"],
-        "tokyo": ["Shibuya Crossing", "Senso-ji Temple", "Meiji Shrine"],
-        "rome": ["Colosseum", "Trevi Fountain", "Vatican Museums"],
-        "london": [" British Museum", "Tower of London","London Eye"],
-        "new york": ["Statue of Liberty", "Central Park", "Empire State Building"]
-    }
-    return {"city": city, "items": mock.get(city.lower(), [])}
+    result = WEATHER_SERVICE.get(city)
+    if result["status"] != "ok":
+        # Only a name the API does not know is corrected; the result names the city used
+        corrected = resolve_city(city, fuzzy=True)
+        if corrected and corrected != city:
+            result = WEATHER_SERVICE.get(corrected)
+    return result
+
+def _lookup_city(store, name):
+    """
+    (city_id, suggestion): the exact/alias match as for resolve_city(), else
+    None and the fuzzy lookalike, which is only offered, never answered for:
+    without an upstream lookup to fail, "Nome" and "Rome" cannot be told apart.
+    """
+    city_id = store.resolver.exact(name)
+    if city_id is not None:
+        return city_id, None
+    suggestion = resolve_city(name, fuzzy=True)
+    return None, suggestion if suggestion and suggestion.casefold() != name.casefold() else None
+
+
+def get_attractions(city: str, k=5) -> dict:
+    store = get_poi_store()
+    city_id, suggestion = _lookup_city(store, city)
+    if city_id is None:
+        return {"city": city, "items": [], "suggestion": suggestion}
+    return {"city": store.city_names[city_id],
+            "items": [poi["name"] for poi in store.city_pois(city_id, k=k)]}
 
 
-def get_knowledge_base_context(topic: str) -> str:
+NEARBY_QUERY = re.compile(r"^\s*(?:(.+?)\s+)?(?:near|nearby|around|close to)\s+(?:the\s+)?(.+?)\s*$",
+                          re.IGNORECASE)
+COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def get_nearby(place: str, k=5, radius_km=None) -> dict:
     """
-    Simulates a vector database search. The output text is crafted by the LLM
-    to ensure the RAG context is natural and concise.
+    Closest POIs to a landmark ("Eiffel Tower"), a city ("Tokyo") or
+    coordinates ("48.86,2.29"). An optional category prefix filters them:
+    "museums near Eiffel Tower".
     """
-    topic_lower = topic.lower()
-
-    if "visa" in topic_lower or "passport" in topic_lower:
-        # LLM-Crafted Response
-        return "Static Knowledge for Visas: As of 2025, British citizens require a minimum of six months validity remaining on their passport for entry into the Schengen area, but short-term tourism (under 90 days) does not require a visa."
-    elif "currency" in topic_lower or "money" in topic_lower:
-        # LLM-Crafted Response
-        return "Static Knowledge for Currency: While most large cities accept credit cards, local vendors and public transport in less touristy areas often require local currency. It is advised to use ATMs at major bank branches for better exchange rates."
+    store = get_poi_store()
+    category, anchor = None, place.strip()
+    match = NEARBY_QUERY.match(anchor)
+    if match:
+        anchor = match.group(2)
+        codes = store.category_ids(match.group(1)) if match.group(1) else []
+        if codes:
+            category = store.categories[codes[0]]
+
+    exclude = None
+    coordinates = COORDINATES.match(anchor)
+    poi_id = None if coordinates else store.find_poi(anchor)
+    if coordinates:
+        lat, lon = float(coordinates.group(1)), float(coordinates.group(2))
+    elif poi_id is not None:
+        exclude = poi_id
+        poi = store.poi(exclude)
+        anchor, lat, lon = poi["name"], poi["lat"], poi["lon"]
     else:
+        city_id, suggestion = _lookup_city(store, anchor)
+        center = store.city_center(city_id) if city_id is not None else None
+        if center is None:
+            return {"anchor": anchor, "category": category, "items": [], "suggestion": suggestion}
+        anchor = store.city_names[city_id]
+        lat, lon = center
+
+    items = store.nearby(lat, lon, k=k, radius_km=radius_km, category=category, exclude=exclude)
+    return {"anchor": anchor, "category": category,
+            "items": [{"name": p["name"], "category": p["category"], "distance_km": p["distance_km"]}
+                      for p in items]}
+
+
+# Seed corpus; TRAVEL_KB_DIR adds your own .txt/.md documents on first use.
+# TRAVEL_KB_INDEX_DIR persists the index (chunks + memory-mapped vectors), so
+# restarts reopen it and only index documents added since.
+# TRAVEL_KB_DENSE=1 adds hashed dense vectors and hybrid (BM25 + dense) ranking.
+KB_DIR = os.getenv("TRAVEL_KB_DIR")
+KB_INDEX_DIR = os.getenv("TRAVEL_KB_INDEX_DIR")
+KB_DENSE = os.getenv("TRAVEL_KB_DENSE") == "1"
+KB_SEED_DOCUMENTS = [
+    {"doc_id": "seed-visas", "title": "Visas and passports",
+     "text": "As of 2025, British citizens require a minimum of six months validity remaining on their "
+             "passport for entry into the Schengen area, but short-term tourism (under 90 days) does "
+             "not require a visa."},
+    {"doc_id": "seed-currency", "title": "Currency and money",
+     "text": "While most large cities accept credit cards, local vendors and public transport in less "
+             "touristy areas often require local currency. It is advised to use ATMs at major bank "
+             "branches for better exchange rates."},
+]
+
+_kb_index = None
+_kb_lock = threading.Lock()
+
+
+def get_kb_index() -> KnowledgeIndex:
+    """Built lazily so importing tools stays cheap; shared by all sessions."""
+    global _kb_index
+    with _kb_lock:
+        if _kb_index is None:
+            index = KnowledgeIndex(directory=KB_INDEX_DIR, embedder=HashingEmbedder() if KB_DENSE else None)
+            index.add_documents(KB_SEED_DOCUMENTS, skip_indexed=True)
+            if KB_DIR:
+                index.add_directory(KB_DIR)
+            _kb_index = index
+    return _kb_index
+
+
+def get_knowledge_base_context(topic: str, k=3) -> str:
+    """Top-k retrieval over the local knowledge base (see kb_index.py)."""
+    hits = get_kb_index().search(topic, k=k, mode="hybrid" if KB_DENSE else "bm25")
+    if not hits:
         # Node G -> No KB Chunks Retrieved
         return f"[KB_FAILURE] No relevant static knowledge found for topic: {topic}. Try rephrasing with a more specific location or document type."
+    return "\n\n".join(f"Static Knowledge for {h['title']}: {h['text']}" for h in hits)
 
 
 def web_search_tool(query: str) -> str:
@@ -69,10 +178,40 @@ def web_search_tool(query: str) -> str:
 AVAILABLE_TOOLS = {
     "weather": get_weather,
     "attractions": get_attractions,
+    "nearby": get_nearby,
     "kb_search": get_knowledge_base_context,
     "web_search": web_search_tool,
 }
 
+# --- NATIVE TOOL-CALLING SCHEMAS ---
+# Same names and argument keys as the router's "calls" contract, so a native
+# tool call {"name": n, "arguments": a} validates as {"tool": n, **a}
+
+def _schema(name, description, arg, arg_description):
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {arg: {"type": "string", "description": arg_description}},
+                "required": [arg],
+            },
+        },
+    }
+
+TOOL_SCHEMAS = [
+    _schema("weather", "Current weather for a city.", "location", "City name, e.g. Paris"),
+    _schema("attractions", "Top sights and attractions in a city.", "location", "City name, e.g. Rome"),
+    _schema("nearby", "Closest sights to a landmark, city or coordinates, optionally one category.",
+            "location", "Place, optionally with a category, e.g. 'museums near Eiffel Tower'"),
+    _schema("kb_search", "Static travel knowledge: visas, passports, currency, money.",
+            "query", "Short topic, e.g. 'Schengen visa for UK citizens'"),
+    _schema("web_search", "Live web search for fresh facts (prices, events, opening hours).",
+            "query", "Search query"),
+]
+
 # --- QUICK TEST BLOCK ---
 if __name__ == "__main__":
     print("1. Testing Weather (Mock or Real)...")
@@ -80,4 +219,22 @@ if __name__ == "__main__":
     print(get_weather("Narnia"))  # Test error handling
 
     print("\n2. Testing Attractions...")
-    print(get_attractions("Tokyo"))
\ No newline at end of file
+    print(get_attractions("Tokyo"))
+    print(get_attractions("NYC"), get_attractions("Roma"), get_weather("Tokio"))
+    # Real cities outside the dataset keep their name; only failed lookups are corrected
+    for name in ("Nome", "Paros", "Dome", "Parish"):
+        assert resolve_city(name) is None and get_weather(name)["city"] == name, name
+    # ... and attractions/nearby answer for the same canonical city, never a lookalike
+    for name, lookalike in (("Nome", "Rome"), ("Paros", "Paris")):
+        attractions, nearby = get_attractions(name), get_nearby(name)
+        assert attractions["items"] == [] and attractions["suggestion"] == lookalike, attractions
+        assert nearby["items"] == [] and nearby["anchor"] == name, nearby
+    print(get_attractions("Pariss"), get_attractions("Tokio")["city"])
+    print(resolve_city("NYC"), resolve_city("Pariss"), resolve_city("Pariss", fuzzy=True))
+    print(get_nearby("Eiffel Tower"))
+    print(get_nearby("museums near the Colosseum"), get_nearby("40.75,-73.99", k=2))
+
+    print("\n3. Testing Knowledge Base...")
+    print(get_knowledge_base_context("Do I need a visa for Spain?"))
+    print(get_knowledge_base_context("best way to pay, cash or card?"))
+    print(get_knowledge_base_context("ski resorts"))
\ No newline at end of file
@@ -0,0 +1,143 @@
+# trace_compaction.py
+"""
+Content-addressed trace format.
+
+Every distinct message body is stored as a "message_blob" record keyed by
+a content hash, once per file (or in-memory window) that references it;
+events that carry a "messages" list (prompt_to_llm) log only
+"message_refs". The reader/exporter below rebuilds the verbose JSON
+that EventLogger.save() has always produced, for existing analysis tooling.
+
+    python trace_compaction.py traces/*.jsonl -o conversation_trace_full.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+BLOB_EVENT = "message_blob"
+COMPACT_EVENT_TYPES = {"prompt_to_llm"}
+
+
+def message_hash(message: dict) -> str:
+    canonical = json.dumps(message, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:20]
+
+
+def split_messages(event: dict):
+    """(event with message_refs, {hash: message}) for a prompt event, else (event, {})."""
+    messages = event["data"].get("messages") if isinstance(event.get("data"), dict) else None
+    if event["type"] not in COMPACT_EVENT_TYPES or not isinstance(messages, list):
+        return event, {}
+
+    bodies = {}
+    for message in messages:
+        bodies.setdefault(message_hash(message), message)
+    data = {k: v for k, v in event["data"].items() if k != "messages"}
+    data["message_refs"] = [message_hash(m) for m in messages]
+    return {"timestamp": event["timestamp"], "type": event["type"], "data": data}, bodies
+
+
+def blob_record(timestamp, h, message) -> dict:
+    return {"timestamp": timestamp, "type": BLOB_EVENT, "data": {"hash": h, "message": message}}
+
+
+class PromptDeduplicator:
+    """
+    Rewrites prompt events into hash references for one sink (one file).
+
+    A body is emitted again once it is no longer known to be in the sink:
+    after reset() (call it whenever the sink starts a new file) or once its
+    hash fell out of the bounded LRU of the last max_entries hashes.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._seen.clear()
+
+    def admit(self, hashes) -> list:
+        """The hashes whose bodies must be emitted now; all of them count as emitted after."""
+        new = []
+        with self._lock:
+            for h in hashes:
+                if h in self._seen:
+                    self._seen.move_to_end(h)
+                    continue
+                self._seen[h] = True
+                if len(self._seen) > self.max_entries:
+                    self._seen.popitem(last=False)
+                new.append(h)
+        return new
+
+    def compact(self, event: dict) -> list:
+        compacted, bodies = split_messages(event)
+        records = [blob_record(event["timestamp"], h, bodies[h]) for h in self.admit(bodies)]
+        records.append(compacted)
+        return records
+
+
+# ------------ READER / EXPORTER ------------
+
+def read_records(paths) -> list:
+    """Read one or more trace files (.json list or .jsonl segments, in the given order)."""
+    if isinstance(paths, str):
+        paths = [paths]
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                records.extend(json.loads(line) for line in f if line.strip())
+            else:
+                records.extend(json.load(f))
+    return records
+
+
+def expand_records(records: list) -> list:
+    """Resolve message_refs back into full messages and drop blob records."""
+    blobs = {r["data"]["hash"]: r["data"]["message"] for r in records if r["type"] == BLOB_EVENT}
+
+    events = []
+    for record in records:
+        if record["type"] == BLOB_EVENT:
+            continue
+        data = record.get("data")
+        if isinstance(data, dict) and "message_refs" in data:
+            data = dict(data)
+            refs = data.pop("message_refs")
+            data["messages"] = [blobs.get(h, {"missing_hash": h}) for h in refs]
+            record = dict(record, data=data)
+        events.append(record)
+    return events
+
+
+def load_trace(paths) -> list:
+    """Verbose event list, whichever format the trace was written in."""
+    return expand_records(read_records(paths))
+
+
+def export_verbose(paths, out_path: str) -> int:
+    events = load_trace(paths)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(events, f, indent=2, ensure_ascii=False)
+    return len(events)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild a verbose JSON trace from compact trace files.")
+    parser.add_argument("traces", nargs="+", help="trace files or globs (.json / .jsonl), oldest first")
+    parser.add_argument("-o", "--output", required=True, help="verbose JSON output path")
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.traces:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    count = export_verbose(paths, args.output)
+    print(f"✓ {count} events written to {args.output}")
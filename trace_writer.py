@@ -0,0 +1,210 @@
+# trace_writer.py
+
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+from trace_compaction import PromptDeduplicator, blob_record, split_messages
+
+_STOP = object()
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+class JsonlTraceWriter:
+    """
+    Append-only JSONL sink for EventLogger.
+
+    write() only enqueues; a background thread drains the bounded queue in
+    batches, flushes every batch, fsyncs at most every fsync_interval
+    seconds, and rotates files by size (max_bytes) or age (rotate_interval).
+
+    Backpressure policy when the queue is full:
+    - "drop":  discard the event and count it in `dropped`
+    - "block": wait up to block_timeout for space (never for disk I/O), then drop
+
+    Events are serialized in write(), on the caller's thread, so later
+    changes to the logged dicts never reach the trace.
+
+    compact_prompts: prompt messages are written as content-hash references
+    (see trace_compaction.py). Dedup runs on the writer thread and restarts
+    with every file, so each rotated segment carries the blobs it refers to.
+    """
+
+    def __init__(self, directory="traces", prefix="conversation_trace", max_queue=10000,
+                 policy="drop", block_timeout=0.05, batch_size=256, flush_interval=0.5,
+                 fsync_interval=2.0, max_bytes=50 * 1024 * 1024, rotate_interval=3600,
+                 compact_prompts=False):
+        if policy not in ("drop", "block"):
+            raise ValueError("policy must be 'drop' or 'block'")
+
+        self.directory = directory
+        self.prefix = prefix
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compact_prompts = compact_prompts
+        self._deduplicator = PromptDeduplicator() if compact_prompts else None
+
+        self.written = 0
+        self.dropped = 0
+        self.files = []
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._opened_at = 0.0
+        self._last_fsync = 0.0
+        self._seq = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    # ------------ REQUEST PATH ------------
+
+    def _serialize(self, event: dict):
+        """(line, {hash: blob line}); blobs are only split out with compact_prompts."""
+        if not self.compact_prompts:
+            return _dumps(event), {}
+        compacted, bodies = split_messages(event)
+        return _dumps(compacted), {h: _dumps(blob_record(event["timestamp"], h, message))
+                                   for h, message in bodies.items()}
+
+    def write(self, event: dict) -> bool:
+        item = self._serialize(event)
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout=5.0):
+        """Flush everything queued so far, fsync and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ------------ WRITER THREAD ------------
+
+    def _open_next(self):
+        if self._file:
+            self._sync()
+            self._file.close()
+        self._seq += 1
+        if self._deduplicator:
+            self._deduplicator.reset()
+        stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{self._seq:04d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+        self.files.append(path)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+    def _needs_rotation(self) -> bool:
+        size = self._file.tell()
+        return size >= self.max_bytes or (
+            size > 0 and time.monotonic() - self._opened_at >= self.rotate_interval
+        )
+
+    def _run(self):
+        self._open_next()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if any(e is _STOP for e in batch):
+                stopping = True
+                batch = [e for e in batch if e is not _STOP]
+
+            lines = []
+            for line, blobs in batch:
+                if blobs:
+                    lines.extend(blobs[h] for h in self._deduplicator.admit(blobs))
+                lines.append(line)
+            if lines:
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+                self.written += len(lines)
+
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._sync()
+            if self._needs_rotation():
+                self._open_next()
+
+        self._sync()
+        self._file.close()
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = JsonlTraceWriter(directory=tmp, max_bytes=64 * 1024, max_queue=50_000)
+        start = time.perf_counter()
+        for i in range(20_000):
+            writer.write({"type": "user_input", "data": {"text": f"message {i}" * 5}})
+        enqueue = time.perf_counter() - start
+        writer.close()
+
+        lines = sum(sum(1 for _ in open(p, encoding="utf-8")) for p in writer.files)
+
+        # Logged dicts keep changing after write(); the trace keeps what was logged
+        snapshot = JsonlTraceWriter(directory=tmp, prefix="snapshot")
+        dates = {"arrive": "2026-05-01"}
+        snapshot.write({"type": "session_memory", "data": {"dates": dates}})
+        dates["leave"] = "2026-05-07"
+        snapshot.close()
+        with open(snapshot.files[0], encoding="utf-8") as f:
+            assert json.loads(f.readline())["data"]["dates"] == {"arrive": "2026-05-01"}
+        print(f"enqueue 20k events: {enqueue * 1000:.1f} ms, written={writer.written} "
+              f"dropped={writer.dropped} files={len(writer.files)} lines={lines}")
+        assert lines == writer.written
+
+        # Compacted segments: every segment resolves on its own
+        from trace_compaction import expand_records, read_records
+        from utils import EventLogger
+
+        prompt = [{"role": "system", "content": "You are a travel assistant. " * 20}]
+        logger = EventLogger(sink=JsonlTraceWriter(directory=tmp, prefix="compact", max_bytes=8 * 1024,
+                                                   compact_prompts=True),
+                             max_events=5, compact_prompts=True)
+        for i in range(200):
+            logger.log("prompt_to_llm", {"messages": prompt + [{"role": "user", "content": f"q{i}"}]})
+            logger.log("user_input", {"text": f"q{i}"})
+        logger.close()
+
+        segments = logger.sink.files
+        for path in segments:
+            assert not any("missing_hash" in m for e in expand_records(read_records(path))
+                           for m in e["data"].get("messages", [])), path
+        window = expand_records(logger.export())
+        assert not any("missing_hash" in m for e in window for m in e["data"].get("messages", []))
+        print(f"compact: {len(segments)} segments, each self-contained; "
+              f"in-memory window {len(window)} events, {len(logger._blobs)} resident blobs")
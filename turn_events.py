@@ -0,0 +1,171 @@
+# turn_events.py
+"""
+Typed events yielded by TravelAssistant.stream_turn().
+
+    router_decision  {"intent", "plan", "cache_hit"}      router mode only
+    tool_result      {"tool", "arg", "status", "elapsed", "text", "reused"}
+    chunk            {"text"}                             coalesced answer text
+    reflection       {"text", "changed", "mode"}
+    final            {"text", "timing"}                   always the last event
+
+Consumers (CLI, eval runner, SSE server) pick the types they care about
+and ignore the rest.
+"""
+
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+ROUTER_DECISION = "router_decision"
+TOOL_RESULT = "tool_result"
+CHUNK = "chunk"
+REFLECTION = "reflection"
+FINAL = "final"
+EVENT_TYPES = (ROUTER_DECISION, TOOL_RESULT, CHUNK, REFLECTION, FINAL)
+
+
+class TurnEvent(NamedTuple):
+    type: str
+    data: dict
+
+
+def tool_event(result: dict) -> TurnEvent:
+    """reused: the result came from session memory (it carries age_s) instead of a new call."""
+    data = {k: result.get(k) for k in ("tool", "arg", "status", "elapsed", "text")}
+    return TurnEvent(TOOL_RESULT, dict(data, reused="age_s" in result))
+
+
+class ChunkCoalescer:
+    """
+    Buffers streamed tokens in a list (joined once, not += per token) and
+    merges small writes: add() returns text to emit once max_chars are
+    pending or max_interval seconds passed since the last emit, else None.
+    The first token is emitted at once, so time-to-first-token is unchanged.
+
+    add() only runs when a token arrives; while the upstream stream pauses,
+    the reader waits at most wait_time() and then calls due(), so buffered
+    text never sits longer than max_interval (see paced()).
+    """
+
+    def __init__(self, max_chars=32, max_interval=0.05, clock=time.perf_counter):
+        self.max_chars = max_chars
+        self.max_interval = max_interval
+        self.clock = clock
+        self._parts = []       # every token of the answer
+        self._pending = []     # tokens not emitted yet
+        self._pending_chars = 0
+        self._last_emit = None
+
+    def add(self, text: str):
+        if not text:
+            return None
+        self._parts.append(text)
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        now = self.clock()
+        if self._last_emit is None or self._pending_chars >= self.max_chars \
+                or now - self._last_emit >= self.max_interval:
+            self._last_emit = now
+            return self.flush()
+        return None
+
+    def wait_time(self):
+        """Seconds until pending text is due, or None when nothing is pending."""
+        if not self._pending:
+            return None
+        return max(0.0, self._last_emit + self.max_interval - self.clock())
+
+    def due(self):
+        """Pending text once max_interval passed since the last emit, else None."""
+        if self._pending and self.clock() - self._last_emit >= self.max_interval:
+            self._last_emit = self.clock()
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Pending text (None when empty); call once the stream ends."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+        return text
+
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+_DONE = object()
+
+
+def paced(items, wait_time):
+    """
+    Iterate a blocking iterator on a reader thread, yielding its items and
+    None whenever wait_time() seconds (None: no limit) pass without one.
+    Errors are re-raised here; closing this generator stops the reader at
+    its next item and closes the source.
+    """
+    buffer = queue.Queue()
+    stop = threading.Event()
+
+    def read():
+        try:
+            for item in items:
+                buffer.put(item)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            buffer.put(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+            buffer.put(_DONE)
+
+    threading.Thread(target=read, name="stream-reader", daemon=True).start()
+    try:
+        while True:
+            try:
+                item = buffer.get(timeout=wait_time())
+            except queue.Empty:
+                yield None
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    coalescer = ChunkCoalescer(max_chars=12, max_interval=10)
+    tokens = "Rome is lovely in spring , with mild days and fewer crowds .".split(" ")
+    emitted = [out for out in (coalescer.add(t + " ") for t in tokens) if out]
+    emitted.append(coalescer.flush())
+    print(f"{len(tokens)} tokens -> {len(emitted)} writes:", emitted)
+    assert "".join(emitted) == coalescer.text()
+
+    # Long answers: list buffering stays linear
+    big = ChunkCoalescer()
+    start = time.perf_counter()
+    for _ in range(200000):
+        big.add("word ")
+    big.flush()
+    print(f"200k tokens, {len(big.text())} chars in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # A pause upstream: buffered text goes out after max_interval, not with the next token
+    def pausing():
+        yield from ("Rome ", "is ")
+        time.sleep(0.3)
+        yield "lovely."
+
+    idle = ChunkCoalescer(max_chars=100, max_interval=0.05)
+    start = time.perf_counter()
+    for token in paced(pausing(), idle.wait_time):
+        text = idle.due() if token is None else idle.add(token)
+        if text:
+            print(f"  {(time.perf_counter() - start) * 1000:4.0f} ms: {text!r}")
@@ -2,6 +2,10 @@
 
 import json
 import datetime
+import threading
+from collections import deque
+
+from trace_compaction import blob_record, split_messages
 
 def format_weather_payload(d):
     if d["status"] != "ok" and d["status"] != "mock":
@@ -9,30 +13,118 @@ def format_weather_payload(d):
 
     return f"Weather in {d['city']}: {d['temp']}°C, {d['description']}."
 
+def _suggestion(d):
+    return f" Did you mean {d['suggestion']}?" if d.get("suggestion") else ""
+
 def format_attractions_payload(d):
     if not d["items"]:
-        return f"No attractions found for {d['city']}."
+        return f"No attractions found for {d['city']}." + _suggestion(d)
 
     text = "\n".join([f"- {i}" for i in d["items"]])
     return f"Top attractions in {d['city']}:\n{text}"
 
+def format_nearby_payload(d):
+    what = f"places ({d['category']})" if d.get("category") else "places"
+    if not d["items"]:
+        return f"No {what} found near {d['anchor']}." + _suggestion(d)
+
+    text = "\n".join([f"- {i['name']} ({i['category']}, {i['distance_km']} km)" for i in d["items"]])
+    return f"Closest {what} to {d['anchor']}:\n{text}"
+
+TOOL_FORMATTERS = {
+    "weather": format_weather_payload,
+    "attractions": format_attractions_payload,
+    "nearby": format_nearby_payload,
+}
+
+def format_tool_output(tool, raw):
+    """Format raw tool output so the LLM can use it well."""
+    formatter = TOOL_FORMATTERS.get(tool, str)
+    return formatter(raw)
+
+
+def percentiles(values, ps=(50, 90, 99)) -> dict:
+    """Nearest-rank percentiles, e.g. {"p50": ..., "p90": ..., "p99": ...}."""
+    if not values:
+        return {f"p{p}": None for p in ps}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {f"p{p}": ordered[min(last, round(p / 100 * last))] for p in ps}
+
 
 class EventLogger:
-    def __init__(self):
-        self.events = []
+    """
+    Collects pipeline events.
+
+    - sink: optional streaming writer (e.g. trace_writer.JsonlTraceWriter);
+      log() hands events to it without touching the disk
+    - max_events: bound the in-memory copy to the most recent N events
+      (None keeps everything, as save() needs for a full trace)
+    - compact_prompts: store each distinct prompt message once under a
+      content hash (see trace_compaction.py for the reader/exporter)
+
+    With compact_prompts the in-memory copy keeps message bodies in a
+    reference-counted table, so a body lives exactly as long as an event in
+    the window points to it. A sink with its own compact_prompts setting
+    (JsonlTraceWriter) gets the verbose event and dedups per file itself;
+    any other sink gets a self-contained blob record ahead of each event.
+    """
+
+    def __init__(self, sink=None, max_events=None, compact_prompts=False):
+        self.sink = sink
+        self.max_events = max_events
+        self.events = deque()
+        self.compact_prompts = compact_prompts
+        self._blobs = {}   # hash -> [first timestamp, message, events referencing it]
+        self._lock = threading.Lock()
 
     def log(self, event_type: str, data: dict):
-        self.events.append({
+        event = {
             "timestamp": datetime.datetime.utcnow().isoformat(),
             "type": event_type,
             "data": data
-        })
+        }
+        record, bodies = split_messages(event) if self.compact_prompts else (event, {})
+        with self._lock:
+            for h, message in bodies.items():
+                entry = self._blobs.setdefault(h, [event["timestamp"], message, 0])
+                entry[2] += 1
+            self.events.append(record)
+            if self.max_events and len(self.events) > self.max_events:
+                self._release(self.events.popleft())
+
+        if self.sink:
+            if not bodies or getattr(self.sink, "compact_prompts", False):
+                self.sink.write(event)
+            else:
+                for h, message in bodies.items():
+                    self.sink.write(blob_record(event["timestamp"], h, message))
+                self.sink.write(record)
+
+    def _release(self, record):
+        data = record.get("data")
+        if not isinstance(data, dict):
+            return
+        for h in set(data.get("message_refs", ())):
+            entry = self._blobs.get(h)
+            if entry:
+                entry[2] -= 1
+                if entry[2] <= 0:
+                    del self._blobs[h]
 
     def export(self):
-        return self.events
+        """The window as trace records: blobs it references, then its events."""
+        with self._lock:
+            blobs = [blob_record(ts, h, message) for h, (ts, message, _) in self._blobs.items()]
+            return blobs + list(self.events)
+
+    def close(self):
+        """Flush and stop the streaming sink, if any."""
+        if self.sink:
+            self.sink.close()
 
     def save(self, path=None):
         if path is None:
             path = f"conversation_trace_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
         with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.events, f, indent=2, ensure_ascii=False)
+            json.dump(self.export(), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,122 @@
+# warmup.py
+"""
+Background warm-up for short-lived workers and freshly scaled pods.
+
+Before the first user message, on a daemon thread:
+- llm:     imports the LLM SDK and opens a pooled connection (GET /models)
+- weather: opens a pooled connection to OpenWeather (skipped without a key,
+           when weather answers are mocked)
+- local:   builds the POI store, city resolver and knowledge base index
+
+With keepalive_s set, both connections are pinged on that interval so an
+idle worker does not lose them to idle timeouts; keep it below the
+server's idle timeout and GroqBackend.keepalive_expiry.
+
+    warmer = Prewarmer(llm, keepalive_s=30).start()
+    ...
+    warmer.stop()
+
+Warm-up is best effort: a failed step is logged and the first turn pays
+for it as it would have anyway.
+"""
+
+import threading
+import time
+
+import tools
+
+
+class Prewarmer:
+    def __init__(self, llm=None, weather=None, local=True, keepalive_s=None):
+        self.llm = llm
+        # None: the shared service, if weather lookups are live
+        self.weather = weather or (tools.WEATHER_SERVICE if tools.WEATHER_API_KEY else None)
+        self.local = local
+        self.keepalive_s = keepalive_s
+        self.timings = {}      # step -> seconds of its first (warm-up) run
+        self.errors = {}       # step -> error message
+        self.pings = 0
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _steps(self) -> dict:
+        steps = {}
+        if self.llm:
+            steps["llm"] = self.llm.warm_up
+        if self.weather:
+            steps["weather"] = self.weather.warm_up
+        return steps
+
+    def _run_step(self, name, step) -> bool:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"[Warmup Error]: {name}: {e}")
+            self.errors[name] = str(e)
+            return False
+        self.timings.setdefault(name, time.perf_counter() - start)
+        return True
+
+    def _local(self):
+        tools.get_poi_store()
+        tools.get_kb_index()
+
+    def _run(self):
+        steps = self._steps()
+        if self.local:
+            steps["local"] = self._local
+        for name, step in steps.items():
+            self._run_step(name, step)
+        self.ready.set()
+
+        if not self.keepalive_s:
+            return
+        while not self._stop.wait(self.keepalive_s):
+            for name, step in self._steps().items():
+                if self._run_step(name, step):
+                    self.pings += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None) -> bool:
+        """True once the first warm-up pass finished."""
+        return self.ready.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready.is_set(),
+            "timings_s": {k: round(v, 4) for k, v in self.timings.items()},
+            "errors": dict(self.errors),
+            "keepalive_pings": self.pings,
+        }
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    from fake_servers import FakeLLMServer, FakeWeatherServer
+    from llm_client import LLMClient
+    from weather_service import WeatherService
+
+    with FakeLLMServer(connect_delay=0.1) as llm_server, FakeWeatherServer(connect_delay=0.1) as weather_server:
+        llm = LLMClient(api_key="fake", base_url=llm_server.url)
+        weather = WeatherService(api_key="fake", base_url=weather_server.weather_url)
+        warmer = Prewarmer(llm, weather=weather, keepalive_s=0.3).start()
+        warmer.wait()
+        print("warmed:", warmer.stats())
+
+        start = time.perf_counter()
+        weather.get("Paris")
+        print(f"first weather lookup: {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"(connect_delay 100 ms)")
+        time.sleep(1)
+        warmer.stop()
+        print(f"pings: {warmer.pings}, connections opened: llm {llm_server.connections}, "
+              f"weather {weather_server.connections}")
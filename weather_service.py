@@ -0,0 +1,175 @@
+# weather_service.py
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import CACHE_LOOKUPS
+
+WEATHER_API_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+
+class WeatherService:
+    """
+    OpenWeather client shared by every session:
+    - one pooled keep-alive requests.Session (requests is imported on first use)
+    - per-request (connect, read) timeouts
+    - per-city TTL cache with stale-while-revalidate
+    - single-flight: concurrent lookups for one city share one upstream call
+    """
+
+    def __init__(self, api_key, base_url=WEATHER_API_URL, ttl=600, stale_ttl=1800,
+                 timeout=(3.05, 5), pool_size=16):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._session = None
+        self._cache = {}     # city key -> (fetched_at, result)
+        self._inflight = {}  # city key -> Future
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    @staticmethod
+    def _key(city: str) -> str:
+        return " ".join(city.casefold().split())
+
+    def get(self, city: str) -> dict:
+        key = self._key(city)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                # age_s tells callers that cache their own answers how old the data is
+                if age < self.ttl:
+                    self.hits += 1
+                    CACHE_LOOKUPS.inc(cache="weather", result="hit")
+                    return dict(entry[1], age_s=round(age, 1))
+                if age < self.ttl + self.stale_ttl:
+                    # Serve stale immediately, refresh off the request path
+                    self.stale_hits += 1
+                    CACHE_LOOKUPS.inc(cache="weather", result="stale")
+                    if key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        self._refresher.submit(self._fetch_into, key, city, future)
+                    return dict(entry[1], age_s=round(age, 1))
+            self.misses += 1
+        CACHE_LOOKUPS.inc(cache="weather", result="miss")
+
+        return dict(self._single_flight(key, city))
+
+    def _single_flight(self, key: str, city: str) -> dict:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._fetch_into(key, city, future)
+        return future.result()
+
+    def _fetch_into(self, key: str, city: str, future: Future):
+        result = self._fetch(city)
+        with self._lock:
+            if result["status"] == "ok":
+                self._cache[key] = (time.monotonic(), result)
+            elif key in self._cache:
+                # Keep serving the last good value if a background refresh failed
+                result = self._cache[key][1]
+            self._inflight.pop(key, None)
+        future.set_result(result)
+
+    def _fetch(self, city: str) -> dict:
+        with self._lock:
+            self.upstream_calls += 1
+        try:
+            res = self.session.get(
+                self.base_url,
+                params={"q": city, "appid": self.api_key, "units": "metric"},
+                timeout=self.timeout,
+            ).json()
+
+            return {
+                "status": "ok",
+                "city": city,
+                "temp": res["main"]["temp"],
+                "description": res["weather"][0]["description"]
+            }
+        except Exception:
+            return {"status": "error", "city": city}
+
+    def warm_up(self):
+        """Open a pooled keep-alive connection to the API host (any status will do)."""
+        self.session.head(self.base_url, timeout=self.timeout)
+
+    def stats(self) -> dict:
+        return {
+            "cached_cities": len(self._cache),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+        }
+
+
+# --- QUICK TEST BLOCK ---
+if __name__ == "__main__":
+    from fake_servers import FakeWeatherServer
+
+    with FakeWeatherServer(delay=0.2) as server:
+        service = WeatherService(api_key="test", base_url=server.weather_url, ttl=1, stale_ttl=5)
+
+        # 1. Single-flight: 20 concurrent lookups for one city -> 1 upstream call
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(service.get, ["Paris"] * 20))
+        assert all(r["status"] == "ok" for r in results)
+        assert server.calls["paris"] == 1, server.calls
+        print("coalesced:", service.stats(), dict(server.calls))
+
+        # 2. TTL cache: repeated lookups do not hit upstream
+        for _ in range(50):
+            service.get("paris")
+        assert server.calls["paris"] == 1
+
+        # 3. Stale-while-revalidate: after ttl the stale value returns instantly
+        time.sleep(1.1)
+        start = time.perf_counter()
+        service.get("Paris")
+        assert time.perf_counter() - start < 0.1
+        time.sleep(0.4)
+        assert server.calls["paris"] == 2, server.calls
+
+        # 4. Errors are not cached; keep-alive pool reuses connections
+        service.get("Narnia")
+        service.get("Narnia")
+        assert server.calls["narnia"] == 2
+        print("final:", service.stats(), dict(server.calls), "connections:", server.connections)
+        assert server.connections < server.total_calls